@@ -2,23 +2,40 @@
 """
 AI обработчик контента
 """
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
+import logging
 import re
+import time
 from typing import Dict
 
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
 
 class ContentProcessor:
     """Обработка контента с помощью AI"""
     
-    def __init__(self, api_key: str, provider: str = 'claude'):
+    def __init__(self, api_key: str, provider: str = 'claude', metrics=None):
+        """
+        Args:
+            api_key: Ключ API
+            provider: Провайдер AI
+            metrics: MetricsRegistry для задержек и токенов запросов (None — не измерять)
+        """
         self.api_key = api_key
         self.provider = provider
+        self.metrics = metrics
+        # Расход AI с момента запуска процесса
+        self.usage = {'requests': 0, 'input_tokens': 0, 'output_tokens': 0, 'errors': 0}
+        self.last_error = None
         
         if provider == 'claude':
-            self.client = Anthropic(api_key=api_key)
+            # Асинхронный клиент: запросы к AI не блокируют event loop
+            self.client = AsyncAnthropic(api_key=api_key)
             self.model = "claude-3-5-sonnet-20241022"
     
-    async def process_post(self, title: str, description: str, url: str, source: str) -> Dict:
+    async def process_post(self, title: str, description: str, url: str, source: str, tone: str = '') -> Dict:
         """
         Обработка поста: рерайтинг, добавление эмодзи, форматирование
         
@@ -27,6 +44,7 @@ class ContentProcessor:
             description: Описание
             url: Ссылка на источник
             source: Источник (github/habr)
+            tone: Тон поста для канала ('' — по умолчанию)
         
         Returns:
             Dict с обработанным контентом
@@ -37,33 +55,52 @@ class ContentProcessor:
             prompt = self._create_github_prompt(title, description, url)
         else:
             prompt = self._create_habr_prompt(title, description, url)
+        if tone:
+            prompt += f"\n\nТон поста: {tone}"
         
         # Получаем ответ от AI
+        started = time.monotonic()
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=1500,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            with span('ai_request', model=self.model):
+                response = await self.client.messages.create(
+                    model=self.model,
+                    max_tokens=1500,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ]
+                )
+            
+            self.usage['requests'] += 1
+            self.usage['input_tokens'] += response.usage.input_tokens
+            self.usage['output_tokens'] += response.usage.output_tokens
+            if self.metrics is not None:
+                self.metrics.observe('ai_request_seconds', time.monotonic() - started, label=source)
+                self.metrics.incr('ai_tokens', response.usage.input_tokens, label='input')
+                self.metrics.incr('ai_tokens', response.usage.output_tokens, label='output')
             
             formatted_text = response.content[0].text
             
             # Конвертируем в Telegram Markdown V2
-            formatted_text = self._convert_to_telegram_markdown(formatted_text)
+            with span('render'):
+                formatted_text = self._convert_to_telegram_markdown(formatted_text)
             
             return {
                 'title': title,
+                'description': description,
                 'formatted_text': formatted_text,
                 'url': url,
                 'source': source
             }
             
         except Exception as e:
-            print(f"Ошибка AI обработки: {e}")
+            logger.error(f"Ошибка AI обработки: {e}")
+            self.usage['errors'] += 1
+            self.last_error = str(e)
+            if self.metrics is not None:
+                self.metrics.incr('ai_errors', label=source)
             # Fallback: простое форматирование без AI
-            return self._create_fallback_post(title, description, url, source)
+            with span('render', fallback=True):
+                return self._create_fallback_post(title, description, url, source)
     
     def _create_github_prompt(self, title: str, description: str, url: str) -> str:
         """Промпт для GitHub проекта"""
@@ -148,9 +185,11 @@ class ContentProcessor:
         
         return {
             'title': title,
+            'description': description,
             'formatted_text': text,
             'url': url,
-            'source': source
+            'source': source,
+            'fallback': True
         }
     
     def _escape_markdown(self, text: str) -> str:
@@ -1,22 +1,52 @@
 # bot_commands.py
 """
 Telegram команды для управления ботом
-Добавьте этот модуль для возможности управления ботом через Telegram
+
+Обработчики регистрируются в приложении основного процесса (main.py)
+и работают в том же event loop, что и публикация.
 """
 import asyncio
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 from telegram.constants import ParseMode
-from config import Config
-from database.storage import Storage
+from telegram.helpers import escape_markdown
+from config import Config, apply_overrides, load_overrides, save_override
+from database import AsyncStorage
+from pipeline import MetricsRegistry
 
 
 class BotCommands:
     """Обработчик команд для управления ботом через Telegram"""
     
-    def __init__(self, config: Config, storage: Storage):
+    # Варианты значений для кнопок /settings
+    INTERVAL_CHOICES = (1, 3, 6, 12, 24)
+    POSTS_PER_CYCLE_CHOICES = (1, 2, 3, 5, 10)
+    SOURCE_NAMES = {'github': 'GitHub', 'habr': 'Habr'}
+    
+    # Порядок стадий конвейера в /status
+    STAGE_ORDER = ('fetch', 'normalize', 'dedupe', 'rank', 'rewrite', 'validate', 'publish')
+    
+    # Постов на странице истории
+    HISTORY_PAGE_SIZE = 5
+    
+    def __init__(self, config: Config, storage: AsyncStorage, channels: List,
+                 on_settings_change: Optional[Callable[[], None]] = None,
+                 metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            config: Конфигурация основного канала
+            storage: Общее хранилище процесса
+            channels: Каналы процесса (TelegramChannelBot)
+            on_settings_change: Вызывается после сохранения настройки (перечитать конфигурацию)
+            metrics: Метрики процесса для /status
+        """
         self.config = config
         self.storage = storage
+        self.channels = channels
+        self.on_settings_change = on_settings_change
+        self.metrics = metrics or MetricsRegistry()
         self.admin_ids = self._get_admin_ids()
         
     def _get_admin_ids(self) -> list:
@@ -31,6 +61,10 @@ class BotCommands:
         """Проверка, является ли пользователь администратором"""
         return user_id in self.admin_ids
     
+    async def _refresh_config(self):
+        """Учесть настройки, сохранённые через /settings"""
+        self.config = apply_overrides(self.config, await load_overrides(self.storage))
+    
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /start"""
         user = update.effective_user
@@ -46,12 +80,13 @@ class BotCommands:
 
 📋 Доступные команды:
 /stats - Статистика публикаций
+/search - Поиск по опубликованным постам
 /status - Статус бота
 /post - Опубликовать новый пост
 /help - Помощь
 
 🔧 Настройки:
-/settings - Изменить настройки
+/settings [канал] - Изменить настройки канала
 """
         await update.message.reply_text(welcome_text)
     
@@ -61,25 +96,9 @@ class BotCommands:
             await update.message.reply_text("⛔️ Доступ запрещён")
             return
         
-        # Получаем статистику
-        stats_7d = self.storage.get_statistics(7)
-        stats_30d = self.storage.get_statistics(30)
-        
-        stats_text = f"""
-📊 *Статистика публикаций*
-
-За последние 7 дней:
-├ Всего: {stats_7d['total']} постов
-├ GitHub: {stats_7d['github']}
-└ Habr: {stats_7d['habr']}
-
-За последние 30 дней:
-├ Всего: {stats_30d['total']} постов
-├ GitHub: {stats_30d['github']}
-└ Habr: {stats_30d['habr']}
-
-📈 Среднее в день: {stats_30d['total'] / 30:.1f}
-"""
+        # Получаем статистику (один запрос на оба периода, результат кэшируется)
+        stats = await self.storage.get_statistics_multi((7, 30))
+        stats_text = self._format_stats(stats)
         
         keyboard = [
             [InlineKeyboardButton("🔄 Обновить", callback_data='refresh_stats')],
@@ -93,16 +112,40 @@ class BotCommands:
             reply_markup=reply_markup
         )
     
+    def _format_stats(self, stats: dict, refreshed: bool = False) -> str:
+        """Текст статистики за 7 и 30 дней с разбивкой по источникам"""
+        header = "📊 *Статистика публикаций*" + (" (обновлено)" if refreshed else "")
+        blocks = [header]
+        
+        for days in (7, 30):
+            period = stats[days]
+            lines = [f"За последние {days} дней:", f"├ Всего: {period['total']} постов"]
+            sources = dict(period['by_source'])
+            sources.setdefault('github', 0)
+            sources.setdefault('habr', 0)
+            names = {'github': 'GitHub', 'habr': 'Habr'}
+            items = sorted(sources.items(), key=lambda item: (item[0] not in names, item[0]))
+            for i, (source, count) in enumerate(items):
+                prefix = "└" if i == len(items) - 1 else "├"
+                lines.append(f"{prefix} {names.get(source, source)}: {count}")
+            blocks.append("\n".join(lines))
+        
+        if not refreshed:
+            blocks.append(f"📈 Среднее в день: {stats[30]['total'] / 30:.1f}")
+        
+        return "\n" + "\n\n".join(blocks) + "\n"
+    
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /status - статус бота"""
         if not self.is_admin(update.effective_user.id):
             await update.message.reply_text("⛔️ Доступ запрещён")
             return
         
+        await self._refresh_config()
         status_text = f"""
 🤖 *Статус бота*
 
-✅ Бот работает нормально
+{self._runtime_text(self.metrics.snapshot(), await self.storage.outbox_counts())}
 
 ⚙️ *Настройки:*
 ├ Режим: {self.config.run_mode}
@@ -114,7 +157,7 @@ class BotCommands:
 ├ GitHub: {'✅' if self.config.sources.get('github_enabled') else '❌'}
 └ Habr: {'✅' if self.config.sources.get('habr_enabled') else '❌'}
 
-💾 База данных: {self.storage.db_path}
+💾 База данных: {escape_markdown(str(self.storage.db_path))}
 """
         
         await update.message.reply_text(
@@ -122,38 +165,351 @@ class BotCommands:
             parse_mode=ParseMode.MARKDOWN
         )
     
+    @staticmethod
+    def _format_time(moment: Optional[datetime]) -> str:
+        """Время события: только часы для сегодняшнего, иначе с датой"""
+        if moment is None:
+            return '—'
+        if moment.date() == datetime.now(moment.tzinfo).date():
+            return f"{moment:%H:%M:%S}"
+        return f"{moment:%d.%m %H:%M}"
+    
+    def _runtime_text(self, snapshot: dict, outbox_counts: dict) -> str:
+        """Текущее состояние процесса по метрикам (Markdown)"""
+        values = snapshot['values']
+        gauges = snapshot['gauges']
+        blocks = []
+        
+        # Каналы: идущий или последний цикл и следующий запуск
+        lines = ["📡 *Каналы:*"]
+        for channel in self.channels:
+            name = escape_markdown(str(channel.config.channel_id))
+            last = values.get('last_cycle', {}).get(channel.channel)
+            if channel.cycle_running:
+                started = values.get('cycle_started', {}).get(channel.channel)
+                state = f"🔄 цикл идёт с {self._format_time(started)}"
+            elif last:
+                state = (f"последний цикл {self._format_time(last['started_at'])}, "
+                         f"{last['duration']:.0f} с, опубликовано {last['published']}")
+            else:
+                state = "циклов ещё не было"
+            next_run = values.get('next_run', {}).get(channel.channel)
+            if next_run:
+                state += f"; следующий {self._format_time(next_run)}"
+            lines.append(f"├ {name}: {state}")
+            depths = {stage: depth for stage, depth in gauges.get('pipeline_queues', {}).get(channel.channel, {}).items()
+                      if depth}
+            if depths:
+                lines.append("│   очереди: " + ', '.join(f"{stage} {depth}" for stage, depth in depths.items()))
+        blocks.append("\n".join(lines))
+        
+        # Задержки стадий конвейера
+        stages = snapshot['distributions'].get('stage_seconds', {})
+        if stages:
+            errors = snapshot['counters'].get('stage_errors', {})
+            names = sorted(stages, key=lambda stage: (
+                self.STAGE_ORDER.index(stage) if stage in self.STAGE_ORDER else len(self.STAGE_ORDER), stage
+            ))
+            lines = ["⏱ *Стадии (p50 / p95):*"]
+            for stage in names:
+                timing = stages[stage]
+                line = f"├ {stage}: {timing['p50']:.2f} / {timing['p95']:.2f} с ({timing['count']})"
+                if errors.get(stage):
+                    line += f", ошибок {errors[stage]:.0f}"
+                lines.append(line)
+            blocks.append("\n".join(lines))
+        
+        # Очереди отправки
+        sender = gauges.get('sender', {}).get('')
+        lines = ["📤 *Отправка:*"]
+        if sender:
+            lines.append(f"├ В очереди лимитов: {sender['queue_depth']}, отправляется: {sender['in_flight']}")
+            lines.append(f"├ Отправлено: {sender['sent']}, RetryAfter: {sender['retry_after']}, "
+                         f"ошибок: {sender['errors']}")
+            lines.append(f"├ Задержка p50 / p95: {sender['latency_p50']:.2f} / {sender['latency_p95']:.2f} с")
+        lines.append(f"└ Outbox: ожидают {outbox_counts.get('pending', 0)}, "
+                     f"unknown {outbox_counts.get('unknown', 0)}, failed {outbox_counts.get('failed', 0)}")
+        blocks.append("\n".join(lines))
+        
+        # Кэши
+        caches = gauges.get('cache', {})
+        cache_names = {'fetch': 'Парсинг', 'rewrite': 'Рерайтинг', 'images': 'Картинки'}
+        lines = ["💾 *Кэши (попадания):*"]
+        for key, title in cache_names.items():
+            if key in caches:
+                stats = caches[key]
+                lines.append(f"├ {title}: {stats['hit_rate']:.0%} ({stats['hits']}/{stats['hits'] + stats['misses']})")
+        media = gauges.get('media', {}).get('')
+        if media:
+            lines.append(f"└ file\\_id: повторно {media['reused']}, загружено {media['uploads']}")
+        blocks.append("\n".join(lines))
+        
+        # Расход AI
+        ai = gauges.get('ai', {}).get('')
+        if ai:
+            blocks.append(
+                "🧠 *AI:*\n"
+                f"├ Запросов: {ai['requests']}, ошибок: {ai['errors']}\n"
+                f"└ Токенов: {ai['input_tokens']} вход, {ai['output_tokens']} выход"
+            )
+        
+        # Память процесса
+        memory = gauges.get('memory', {}).get('')
+        if memory:
+            limit = f" из {memory['limit_bytes'] / 1024 / 1024:.0f} МБ" if memory['limit_bytes'] else ""
+            lines = ["🧮 *Память:*", f"├ RSS: {memory['rss_bytes'] / 1024 / 1024:.0f} МБ{limit}"]
+            if 'gc_objects' in memory:
+                lines.append(f"├ Объектов gc после цикла: {memory['gc_objects']}")
+            if 'traced_bytes' in memory:
+                lines.append(f"├ tracemalloc: {memory['traced_bytes'] / 1024 / 1024:.1f} МБ, "
+                             f"пик {memory['traced_peak_bytes'] / 1024 / 1024:.1f} МБ")
+                for channel, growth in sorted(values.get('memory_cycle_growth_bytes', {}).items()):
+                    lines.append(f"├ Рост за цикл {escape_markdown(channel or 'основной')}: "
+                                 f"{growth / 1024 / 1024:+.2f} МБ")
+            lines[-1] = '└' + lines[-1][1:]
+            blocks.append("\n".join(lines))
+        
+        # Последние ошибки источников
+        errors = values.get('source_error', {})
+        if errors:
+            lines = ["⚠️ *Последние ошибки источников:*"]
+            for source, error in sorted(errors.items()):
+                lines.append(f"├ {source} ({self._format_time(error['at'])}): "
+                             f"{escape_markdown(error['error'][:200])}")
+            blocks.append("\n".join(lines))
+        
+        return "\n\n".join(blocks)
+    
     async def post_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /post - запустить публикацию вручную"""
         if not self.is_admin(update.effective_user.id):
             await update.message.reply_text("⛔️ Доступ запрещён")
             return
         
-        await update.message.reply_text("🚀 Запускаю публикацию постов...")
+        # /post — все каналы, /post <имя или @канал> — выбранные
+        names = set(context.args or [])
+        channels = [
+            channel for channel in self.channels
+            if not names or channel.channel in names or channel.config.channel_id in names
+        ]
+        if not channels:
+            await update.message.reply_text(f"❓ Каналы не найдены: {', '.join(sorted(names))}")
+            return
+        
+        busy = [channel.config.channel_id for channel in channels if channel.cycle_running]
+        text = "🚀 Запускаю публикацию постов..."
+        if busy:
+            text += f"\n⏳ Уже идёт цикл, новый начнётся после него: {', '.join(busy)}"
+        await update.message.reply_text(text)
+        
+        results = await asyncio.gather(*(channel.run_cycle() for channel in channels), return_exceptions=True)
+        
+        lines = ["✅ Публикация завершена!"]
+        for channel, result in zip(channels, results):
+            if isinstance(result, Exception):
+                lines.append(f"❌ {channel.config.channel_id}: ошибка: {result}")
+            elif result is None:
+                lines.append(f"⚠️ {channel.config.channel_id}: все источники отключены")
+            else:
+                lines.append(f"📤 {channel.config.channel_id}: опубликовано {result['published']}")
+        await update.message.reply_text("\n".join(lines))
+    
+    async def search_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Команда /search - поиск по истории публикаций"""
+        if not self.is_admin(update.effective_user.id):
+            await update.message.reply_text("⛔️ Доступ запрещён")
+            return
+        
+        query = ' '.join(context.args or [])
+        if not query:
+            await update.message.reply_text("🔍 Использование: /search <запрос>")
+            return
+        
+        results = await self.storage.search_published(query, limit=10)
+        if not results:
+            await update.message.reply_text(f"🔍 По запросу «{query}» ничего не найдено")
+            return
+        
+        # Без parse_mode: заголовки и сниппеты могут содержать символы разметки
+        lines = [f"🔍 Результаты по запросу «{query}»:\n"]
+        for i, post in enumerate(results, 1):
+            lines.append(f"{i}. [{post['source']}] {post['title']}")
+            if post['snippet']:
+                lines.append(f"   {post['snippet']}")
+            lines.append(f"   🔗 {post['url']}\n")
+        
+        await update.message.reply_text("\n".join(lines), disable_web_page_preview=True)
+    
+    async def _history_page(self, data: str):
+        """
+        Страница истории публикаций по данным кнопки
+        
+        Форматы данных: last_posts и hist:<источник> — первая страница,
+        hist:<источник>:o|n:<id>:<published_at> — страница старше или новее поста.
+        Источник * означает все источники.
+        """
+        source, cursor, older = '*', None, True
+        if data.startswith('hist:'):
+            parts = data.split(':', 4)
+            source = parts[1]
+            if len(parts) == 5:
+                older = parts[2] == 'o'
+                cursor = (parts[4], int(parts[3]))
+        
+        page = await self.storage.get_published_page(
+            self.HISTORY_PAGE_SIZE, cursor, older, None if source == '*' else source
+        )
+        
+        title = 'все источники' if source == '*' else self.SOURCE_NAMES.get(source, source)
+        text = f"📝 *История публикаций* ({escape_markdown(title)})\n\n"
+        if not page['posts']:
+            text += "Публикаций нет\n"
+        for post in page['posts']:
+            text += f"• \\[{escape_markdown(post['source'])}] {escape_markdown(post['title'][:60])}\n"
+            text += f"   📅 {str(post['published_at'])[:16]}\n\n"
         
-        # TODO: Интегрировать с основным циклом бота
-        # Здесь должен быть вызов bot.run_posting_cycle()
+        filters = [('*', 'Все')] + list(self.SOURCE_NAMES.items())
+        rows = [[
+            InlineKeyboardButton(f"✅ {name}" if key == source else name, callback_data=f'hist:{key}')
+            for key, name in filters
+        ]]
         
-        await update.message.reply_text("✅ Публикация завершена!")
+        navigation = []
+        if page['has_newer'] and page['posts']:
+            first = page['posts'][0]
+            navigation.append(InlineKeyboardButton(
+                "⬅️ Новее", callback_data=f"hist:{source}:n:{first['id']}:{first['published_at']}"
+            ))
+        if page['has_older'] and page['posts']:
+            last = page['posts'][-1]
+            navigation.append(InlineKeyboardButton(
+                "Старее ➡️", callback_data=f"hist:{source}:o:{last['id']}:{last['published_at']}"
+            ))
+        if navigation:
+            rows.append(navigation)
+        return text, InlineKeyboardMarkup(rows)
     
     async def settings_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Команда /settings - настройки бота"""
+        """Команда /settings [канал] - настройки канала"""
         if not self.is_admin(update.effective_user.id):
             await update.message.reply_text("⛔️ Доступ запрещён")
             return
         
-        keyboard = [
-            [InlineKeyboardButton("🔄 Изменить интервал", callback_data='set_interval')],
-            [InlineKeyboardButton("📊 Постов за цикл", callback_data='set_posts_per_cycle')],
-            [InlineKeyboardButton("📡 Источники", callback_data='set_sources')],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # /settings — основной канал, /settings <имя или @канал> — выбранный
+        index = 0
+        if context.args:
+            name = context.args[0]
+            matches = [i for i, channel in enumerate(self.channels)
+                       if name in (channel.channel, channel.config.channel_id)]
+            if not matches:
+                await update.message.reply_text(f"❓ Канал не найден: {name}")
+                return
+            index = matches[0]
         
+        config = await self._settings_config(index)
         await update.message.reply_text(
-            "⚙️ *Настройки бота*\n\nВыберите параметр для изменения:",
+            self._settings_text(config),
             parse_mode=ParseMode.MARKDOWN,
-            reply_markup=reply_markup
+            reply_markup=self._settings_keyboard(index)
         )
     
+    async def _settings_config(self, index: int) -> Config:
+        """Конфигурация канала с учётом только что сохранённых настроек"""
+        config = self.channels[index].config if index < len(self.channels) else self.config
+        return apply_overrides(config, await load_overrides(self.storage))
+    
+    def _settings_index(self, value: str) -> int:
+        """Номер канала из данных кнопки (кнопки старых сообщений — основной канал)"""
+        index = int(value) if value.isdigit() else 0
+        return index if index < len(self.channels) else 0
+    
+    def _settings_text(self, config: Config, saved: str = '') -> str:
+        """Текущие настройки канала, которые можно изменить кнопками"""
+        sources = ', '.join(
+            name for key, name in self.SOURCE_NAMES.items() if config.sources.get(f'{key}_enabled')
+        ) or 'все отключены'
+        title = "⚙️ *Настройки бота*\n\n"
+        if len(self.channels) > 1:
+            title = f"⚙️ *Настройки канала {escape_markdown(str(config.channel_id))}*\n\n"
+        text = (
+            title +
+            f"├ Интервал: {config.posting_interval_hours}ч\n"
+            f"├ Постов за цикл: {config.posts_per_cycle}\n"
+            f"└ Источники: {sources}\n\n"
+        )
+        if saved:
+            text += f"✅ {saved}. Бот применит изменение без перезапуска.\n\n"
+        return text + "Выберите параметр для изменения:"
+    
+    def _settings_keyboard(self, index: int = 0) -> InlineKeyboardMarkup:
+        """Кнопки выбора параметра (и канала, если их несколько)"""
+        rows = [
+            [InlineKeyboardButton("🔄 Изменить интервал", callback_data=f'set_interval:{index}')],
+            [InlineKeyboardButton("📊 Постов за цикл", callback_data=f'set_posts_per_cycle:{index}')],
+            [InlineKeyboardButton("📡 Источники", callback_data=f'set_sources:{index}')],
+        ]
+        if len(self.channels) > 1:
+            rows.append([
+                InlineKeyboardButton(f"{'✅ ' if i == index else ''}{channel.config.channel_id}",
+                                     callback_data=f'settings:{i}')
+                for i, channel in enumerate(self.channels)
+            ])
+        return InlineKeyboardMarkup(rows)
+    
+    def _choices_keyboard(self, setting: str, config: Config, index: int) -> InlineKeyboardMarkup:
+        """Кнопки значений для выбранного параметра"""
+        if setting == 'set_interval':
+            row = [InlineKeyboardButton(f"{hours}ч", callback_data=f'interval:{hours}:{index}')
+                   for hours in self.INTERVAL_CHOICES]
+            rows = [row]
+        elif setting == 'set_posts_per_cycle':
+            row = [InlineKeyboardButton(str(count), callback_data=f'posts:{count}:{index}')
+                   for count in self.POSTS_PER_CYCLE_CHOICES]
+            rows = [row]
+        else:
+            rows = [
+                [InlineKeyboardButton(
+                    f"{'✅' if config.sources.get(f'{key}_enabled') else '❌'} {name}",
+                    callback_data=f'source:{key}:{index}'
+                )]
+                for key, name in self.SOURCE_NAMES.items()
+            ]
+        rows.append([InlineKeyboardButton("⬅️ Назад", callback_data=f'settings:{index}')])
+        return InlineKeyboardMarkup(rows)
+    
+    async def _save_setting(self, data: str) -> Tuple[str, int]:
+        """
+        Сохранить значение из нажатой кнопки для выбранного канала
+        
+        Каналы применяют сохранённую настройку сразу (on_settings_change),
+        а после перезапуска она загружается из БД. Настройка меняется
+        только у этого канала.
+        
+        Returns:
+            Описание изменения для пользователя и номер канала
+        """
+        kind, value, *rest = data.split(':')
+        index = self._settings_index(rest[0] if rest else '')
+        config = await self._settings_config(index)
+        channel = config.channel_name
+        if kind == 'interval':
+            await save_override(self.storage, 'posting_interval_hours', int(value), channel)
+            saved = f"Интервал: {value}ч"
+        elif kind == 'posts':
+            await save_override(self.storage, 'posts_per_cycle', int(value), channel)
+            saved = f"Постов за цикл: {value}"
+        else:
+            key = f'{value}_enabled'
+            enabled = not config.sources.get(key)
+            # Только переключённый источник: остальные остаются из настроек канала
+            await save_override(self.storage, 'sources', {key: enabled}, channel)
+            saved = f"{self.SOURCE_NAMES.get(value, value)}: {'включён' if enabled else 'отключён'}"
+        
+        await self._refresh_config()
+        if self.on_settings_change:
+            self.on_settings_change()
+        return saved, index
+    
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Команда /help - помощь"""
         if not self.is_admin(update.effective_user.id):
@@ -166,9 +522,10 @@ class BotCommands:
 *Основные команды:*
 /start - Запустить бота
 /stats - Показать статистику
+/search <запрос> - Поиск по опубликованным постам
 /status - Проверить статус бота
-/post - Опубликовать посты вручную
-/settings - Изменить настройки
+/post [канал] - Опубликовать посты сейчас
+/settings [канал] - Изменить настройки канала
 /help - Эта справка
 
 *Описание:*
@@ -201,72 +558,58 @@ class BotCommands:
         
         if query.data == 'refresh_stats':
             # Обновить статистику
-            stats_7d = self.storage.get_statistics(7)
-            stats_30d = self.storage.get_statistics(30)
-            
-            stats_text = f"""
-📊 *Статистика публикаций* (обновлено)
-
-За последние 7 дней:
-├ Всего: {stats_7d['total']} постов
-├ GitHub: {stats_7d['github']}
-└ Habr: {stats_7d['habr']}
-
-За последние 30 дней:
-├ Всего: {stats_30d['total']} постов
-├ GitHub: {stats_30d['github']}
-└ Habr: {stats_30d['habr']}
-"""
+            stats = await self.storage.get_statistics_multi((7, 30))
+            stats_text = self._format_stats(stats, refreshed=True)
             
             await query.edit_message_text(
                 stats_text,
                 parse_mode=ParseMode.MARKDOWN
             )
         
-        elif query.data == 'last_posts':
-            # Показать последние посты
-            last_posts = self.storage.get_last_published(5)
-            
-            posts_text = "📝 *Последние 5 постов:*\n\n"
-            for i, post in enumerate(last_posts, 1):
-                posts_text += f"{i}. [{post['source']}] {post['title'][:50]}...\n"
-                posts_text += f"   📅 {post['published_at']}\n\n"
-            
+        elif query.data == 'last_posts' or query.data.startswith('hist:'):
+            # История публикаций с листанием
+            text, keyboard = await self._history_page(query.data)
             await query.edit_message_text(
-                posts_text,
-                parse_mode=ParseMode.MARKDOWN
+                text,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=keyboard
+            )
+        
+        elif query.data.split(':')[0] == 'settings':
+            index = self._settings_index(query.data.partition(':')[2])
+            await query.edit_message_text(
+                self._settings_text(await self._settings_config(index)),
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=self._settings_keyboard(index)
+            )
+        
+        elif query.data.split(':')[0] in ('set_interval', 'set_posts_per_cycle', 'set_sources'):
+            setting, _, index = query.data.partition(':')
+            index = self._settings_index(index)
+            config = await self._settings_config(index)
+            await query.edit_message_text(
+                self._settings_text(config),
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=self._choices_keyboard(setting, config, index)
+            )
+        
+        elif query.data.startswith(('interval:', 'posts:', 'source:')):
+            saved, index = await self._save_setting(query.data)
+            await query.edit_message_text(
+                self._settings_text(await self._settings_config(index), saved),
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=self._settings_keyboard(index)
             )
     
     def setup_handlers(self, application: Application):
         """Настройка обработчиков команд"""
         application.add_handler(CommandHandler("start", self.start_command))
         application.add_handler(CommandHandler("stats", self.stats_command))
+        application.add_handler(CommandHandler("search", self.search_command))
         application.add_handler(CommandHandler("status", self.status_command))
-        application.add_handler(CommandHandler("post", self.post_command))
+        # Цикл публикации идёт долго: остальные команды не должны его ждать
+        application.add_handler(CommandHandler("post", self.post_command, block=False))
         application.add_handler(CommandHandler("settings", self.settings_command))
         application.add_handler(CommandHandler("help", self.help_command))
         application.add_handler(CallbackQueryHandler(self.button_callback))
 
-
-async def run_command_bot():
-    """
-    Запуск бота для обработки команд (отдельный процесс)
-    Добавьте это в отдельный скрипт или запускайте параллельно с основным ботом
-    """
-    config = Config.load()
-    storage = Storage(config.database_path)
-    
-    # Создаём приложение
-    application = Application.builder().token(config.telegram_bot_token).build()
-    
-    # Настраиваем команды
-    bot_commands = BotCommands(config, storage)
-    bot_commands.setup_handlers(application)
-    
-    # Запускаем
-    print("🤖 Бот команд запущен...")
-    await application.run_polling()
-
-
-if __name__ == '__main__':
-    asyncio.run(run_command_bot())
\ No newline at end of file
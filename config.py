@@ -2,12 +2,34 @@
 """
 Конфигурация бота
 """
+import asyncio
+import json
+import logging
 import os
-from dataclasses import dataclass
-from typing import Dict
-from dotenv import load_dotenv
+import re
+from dataclasses import dataclass, fields, replace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Переменные, заданные окружением процесса: .env их не переопределяет
+_PROCESS_ENV = frozenset(os.environ)
 
 load_dotenv()
+# Переменные, взятые из .env: при перечитывании удалённые из файла ключи снимаются
+_DOTENV_KEYS = set(os.environ) - _PROCESS_ENV
+
+
+def _parse_mapping(value: str, cast: Callable = str) -> Dict:
+    """Разбор строки вида 'key=value,key2=value2' в словарь"""
+    result = {}
+    for pair in value.split(','):
+        if '=' not in pair:
+            continue
+        key, raw = pair.split('=', 1)
+        result[key.strip()] = cast(raw.strip())
+    return result
 
 
 @dataclass
@@ -21,9 +43,19 @@ class Config:
     # AI API (Claude или OpenAI)
     ai_api_key: str
     ai_provider: str = 'claude'  # 'claude' или 'openai'
+    ai_tone: str = ''                # Тон постов, например 'строгий, без восклицаний'
+    
+    # Несколько каналов в одном процессе
+    channel_name: str = ''           # Имя канала в истории публикаций ('' — основной канал)
+    channels_file: str = ''          # JSON со списком каналов и их настроек
+    fetch_cache_ttl: int = 600       # Сколько секунд результаты парсеров общие для каналов
+    rewrite_cache_size: int = 1000   # Сколько AI-рерайтов хранить для повторного использования
     
     # База данных
     database_path: str = 'bot_data.db'
+    database_url: str = ''           # postgresql://... — общая БД для нескольких экземпляров
+    database_pool_size: int = 5
+    archive_dir: str = ''            # Куда переносить записи при очистке ('' — не архивировать)
     
     # Источники контента
     sources: Dict = None
@@ -36,13 +68,65 @@ class Config:
     habr_period: str = 'daily'       # daily, weekly, monthly
     habr_limit: int = 10
     
+    # Дедупликация: порог похожести заголовков (0 — не проверять)
+    duplicate_title_threshold: float = 0.8
+    
+    # Ранжирование кандидатов
+    ranking_weights: Dict = None     # Веса сигналов, например {'stars_today': 0.6}
+    ranking_half_life_hours: float = 24.0  # Затухание оценки по возрасту (0 — выключено)
+    
     # Публикация
     posts_per_cycle: int = 3         # Сколько постов публиковать за раз
     delay_between_posts: int = 300   # Задержка между постами (секунды)
     posting_interval_hours: int = 6  # Интервал между циклами (часы)
+    posting_slots: List = None       # Ежедневные слоты вместо интервала, например ['09:00', '18:30']
+    posting_window_minutes: int = 0  # Растянуть посты цикла на окно (0 — delay_between_posts)
+    telegram_global_rate: float = 25  # Сообщений в секунду на бота (лимит Telegram ~30)
+    telegram_chat_rate: float = 20    # Сообщений в минуту в один канал
+    telegram_chat_burst: int = 3      # Сообщений подряд в канал без паузы
+    telegram_max_retries: int = 5     # Повторов при RetryAfter и сетевых ошибках
+    post_images: bool = True          # Публиковать посты с картинками (фото или альбом)
+    image_prefetch_workers: int = 4   # Сколько картинок загружать одновременно
+    outbox_max_attempts: int = 5     # Попыток отправки поста из outbox
+    outbox_retry_delay: int = 60     # Задержка перед первым повтором (секунды, дальше удваивается)
+    
+    # Конвейер обработки
+    pipeline_workers: Dict = None    # Воркеров на стадию, например {'rewrite': 3}
+    pipeline_queue_size: int = 10    # Размер очереди между стадиями
     
     # Режим работы
     run_mode: str = 'continuous'     # 'once' или 'continuous'
+    config_watch_interval: int = 5   # Проверка изменений .env и /settings (секунды, 0 — только SIGHUP)
+    
+    # Приём команд: webhook вместо long polling
+    webhook_url: str = ''            # Внешний адрес, например https://bot.example.com ('' — polling)
+    webhook_listen: str = '0.0.0.0'  # Адрес встроенного HTTP-сервера
+    webhook_port: int = 8080
+    webhook_path: str = '/telegram'
+    webhook_secret: str = ''         # Секрет webhook (обязателен с webhook_url)
+    update_workers: int = 8          # Сколько команд обрабатывать одновременно
+    
+    # Логирование (JSON через очередь, запись в отдельном потоке)
+    log_level: str = 'INFO'
+    log_format: str = 'json'         # 'json' или 'text'
+    log_file: str = ''               # Файл с ротацией по размеру ('' — stdout)
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    
+    # Трассировка обработки материалов
+    trace_file: str = ''             # JSONL-файл спанов ('' — не писать)
+    trace_otlp_endpoint: str = ''    # Коллектор OTLP/HTTP, например http://localhost:4318/v1/traces
+    trace_sample_rate: float = 1.0   # Доля трассируемых материалов
+    
+    # Метрики Prometheus (GET /metrics)
+    metrics_port: int = 0            # Порт HTTP-сервера метрик (0 — экспорт выключен)
+    metrics_listen: str = '127.0.0.1'
+    
+    # Память (непрерывный режим)
+    memory_tracking: bool = False    # tracemalloc: рост памяти за цикл и места выделения
+    memory_trace_frames: int = 10    # Глубина стека для каждого выделения
+    memory_leak_threshold_mb: float = 5.0  # Рост за цикл, после которого пишется предупреждение
+    memory_top_sites: int = 10       # Сколько мест выделения показывать
     
     @classmethod
     def load(cls):
@@ -52,7 +136,15 @@ class Config:
             channel_id=os.getenv('CHANNEL_ID'),
             ai_api_key=os.getenv('AI_API_KEY'),
             ai_provider=os.getenv('AI_PROVIDER', 'claude'),
+            ai_tone=os.getenv('AI_TONE', ''),
+            channel_name=os.getenv('CHANNEL_NAME', ''),
+            channels_file=os.getenv('CHANNELS_FILE', ''),
+            fetch_cache_ttl=int(os.getenv('FETCH_CACHE_TTL', '600')),
+            rewrite_cache_size=int(os.getenv('REWRITE_CACHE_SIZE', '1000')),
             database_path=os.getenv('DATABASE_PATH', 'bot_data.db'),
+            database_url=os.getenv('DATABASE_URL', ''),
+            database_pool_size=int(os.getenv('DATABASE_POOL_SIZE', '5')),
+            archive_dir=os.getenv('ARCHIVE_DIR', ''),
             sources={
                 'github_enabled': os.getenv('GITHUB_ENABLED', 'true').lower() == 'true',
                 'habr_enabled': os.getenv('HABR_ENABLED', 'true').lower() == 'true',
@@ -61,8 +153,273 @@ class Config:
             github_period=os.getenv('GITHUB_PERIOD', 'daily'),
             habr_period=os.getenv('HABR_PERIOD', 'daily'),
             habr_limit=int(os.getenv('HABR_LIMIT', '10')),
+            duplicate_title_threshold=float(os.getenv('DUPLICATE_TITLE_THRESHOLD', '0.8')),
+            ranking_weights=_parse_mapping(os.getenv('RANKING_WEIGHTS', ''), float),
+            ranking_half_life_hours=float(os.getenv('RANKING_HALF_LIFE_HOURS', '24')),
             posts_per_cycle=int(os.getenv('POSTS_PER_CYCLE', '3')),
             delay_between_posts=int(os.getenv('DELAY_BETWEEN_POSTS', '300')),
             posting_interval_hours=int(os.getenv('POSTING_INTERVAL_HOURS', '6')),
+            posting_slots=[slot.strip() for slot in os.getenv('POSTING_SLOTS', '').split(',') if slot.strip()],
+            posting_window_minutes=int(os.getenv('POSTING_WINDOW_MINUTES', '0')),
+            telegram_global_rate=float(os.getenv('TELEGRAM_GLOBAL_RATE', '25')),
+            telegram_chat_rate=float(os.getenv('TELEGRAM_CHAT_RATE', '20')),
+            telegram_chat_burst=int(os.getenv('TELEGRAM_CHAT_BURST', '3')),
+            telegram_max_retries=int(os.getenv('TELEGRAM_MAX_RETRIES', '5')),
+            post_images=os.getenv('POST_IMAGES', 'true').lower() == 'true',
+            image_prefetch_workers=int(os.getenv('IMAGE_PREFETCH_WORKERS', '4')),
+            outbox_max_attempts=int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5')),
+            outbox_retry_delay=int(os.getenv('OUTBOX_RETRY_DELAY', '60')),
+            pipeline_workers=_parse_mapping(os.getenv('PIPELINE_WORKERS', ''), int),
+            pipeline_queue_size=int(os.getenv('PIPELINE_QUEUE_SIZE', '10')),
             run_mode=os.getenv('RUN_MODE', 'continuous'),
+            config_watch_interval=int(os.getenv('CONFIG_WATCH_INTERVAL', '5')),
+            webhook_url=os.getenv('WEBHOOK_URL', ''),
+            webhook_listen=os.getenv('WEBHOOK_LISTEN', '0.0.0.0'),
+            webhook_port=int(os.getenv('WEBHOOK_PORT', '8080')),
+            webhook_path=os.getenv('WEBHOOK_PATH', '/telegram'),
+            webhook_secret=os.getenv('WEBHOOK_SECRET', ''),
+            update_workers=int(os.getenv('UPDATE_WORKERS', '8')),
+            log_level=os.getenv('LOG_LEVEL', 'INFO'),
+            log_format=os.getenv('LOG_FORMAT', 'json'),
+            log_file=os.getenv('LOG_FILE', ''),
+            log_max_bytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+            log_backup_count=int(os.getenv('LOG_BACKUP_COUNT', '5')),
+            trace_file=os.getenv('TRACE_FILE', ''),
+            trace_otlp_endpoint=os.getenv('TRACE_OTLP_ENDPOINT', ''),
+            trace_sample_rate=float(os.getenv('TRACE_SAMPLE_RATE', '1.0')),
+            metrics_port=int(os.getenv('METRICS_PORT', '0')),
+            metrics_listen=os.getenv('METRICS_LISTEN', '127.0.0.1'),
+            memory_tracking=os.getenv('MEMORY_TRACKING', 'false').lower() == 'true',
+            memory_trace_frames=int(os.getenv('MEMORY_TRACE_FRAMES', '10')),
+            memory_leak_threshold_mb=float(os.getenv('MEMORY_LEAK_THRESHOLD_MB', '5')),
+            memory_top_sites=int(os.getenv('MEMORY_TOP_SITES', '10')),
         )
+    
+    # Настройки, общие для всего процесса: их нельзя переопределить для канала
+    SHARED_FIELDS = (
+        'telegram_bot_token', 'ai_api_key', 'ai_provider',
+        'database_path', 'database_url', 'database_pool_size', 'archive_dir',
+        'channels_file', 'fetch_cache_ttl', 'rewrite_cache_size', 'run_mode',
+        'config_watch_interval', 'telegram_global_rate', 'telegram_chat_rate', 'telegram_chat_burst',
+        'telegram_max_retries', 'image_prefetch_workers', 'webhook_url', 'webhook_listen', 'webhook_port',
+        'webhook_path', 'webhook_secret', 'update_workers', 'metrics_port', 'metrics_listen',
+        'log_level', 'log_format', 'log_file', 'log_max_bytes', 'log_backup_count',
+        'trace_file', 'trace_otlp_endpoint', 'trace_sample_rate',
+        'memory_tracking', 'memory_trace_frames', 'memory_leak_threshold_mb', 'memory_top_sites',
+    )
+    
+    def validate(self):
+        """
+        Проверить общие настройки процесса
+        
+        Raises:
+            ValueError: Настройки несовместимы
+        """
+        # Секрет нужен и Telegram, и manage.py webhook-check: случайный при каждом
+        # запуске знает только сам процесс
+        if self.webhook_url and not self.webhook_secret:
+            raise ValueError("С WEBHOOK_URL нужен WEBHOOK_SECRET, например: "
+                             "python -c 'import secrets; print(secrets.token_urlsafe(32))'")
+        if self.webhook_secret and not re.fullmatch(r'[A-Za-z0-9_-]{1,256}', self.webhook_secret):
+            raise ValueError("WEBHOOK_SECRET: от 1 до 256 символов A-Z, a-z, 0-9, _ и -")
+    
+    @classmethod
+    def load_channels(cls) -> List['Config']:
+        """
+        Конфигурации всех каналов процесса
+        
+        Без CHANNELS_FILE — один канал из переменных окружения. Иначе файл
+        содержит список объектов с полями Config, например
+        [{"name": "py", "channel_id": "@py", "github_language": "python"}];
+        неуказанные поля берутся из переменных окружения.
+        
+        Returns:
+            Список конфигураций, по одной на канал
+        
+        Raises:
+            ValueError: Неизвестное или общее поле, повтор имени канала, webhook без секрета
+        """
+        base = cls.load()
+        base.validate()
+        if not base.channels_file:
+            return [base]
+        
+        with open(base.channels_file, encoding='utf-8') as f:
+            entries = json.load(f)
+        
+        known = {field.name for field in fields(cls)}
+        configs = []
+        for entry in entries:
+            overrides = dict(entry)
+            if 'name' in overrides:
+                overrides['channel_name'] = overrides.pop('name')
+            unknown = set(overrides) - known
+            if unknown:
+                raise ValueError(f"Неизвестные настройки канала: {', '.join(sorted(unknown))}")
+            shared = set(overrides) & set(cls.SHARED_FIELDS)
+            if shared:
+                raise ValueError(f"Настройки общие для процесса, их нельзя задать каналу: {', '.join(sorted(shared))}")
+            if 'sources' in overrides:
+                overrides['sources'] = {**base.sources, **overrides['sources']}
+            configs.append(replace(base, **overrides))
+        
+        names = [config.channel_name for config in configs]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Имена каналов должны быть уникальными: {names}")
+        
+        return configs
+
+
+# ----------------------------------------------------------------------
+# Перезагрузка настроек без перезапуска
+# ----------------------------------------------------------------------
+
+# Ключ таблицы состояния с настройками, изменёнными через /settings
+OVERRIDES_STATE_KEY = 'config.overrides'
+# Ключ настроек по каналам внутри сохранённых настроек
+CHANNEL_OVERRIDES_KEY = 'channels'
+
+
+def reload_env():
+    """
+    Перечитать .env (переменные окружения процесса остаются приоритетными)
+    
+    Ключи, удалённые из .env, убираются из окружения: настройка
+    возвращается к значению по умолчанию, как после перезапуска.
+    """
+    values = {key: value for key, value in dotenv_values(find_dotenv(usecwd=True)).items()
+              if key not in _PROCESS_ENV and value is not None}
+    for key in _DOTENV_KEYS - set(values):
+        os.environ.pop(key, None)
+    os.environ.update(values)
+    _DOTENV_KEYS.clear()
+    _DOTENV_KEYS.update(values)
+
+
+def apply_overrides(config: Config, overrides: Dict[str, Any]) -> Config:
+    """
+    Применить к конфигурации канала настройки из /settings
+    
+    Настройки хранятся по каналам: {'channels': {имя канала: {поле: значение}}}.
+    Поля верхнего уровня — формат до разделения по каналам, они действуют
+    на все каналы и перекрываются настройками канала. Неизвестные и общие
+    для процесса поля пропускаются, источники объединяются с текущими.
+    """
+    known = {field.name for field in fields(Config)} - set(Config.SHARED_FIELDS)
+    legacy = {name: value for name, value in overrides.items() if name != CHANNEL_OVERRIDES_KEY}
+    scoped = overrides.get(CHANNEL_OVERRIDES_KEY, {}).get(config.channel_name, {})
+    values = {}
+    for layer in (legacy, scoped):
+        for name, value in layer.items():
+            if name not in known:
+                logger.warning(f"Пропущена неизвестная настройка: {name}")
+                continue
+            if name == 'sources':
+                value = {**values.get('sources', config.sources), **value}
+            values[name] = value
+    return replace(config, **values)
+
+
+async def load_overrides(storage) -> Dict[str, Any]:
+    """Настройки, изменённые через /settings"""
+    raw = await storage.get_state(OVERRIDES_STATE_KEY)
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except ValueError:
+        logger.error(f"Некорректные сохранённые настройки: {raw}")
+        return {}
+
+
+async def save_override(storage, name: str, value: Any, channel: str = '') -> Dict[str, Any]:
+    """
+    Сохранить настройку канала из /settings
+    
+    Основной процесс подхватит её при следующей проверке изменений.
+    Для sources сохраняются только переданные ключи: остальные источники
+    канала остаются такими, как в .env или CHANNELS_FILE.
+    
+    Args:
+        name: Поле Config
+        value: Новое значение
+        channel: Имя канала ('' — основной канал)
+    
+    Returns:
+        Все сохранённые настройки
+    """
+    overrides = await load_overrides(storage)
+    scoped = overrides.setdefault(CHANNEL_OVERRIDES_KEY, {}).setdefault(channel, {})
+    if name == 'sources':
+        value = {**scoped.get('sources', {}), **value}
+    scoped[name] = value
+    await storage.set_state(OVERRIDES_STATE_KEY, json.dumps(overrides, ensure_ascii=False, sort_keys=True))
+    return overrides
+
+
+class ConfigReloader:
+    """
+    Отслеживание изменений настроек: SIGHUP, изменение .env или
+    CHANNELS_FILE, кнопки /settings (через таблицу состояния)
+    
+    Новая конфигурация собирается целиком и передаётся в on_change;
+    при ошибке в файлах остаётся прежняя.
+    """
+    
+    def __init__(self, storage, on_change: Callable[[List[Config]], Awaitable[None]],
+                 poll_interval: float = 5):
+        """
+        Args:
+            storage: AsyncStorage с таблицей состояния
+            on_change: Корутина, получающая новые конфигурации каналов
+            poll_interval: Период проверки изменений (0 — только по SIGHUP)
+        """
+        self.storage = storage
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self._requested = asyncio.Event()
+        self._fingerprint: Optional[tuple] = None
+    
+    def request(self):
+        """Запросить перезагрузку (обработчик SIGHUP)"""
+        self._requested.set()
+    
+    async def load(self) -> List[Config]:
+        """Собрать конфигурации каналов из .env, CHANNELS_FILE и /settings"""
+        reload_env()
+        overrides = await load_overrides(self.storage)
+        return [apply_overrides(config, overrides) for config in Config.load_channels()]
+    
+    async def _current_fingerprint(self) -> tuple:
+        """Отпечаток источников настроек: время изменения файлов и сохранённые настройки"""
+        mtimes = []
+        for path in (find_dotenv(usecwd=True), os.getenv('CHANNELS_FILE', '')):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns if path else None)
+            except OSError:
+                mtimes.append(None)
+        return (*mtimes, await self.storage.get_state(OVERRIDES_STATE_KEY))
+    
+    async def run(self):
+        """Цикл отслеживания изменений"""
+        self._fingerprint = await self._current_fingerprint()
+        timeout = self.poll_interval if self.poll_interval > 0 else None
+        
+        while True:
+            try:
+                await asyncio.wait_for(self._requested.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            requested = self._requested.is_set()
+            self._requested.clear()
+            
+            try:
+                fingerprint = await self._current_fingerprint()
+                if not requested and fingerprint == self._fingerprint:
+                    continue
+                self._fingerprint = fingerprint
+                
+                logger.info("Перезагрузка настроек" + (" по SIGHUP" if requested else ""))
+                await self.on_change(await self.load())
+            except Exception as e:
+                logger.error(f"Ошибка перезагрузки настроек, остаются прежние: {e}")
@@ -1,3 +1,7 @@
+from .base import BaseStorage
 from .storage import Storage
+from .async_storage import AsyncStorage
+from .archive import PostArchive
+from .factory import create_storage
 
-__all__ = ['Storage']
+__all__ = ['BaseStorage', 'Storage', 'AsyncStorage', 'PostArchive', 'create_storage']
@@ -0,0 +1,94 @@
+# database/archive.py
+"""
+Архив удалённых записей: сжатые JSONL-сегменты, по которым можно
+проверять дубликаты после очистки основной таблицы
+"""
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PostArchive:
+    """Хранилище архивных сегментов published_posts"""
+    
+    SEGMENT_PREFIX = 'published_posts-'
+    SEGMENT_SUFFIX = '.jsonl.gz'
+    
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        # Пары (канал, URL) из всех сегментов
+        self._urls: Optional[Set[Tuple[str, str]]] = None
+        self._lock = threading.Lock()
+        os.makedirs(archive_dir, exist_ok=True)
+    
+    def write_segment(self, records: List[Dict]) -> Optional[str]:
+        """
+        Записать пачку записей в новый сегмент
+        
+        Args:
+            records: Список записей (словари со значениями, сериализуемыми в JSON)
+        
+        Returns:
+            Путь к созданному сегменту или None, если записей нет
+        """
+        if not records:
+            return None
+        
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+        path = os.path.join(self.archive_dir, f"{self.SEGMENT_PREFIX}{stamp}{self.SEGMENT_SUFFIX}")
+        tmp_path = path + '.tmp'
+        
+        # Пишем во временный файл и переименовываем, чтобы не оставить битый сегмент
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=str))
+                f.write('\n')
+        os.replace(tmp_path, path)
+        
+        with self._lock:
+            if self._urls is not None:
+                self._urls.update(self._key(record) for record in records)
+        
+        return path
+    
+    def segments(self) -> List[str]:
+        """Список сегментов архива в хронологическом порядке"""
+        names = [
+            name for name in os.listdir(self.archive_dir)
+            if name.startswith(self.SEGMENT_PREFIX) and name.endswith(self.SEGMENT_SUFFIX)
+        ]
+        return [os.path.join(self.archive_dir, name) for name in sorted(names)]
+    
+    def iter_records(self) -> Iterator[Dict]:
+        """Последовательно прочитать все записи архива"""
+        for path in self.segments():
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+            except (OSError, EOFError, json.JSONDecodeError) as e:
+                logger.error(f"Повреждён сегмент архива {path}: {e}")
+    
+    @staticmethod
+    def _key(record: Dict) -> Tuple[str, str]:
+        """Ключ записи; сегменты до появления каналов относятся к основному каналу"""
+        return record.get('channel') or '', record['url']
+    
+    def contains(self, url: str, channel: str = '') -> bool:
+        """
+        Проверка, есть ли URL канала в архиве
+        
+        Множество URL загружается при первом обращении и дальше
+        поддерживается в памяти при записи новых сегментов.
+        """
+        with self._lock:
+            if self._urls is None:
+                self._urls = {self._key(record) for record in self.iter_records()}
+            return (channel, url) in self._urls
@@ -0,0 +1,255 @@
+# database/async_storage.py
+"""
+Асинхронный фасад над хранилищем: все обращения к БД выполняются
+в отдельном потоке, чтобы дисковые задержки не блокировали event loop
+"""
+import asyncio
+import inspect
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .base import BaseStorage
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStorage:
+    """
+    Обёртка над хранилищем с выделенным потоком БД и очередью запросов
+    
+    Любой публичный метод хранилища доступен как корутина:
+        await storage.is_published(url)
+    
+    Подряд идущие записи (mark_as_published, outbox_complete) объединяются
+    в одну транзакцию.
+    """
+    
+    # Метод записи -> пакетный метод хранилища, выполняющий сразу несколько записей
+    BATCHED_WRITES = {
+        'mark_as_published': 'mark_many_as_published',
+        'outbox_complete': 'outbox_complete_many',
+    }
+    
+    # Записи, которых вызывающий ждёт перед следующим постом: пакет собирается
+    # только из уже пришедших запросов, без ожидания batch_delay
+    UNDELAYED_BATCHES = {'outbox_complete'}
+    
+    def __init__(self, storage: BaseStorage, batch_size: int = 100, batch_delay: float = 0.05, metrics=None):
+        """
+        Args:
+            storage: Синхронное хранилище (SQLite или PostgreSQL)
+            batch_size: Максимальное количество записей в одной транзакции
+            batch_delay: Сколько секунд ждать следующую запись для пакета
+            metrics: MetricsRegistry для времени запросов по методам (None — не измерять)
+        """
+        self.storage = storage
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.metrics = metrics
+        self._queue = queue.Queue()
+        # После close() новые запросы не принимаются
+        self._closing = False
+        self._thread = threading.Thread(target=self._worker, name='storage-db', daemon=True)
+        self._thread.start()
+    
+    def __getattr__(self, name: str):
+        attr = getattr(self.storage, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        
+        async def method(*args, **kwargs):
+            return await self._submit(name, args, kwargs)
+        
+        method.__name__ = name
+        method.__doc__ = attr.__doc__
+        return method
+    
+    async def _submit(self, name: str, args: tuple, kwargs: dict) -> Any:
+        """Поставить запрос в очередь потока БД и дождаться результата"""
+        if self._closing or not self._thread.is_alive():
+            raise RuntimeError("Поток базы данных остановлен")
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((name, args, kwargs, loop, future))
+        return await future
+    
+    async def cleanup_old_records(self, days: int = 90, chunk_size: int = 500, pause: float = 0.05) -> int:
+        """
+        Порционная очистка старых записей
+        
+        Каждая порция — отдельный запрос в очередь потока БД, поэтому
+        остальные запросы выполняются между порциями, а не ждут всю очистку.
+        
+        Args:
+            days: Удалить записи старше N дней
+            chunk_size: Размер одной порции удаления
+            pause: Пауза между порциями (секунды)
+        
+        Returns:
+            Количество удалённых записей
+        """
+        deleted = 0
+        while True:
+            chunk = await self.delete_expired_chunk(days, chunk_size)
+            if not chunk:
+                break
+            deleted += chunk
+            await asyncio.sleep(pause)
+        
+        pruned = await self.outbox_prune(days)
+        
+        if deleted or pruned:
+            while await self.vacuum_step():
+                await asyncio.sleep(pause)
+        
+        return deleted
+    
+    async def close(self):
+        """Дождаться выполнения запросов из очереди и остановить поток БД"""
+        if not self._thread.is_alive():
+            return
+        self._closing = True
+        self._queue.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+        self.storage.close()
+    
+    # ------------------------------------------------------------------
+    # Поток БД
+    # ------------------------------------------------------------------
+    
+    def _worker(self):
+        """Основной цикл потока БД"""
+        pending: List[Optional[tuple]] = []
+        
+        while True:
+            request = pending.pop(0) if pending else self._queue.get()
+            if request is None:
+                break
+            
+            name = request[0]
+            if name in self.BATCHED_WRITES:
+                batch = self._collect_batch(request, pending)
+                self._execute_batch(name, batch)
+            else:
+                self._execute(request)
+        
+        # Запросы, пришедшие после остановки (отложенные и оставшиеся в очереди), завершаем ошибкой
+        while True:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for request in pending:
+            if request is not None:
+                self._resolve(request, exception=RuntimeError("Поток базы данных остановлен"))
+    
+    def _collect_batch(self, first: tuple, pending: list) -> List[tuple]:
+        """
+        Собрать пакет однотипных записей
+        
+        Запросы другого типа, пришедшие во время сбора, откладываются
+        в pending и выполняются сразу после пакета.
+        """
+        batch = [first]
+        wait = first[0] not in self.UNDELAYED_BATCHES
+        while len(batch) < self.batch_size:
+            try:
+                request = self._queue.get(timeout=self.batch_delay) if wait else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            
+            if request is not None and request[0] == first[0]:
+                batch.append(request)
+            else:
+                pending.append(request)
+                break
+        
+        return batch
+    
+    def _execute_batch(self, name: str, batch: List[tuple]):
+        """
+        Выполнить пакет записей одной транзакцией
+        
+        Если пакет не записался, записи выполняются по одной: ошибка
+        одной записи достаётся только её вызывающему.
+        """
+        if len(batch) == 1:
+            self._execute(batch[0])
+            return
+        
+        signature = inspect.signature(getattr(self.storage, name))
+        records: List[Dict] = []
+        valid: List[tuple] = []
+        for request in batch:
+            _, args, kwargs, _, _ = request
+            try:
+                bound = signature.bind(*args, **kwargs)
+            except TypeError as e:
+                # Неверные аргументы — ошибка только этого вызова, поток БД продолжает работу
+                self._resolve(request, exception=e)
+                continue
+            bound.apply_defaults()
+            records.append(dict(bound.arguments))
+            valid.append(request)
+        batch = valid
+        if not batch:
+            return
+        
+        started = time.monotonic()
+        try:
+            getattr(self.storage, self.BATCHED_WRITES[name])(records)
+            self._observe(batch[0], self.BATCHED_WRITES[name], started)
+        except Exception as e:
+            logger.warning(f"Ошибка пакетной записи в БД ({len(batch)} шт.), записываем по одной: {e}")
+            for request in batch:
+                self._execute(request)
+            return
+        
+        for request in batch:
+            self._resolve(request, result=None)
+    
+    def _execute(self, request: tuple):
+        """Выполнить одиночный запрос"""
+        name, args, kwargs, _, _ = request
+        started = time.monotonic()
+        try:
+            result = getattr(self.storage, name)(*args, **kwargs)
+        except Exception as e:
+            self._resolve(request, exception=e)
+        else:
+            self._observe(request, name, started)
+            self._resolve(request, result=result)
+    
+    def _observe(self, request: tuple, method: str, started: float):
+        """Записать время запроса (в event loop: метрики не рассчитаны на запись из потоков)"""
+        if self.metrics is None:
+            return
+        loop = request[3]
+        try:
+            loop.call_soon_threadsafe(self.metrics.observe, 'storage_query_seconds',
+                                      time.monotonic() - started, method)
+        except RuntimeError:
+            pass
+    
+    @staticmethod
+    def _resolve(request: tuple, result: Any = None, exception: Optional[BaseException] = None):
+        """Передать результат в event loop вызывающей корутины"""
+        _, _, _, loop, future = request
+        
+        def set_future():
+            if future.done():
+                return
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        
+        try:
+            loop.call_soon_threadsafe(set_future)
+        except RuntimeError:
+            # Event loop уже закрыт — результат никому не нужен
+            pass
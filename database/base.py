@@ -0,0 +1,387 @@
+# database/base.py
+"""
+Общий интерфейс хранилища публикаций
+
+Конкретные бэкенды (SQLite, PostgreSQL) реализуют абстрактные методы,
+а кэш статистики, проверка архива, сравнение заголовков и порционная
+очистка общие для всех.
+"""
+import re
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .archive import PostArchive
+
+
+class BaseStorage(ABC):
+    """Базовый класс хранилища публикаций"""
+    
+    # Сколько секунд кэшированная статистика считается актуальной
+    STATS_CACHE_TTL = 60
+    
+    # Строка подключения / путь к БД для отображения в статусе
+    db_path: str = ''
+    
+    def __init__(self, archive_dir: Optional[str] = None):
+        # Кэш статистики: windows -> (время расчёта, результат)
+        self._stats_cache: Dict[tuple, tuple] = {}
+        # Архив удалённых при очистке записей (для проверки дубликатов)
+        self.archive = PostArchive(archive_dir) if archive_dir else None
+    
+    # ------------------------------------------------------------------
+    # Схема
+    # ------------------------------------------------------------------
+    
+    @abstractmethod
+    def migrate(self) -> List[Dict]:
+        """Применить недостающие миграции схемы"""
+    
+    @abstractmethod
+    def schema_version(self) -> int:
+        """Текущая версия схемы БД"""
+    
+    @abstractmethod
+    def latest_schema_version(self) -> int:
+        """Версия схемы после применения всех миграций"""
+    
+    def close(self):
+        """Освободить соединения бэкенда"""
+    
+    # ------------------------------------------------------------------
+    # Публикации
+    # ------------------------------------------------------------------
+    
+    @abstractmethod
+    def _url_exists(self, url: str, channel: str = '') -> bool:
+        """Есть ли URL в таблице опубликованных постов канала"""
+    
+    def is_published(self, url: str, channel: str = '') -> bool:
+        """
+        Проверка, был ли пост уже опубликован
+        
+        Args:
+            url: URL поста
+            channel: Имя канала ('' — основной канал)
+        
+        Returns:
+            True если пост уже публиковался в этом канале
+        """
+        if self._url_exists(url, channel):
+            return True
+        # Запись могла быть перенесена в архив при очистке
+        return bool(self.archive and self.archive.contains(url, channel))
+    
+    @abstractmethod
+    def mark_as_published(self, url: str, title: str, published_at: datetime, source: str = 'unknown',
+                          description: str = '', channel: str = ''):
+        """Отметить пост как опубликованный в канале"""
+    
+    @abstractmethod
+    def mark_many_as_published(self, posts: List[Dict]) -> int:
+        """Отметить несколько постов как опубликованные одной транзакцией"""
+    
+    @abstractmethod
+    def get_published_count(self, days: int = 7) -> int:
+        """Количество опубликованных постов за последние N дней"""
+    
+    @abstractmethod
+    def get_statistics(self, days: int = 7) -> dict:
+        """Статистика публикаций за последние N дней"""
+    
+    @abstractmethod
+    def get_last_published(self, limit: int = 10) -> list:
+        """Последние опубликованные посты"""
+    
+    @abstractmethod
+    def _published_page_rows(self, limit: int, cursor: Optional[Tuple], older: bool,
+                             source: Optional[str]) -> List[Dict]:
+        """
+        Посты строго старше (older) или новее курсора в порядке обхода
+        
+        Условие по (published_at, id) читается из индекса с того же места,
+        что и первая страница, поэтому глубокая страница не дороже первой.
+        """
+    
+    def get_published_page(self, limit: int = 5, cursor: Optional[Tuple] = None, older: bool = True,
+                           source: Optional[str] = None) -> Dict:
+        """
+        Страница истории публикаций (keyset-пагинация, новые сверху)
+        
+        Args:
+            limit: Постов на странице
+            cursor: (published_at, id) крайнего поста предыдущей страницы (None — первая страница)
+            older: Листать к более старым (True) или более новым постам
+            source: Только посты источника (None — все)
+        
+        Returns:
+            Словарь posts (новые сверху, у каждого id и published_at для курсора),
+            has_older и has_newer
+        """
+        rows = self._published_page_rows(limit + 1, cursor, older, source)
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if not older:
+            rows.reverse()
+        return {
+            'posts': rows,
+            'has_older': more if older else cursor is not None,
+            'has_newer': cursor is not None if older else more,
+        }
+    
+    # ------------------------------------------------------------------
+    # Состояние бота
+    # ------------------------------------------------------------------
+    
+    @abstractmethod
+    def get_state(self, key: str) -> Optional[str]:
+        """Значение из таблицы состояния (None — ключа нет)"""
+    
+    @abstractmethod
+    def set_state(self, key: str, value: str):
+        """Сохранить значение в таблицу состояния"""
+    
+    # ------------------------------------------------------------------
+    # Outbox: готовые посты до подтверждения отправки
+    # ------------------------------------------------------------------
+    
+    # Статусы записей outbox
+    OUTBOX_PENDING = 'pending'   # ждёт отправки (в том числе повторной)
+    OUTBOX_SENDING = 'sending'   # захвачена отправителем
+    OUTBOX_SENT = 'sent'         # отправлена, пост отмечен опубликованным
+    OUTBOX_FAILED = 'failed'     # попытки исчерпаны
+    OUTBOX_UNKNOWN = 'unknown'   # процесс упал или запрос оборвался во время отправки: результат неизвестен
+    
+    @abstractmethod
+    def outbox_enqueue(self, entry: Dict) -> Optional[int]:
+        """
+        Записать готовый пост в outbox
+        
+        Args:
+            entry: Словарь с ключами idempotency_key, channel, chat_id,
+                url, title, source, description, text и необязательным images
+                (URL картинок через перевод строки)
+        
+        Returns:
+            ID записи или None, если запись с таким ключом уже есть
+        """
+    
+    @abstractmethod
+    def outbox_claim(self, outbox_id: int, now: datetime) -> bool:
+        """Захватить запись для отправки (pending -> sending); False — её уже забрали"""
+    
+    @abstractmethod
+    def outbox_complete(self, outbox_id: int, message_id: Optional[int], published_at: datetime):
+        """Одной транзакцией отметить запись отправленной и пост опубликованным"""
+    
+    @abstractmethod
+    def outbox_complete_many(self, completions: List[Dict]):
+        """outbox_complete для нескольких записей одной транзакцией (ключи outbox_id, message_id, published_at)"""
+    
+    @abstractmethod
+    def outbox_fail(self, outbox_id: int, error: str, retry_at: Optional[datetime], now: datetime):
+        """Вернуть запись в очередь до retry_at или (retry_at=None) пометить неудачной"""
+    
+    @abstractmethod
+    def outbox_mark_unknown(self, outbox_id: int, error: str, now: datetime):
+        """Запрос оборвался после отправки: сообщение могло дойти, автоматически не повторять"""
+    
+    @abstractmethod
+    def outbox_due(self, channel: str, now: datetime, limit: int = 10) -> List[Dict]:
+        """Записи канала, которые пора отправить, в порядке постановки"""
+    
+    @abstractmethod
+    def outbox_recover(self) -> int:
+        """После падения: записи в статусе sending перевести в unknown (один запрос)"""
+    
+    @abstractmethod
+    def outbox_requeue(self, status: str = 'unknown') -> int:
+        """Вернуть записи с указанным статусом в очередь"""
+    
+    @abstractmethod
+    def outbox_urls(self, channel: str) -> List[str]:
+        """URL канала, которые есть в outbox и ещё не отправлены"""
+    
+    @abstractmethod
+    def outbox_counts(self) -> Dict[str, int]:
+        """Количество записей outbox по статусам"""
+    
+    @abstractmethod
+    def outbox_prune(self, days: int = 90) -> int:
+        """Удалить отправленные записи старше N дней"""
+    
+    # ------------------------------------------------------------------
+    # Кэш загруженных файлов: один и тот же файл загружается в Telegram один раз
+    # ------------------------------------------------------------------
+    
+    @abstractmethod
+    def get_media_file_id(self, content_hash: str) -> Optional[str]:
+        """file_id Telegram для содержимого с этим хэшем (None — ещё не загружалось)"""
+    
+    @abstractmethod
+    def save_media_file_id(self, content_hash: str, file_id: str):
+        """Запомнить file_id загруженного в Telegram файла"""
+    
+    @abstractmethod
+    def delete_media_file_id(self, content_hash: str):
+        """Забыть file_id, который Telegram больше не принимает"""
+    
+    # ------------------------------------------------------------------
+    # Статистика
+    # ------------------------------------------------------------------
+    
+    @abstractmethod
+    def _count_by_source(self, windows: Tuple[int, ...]) -> List[tuple]:
+        """
+        Счётчики публикаций по источникам для нескольких периодов
+        
+        Returns:
+            Строки (source, count_1, ..., count_n) в порядке windows
+        """
+    
+    def _invalidate_stats(self):
+        """Сбросить кэш статистики после изменения данных"""
+        self._stats_cache.clear()
+    
+    def get_statistics_multi(self, windows: Sequence[int] = (7, 30)) -> Dict[int, dict]:
+        """
+        Получить статистику сразу за несколько периодов одним запросом
+        
+        Результат кэшируется и сбрасывается при новой публикации
+        или по истечении STATS_CACHE_TTL секунд.
+        
+        Args:
+            windows: Периоды в днях
+        
+        Returns:
+            Словарь {дни: статистика}, статистика в формате get_statistics
+            с дополнительным ключом by_source
+        """
+        key = tuple(sorted(set(windows)))
+        cached = self._stats_cache.get(key)
+        if cached and time.monotonic() - cached[0] < self.STATS_CACHE_TTL:
+            return cached[1]
+        
+        rows = self._count_by_source(key)
+        
+        result = {}
+        for i, days in enumerate(key, 1):
+            by_source = {row[0]: row[i] for row in rows if row[i]}
+            result[days] = {
+                'total': sum(by_source.values()),
+                'github': by_source.get('github', 0),
+                'habr': by_source.get('habr', 0),
+                'days': days,
+                'by_source': by_source,
+            }
+        
+        self._stats_cache[key] = (time.monotonic(), result)
+        return result
+    
+    # ------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        """
+        Слова текста в нижнем регистре (для поисковых запросов и сравнения заголовков)
+        
+        Однобуквенные слова и числа сохраняются: «Vue 2» и «Vue 3» — разные посты.
+        """
+        return [token for token in re.findall(r'\w+', text.lower()) if token.strip('_')]
+    
+    @abstractmethod
+    def search_published(self, query: str, limit: int = 10, source: Optional[str] = None) -> List[Dict]:
+        """Полнотекстовый поиск по опубликованным постам, по убыванию релевантности"""
+    
+    @abstractmethod
+    def _similar_title_candidates(self, tokens: List[str], limit: int = 20, channel: str = '') -> List[Dict]:
+        """Посты канала, в заголовке которых встречается хотя бы одно из слов"""
+    
+    def find_similar_title(self, title: str, threshold: float = 0.8, channel: str = '') -> Optional[Dict]:
+        """
+        Найти уже опубликованный пост с почти таким же заголовком
+        
+        Кандидаты выбираются полнотекстовым поиском по любому из слов
+        заголовка, затем сравниваются по коэффициенту Жаккара на множествах слов.
+        
+        Args:
+            title: Заголовок нового поста
+            threshold: Минимальная похожесть (0..1)
+            channel: Имя канала ('' — основной канал)
+        
+        Returns:
+            Самый похожий пост с ключом similarity или None
+        """
+        tokens = set(self._tokenize(title))
+        if not tokens:
+            return None
+        
+        best = None
+        for candidate in self._similar_title_candidates(sorted(tokens), channel=channel):
+            other = set(self._tokenize(candidate['title']))
+            similarity = len(tokens & other) / len(tokens | other) if other else 0.0
+            if similarity >= threshold and (best is None or similarity > best['similarity']):
+                best = dict(candidate, similarity=similarity)
+        
+        return best
+    
+    # ------------------------------------------------------------------
+    # Очистка
+    # ------------------------------------------------------------------
+    
+    @abstractmethod
+    def delete_expired_chunk(self, days: int = 90, chunk_size: int = 500) -> int:
+        """Удалить (и заархивировать) одну порцию записей старше N дней"""
+    
+    def vacuum_step(self, pages: int = 1000) -> int:
+        """
+        Вернуть файловой системе часть свободного места
+        
+        Returns:
+            Сколько ещё осталось освободить (0 — больше нечего)
+        """
+        return 0
+    
+    def enable_incremental_vacuum(self) -> bool:
+        """
+        Разово подготовить БД к vacuum_step (долгая операция, запускается вручную)
+        
+        Returns:
+            True, если что-то было сделано
+        """
+        return False
+    
+    def cleanup_old_records(self, days: int = 90, chunk_size: int = 500, pause: float = 0.05):
+        """
+        Очистка старых записей из базы данных
+        
+        Записи удаляются порциями, между которыми блокировка записи
+        освобождается, затем бэкенд возвращает освободившееся место.
+        
+        Args:
+            days: Удалить записи старше N дней
+            chunk_size: Размер одной порции удаления
+            pause: Пауза между порциями (секунды)
+        
+        Returns:
+            Количество удалённых записей
+        """
+        deleted = 0
+        while True:
+            chunk = self.delete_expired_chunk(days, chunk_size)
+            if not chunk:
+                break
+            deleted += chunk
+            time.sleep(pause)
+        
+        # Тексты отправленных постов хранятся столько же, сколько история
+        pruned = self.outbox_prune(days)
+        
+        if deleted or pruned:
+            while self.vacuum_step():
+                time.sleep(pause)
+        
+        return deleted
@@ -0,0 +1,34 @@
+# database/factory.py
+"""
+Выбор бэкенда хранилища по конфигурации
+"""
+from .base import BaseStorage
+from .storage import Storage
+
+
+def create_storage(config, auto_migrate: bool = True) -> BaseStorage:
+    """
+    Создать хранилище по настройкам
+    
+    Если задан DATABASE_URL (postgresql://...), используется PostgreSQL,
+    иначе SQLite-файл DATABASE_PATH.
+    
+    Args:
+        config: Конфигурация бота
+        auto_migrate: Применить миграции схемы при создании
+    
+    Returns:
+        Хранилище публикаций
+    """
+    archive_dir = config.archive_dir or None
+    
+    if config.database_url.startswith(('postgres://', 'postgresql://')):
+        from .postgres import PostgresStorage
+        return PostgresStorage(
+            config.database_url,
+            archive_dir=archive_dir,
+            pool_size=config.database_pool_size,
+            auto_migrate=auto_migrate,
+        )
+    
+    return Storage(config.database_path, archive_dir=archive_dir, auto_migrate=auto_migrate)
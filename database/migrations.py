@@ -0,0 +1,253 @@
+# database/migrations.py
+"""
+Версионные миграции схемы SQLite
+
+Текущая версия схемы хранится в PRAGMA user_version. Каждая миграция
+применяется отдельной короткой транзакцией вместе с обновлением версии,
+поэтому прерванный запуск можно просто повторить.
+"""
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    """Одна миграция схемы"""
+    
+    version: int
+    description: str
+    # SQL-запросы или функция, получающая соединение
+    apply: Union[Sequence[str], Callable[[sqlite3.Connection], None]]
+
+
+def add_column(conn: sqlite3.Connection, table: str, column: str, definition: str):
+    """Добавить колонку, если её ещё нет"""
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if column not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def rebuild_table(conn: sqlite3.Connection, table: str, create_sql: str, columns: Sequence[str]):
+    """
+    Пересоздать таблицу с новой схемой, сохранив данные
+    
+    Args:
+        conn: Соединение (внутри транзакции миграции)
+        table: Имя таблицы
+        create_sql: CREATE TABLE для новой схемы с именем {table}
+        columns: Колонки, которые переносятся из старой таблицы
+    """
+    tmp = f'{table}__new'
+    column_list = ', '.join(columns)
+    conn.execute(create_sql.replace(f'CREATE TABLE {table}', f'CREATE TABLE {tmp}', 1))
+    conn.execute(f'INSERT INTO {tmp} ({column_list}) SELECT {column_list} FROM {table}')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {tmp} RENAME TO {table}')
+
+
+def _create_posts_fts(conn: sqlite3.Connection):
+    """Полнотекстовый индекс FTS5 по заголовкам и описаниям опубликованных постов"""
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS published_posts_fts USING fts5(
+                title, description,
+                content='published_posts', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite собран без FTS5: поиск будет недоступен, остальное работает
+        logger.warning(f"FTS5 недоступен, полнотекстовый поиск отключён: {e}")
+        return
+    
+    create_posts_fts_triggers(conn)
+    conn.execute("INSERT INTO published_posts_fts(published_posts_fts) VALUES ('rebuild')")
+
+
+def _add_posts_channel(conn: sqlite3.Connection):
+    """
+    Колонка channel: один URL может публиковаться в нескольких каналах
+    
+    UNIQUE(url) заменяется на UNIQUE(channel, url), для этого таблица
+    пересоздаётся. Существующие записи относятся к основному каналу ''.
+    """
+    rebuild_table(conn, 'published_posts', '''
+        CREATE TABLE published_posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL DEFAULT '',
+            url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            source TEXT NOT NULL,
+            published_at TIMESTAMP NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            description TEXT DEFAULT '',
+            UNIQUE (channel, url)
+        )
+    ''', ['id', 'url', 'title', 'source', 'published_at', 'created_at', 'description'])
+    
+    # Индексы и триггеры удаляются вместе со старой таблицей
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_published_at ON published_posts(published_at)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_source_published_at ON published_posts(source, published_at)')
+    has_fts = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'published_posts_fts'"
+    ).fetchone()
+    if has_fts:
+        # rowid сохранены, поэтому содержимое индекса остаётся актуальным
+        create_posts_fts_triggers(conn)
+
+
+def create_posts_fts_triggers(conn: sqlite3.Connection):
+    """Триггеры, синхронизирующие published_posts_fts с published_posts"""
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS published_posts_fts_insert AFTER INSERT ON published_posts BEGIN
+            INSERT INTO published_posts_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS published_posts_fts_delete AFTER DELETE ON published_posts BEGIN
+            INSERT INTO published_posts_fts(published_posts_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS published_posts_fts_update AFTER UPDATE ON published_posts BEGIN
+            INSERT INTO published_posts_fts(published_posts_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO published_posts_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    ''')
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'Индекс по дате публикации', [
+        'CREATE INDEX IF NOT EXISTS idx_published_at ON published_posts(published_at)',
+    ]),
+    Migration(2, 'Индекс для статистики по источникам', [
+        'CREATE INDEX IF NOT EXISTS idx_source_published_at ON published_posts(source, published_at)',
+    ]),
+    Migration(3, 'Удаление idx_url (дублирует индекс UNIQUE)', [
+        'DROP INDEX IF EXISTS idx_url',
+    ]),
+    Migration(4, 'Колонка description в published_posts',
+              lambda conn: add_column(conn, 'published_posts', 'description', "TEXT DEFAULT ''")),
+    Migration(5, 'Полнотекстовый индекс FTS5 по опубликованным постам', _create_posts_fts),
+    Migration(6, 'Таблица состояния бота (ключ-значение)', [
+        '''
+        CREATE TABLE IF NOT EXISTS bot_state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    Migration(7, 'Колонка channel и уникальность (channel, url)', _add_posts_channel),
+    Migration(8, 'Outbox готовых постов', [
+        '''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT UNIQUE NOT NULL,
+            channel TEXT NOT NULL DEFAULT '',
+            chat_id TEXT NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            source TEXT NOT NULL,
+            description TEXT DEFAULT '',
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP,
+            last_error TEXT,
+            message_id INTEGER,
+            created_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status, channel, next_attempt_at)',
+    ]),
+    Migration(9, 'Картинки постов и кэш file_id Telegram', [
+        "ALTER TABLE outbox ADD COLUMN images TEXT NOT NULL DEFAULT ''",
+        '''
+        CREATE TABLE IF NOT EXISTS media_files (
+            content_hash TEXT PRIMARY KEY,
+            file_id TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    Migration(10, 'Индексы для постраничной истории по (published_at, id)', [
+        'CREATE INDEX IF NOT EXISTS idx_published_at_id ON published_posts(published_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_source_published_at_id ON published_posts(source, published_at, id)',
+        # Новые индексы покрывают прежние как префикс
+        'DROP INDEX IF EXISTS idx_published_at',
+        'DROP INDEX IF EXISTS idx_source_published_at',
+    ]),
+]
+
+
+def get_version(conn: sqlite3.Connection) -> int:
+    """Текущая версия схемы"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def latest_version() -> int:
+    """Версия схемы после применения всех миграций"""
+    return max((migration.version for migration in MIGRATIONS), default=0)
+
+
+def run_migrations(db_path: str) -> List[Dict]:
+    """
+    Применить все недостающие миграции
+    
+    Args:
+        db_path: Путь к файлу БД
+    
+    Returns:
+        Список применённых миграций с длительностью выполнения
+    """
+    applied = []
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    
+    try:
+        for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+            if get_version(conn) >= migration.version:
+                continue
+            
+            started = time.perf_counter()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Другой процесс мог применить миграцию, пока мы ждали блокировку
+                if get_version(conn) >= migration.version:
+                    conn.execute('ROLLBACK')
+                    continue
+                
+                if callable(migration.apply):
+                    migration.apply(conn)
+                else:
+                    for statement in migration.apply:
+                        conn.execute(statement)
+                
+                conn.execute(f'PRAGMA user_version = {int(migration.version)}')
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                logger.error(f"Миграция {migration.version} ({migration.description}) не применена")
+                raise
+            
+            duration = time.perf_counter() - started
+            logger.info(f"Миграция {migration.version} ({migration.description}) применена за {duration:.3f} с")
+            applied.append({
+                'version': migration.version,
+                'description': migration.description,
+                'duration': duration,
+            })
+    finally:
+        conn.close()
+    
+    return applied
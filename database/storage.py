@@ -1,24 +1,42 @@
 # database/storage.py
 """
-База данных для хранения информации о публикациях
+База данных для хранения информации о публикациях (SQLite)
 """
+import logging
 import sqlite3
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
+from .base import BaseStorage
+from . import migrations
 
-class Storage:
-    """Класс для работы с базой данных"""
+logger = logging.getLogger(__name__)
+
+
+class Storage(BaseStorage):
+    """Класс для работы с базой данных SQLite"""
     
-    def __init__(self, db_path: str = 'bot_data.db'):
+    def __init__(self, db_path: str = 'bot_data.db', archive_dir: Optional[str] = None,
+                 auto_migrate: bool = True):
+        super().__init__(archive_dir)
         self.db_path = db_path
+        self._fts_available: Optional[bool] = None
         self._init_db()
+        if auto_migrate:
+            self.migrate()
     
     def _init_db(self):
         """Инициализация базы данных"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # Инкрементальный auto_vacuum, чтобы файл БД уменьшался после очистки.
+        # Для новой БД режим применяется сразу, существующую переводит
+        # разовый полный VACUUM (manage.py vacuum)
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] == 0:
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
         # Таблица опубликованных постов
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS published_posts (
@@ -31,11 +49,6 @@ class Storage:
             )
         ''')
         
-        # Индекс для быстрого поиска по URL
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_url ON published_posts(url)
-        ''')
-        
         # Таблица статистики
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS statistics (
@@ -52,26 +65,40 @@ class Storage:
         conn.commit()
         conn.close()
     
-    def is_published(self, url: str) -> bool:
+    def migrate(self) -> List[Dict]:
         """
-        Проверка, был ли пост уже опубликован
-        
-        Args:
-            url: URL поста
+        Применить недостающие миграции схемы
         
         Returns:
-            True если пост уже публиковался
+            Список применённых миграций с длительностью выполнения
         """
+        return migrations.run_migrations(self.db_path)
+    
+    def schema_version(self) -> int:
+        """Текущая версия схемы БД"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return migrations.get_version(conn)
+        finally:
+            conn.close()
+    
+    def latest_schema_version(self) -> int:
+        """Версия схемы после применения всех миграций"""
+        return migrations.latest_version()
+    
+    def _url_exists(self, url: str, channel: str = '') -> bool:
+        """Есть ли URL в таблице опубликованных постов канала"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute('SELECT id FROM published_posts WHERE url = ?', (url,))
+        cursor.execute('SELECT id FROM published_posts WHERE channel = ? AND url = ?', (channel, url))
         result = cursor.fetchone()
         
         conn.close()
         return result is not None
     
-    def mark_as_published(self, url: str, title: str, published_at: datetime, source: str = 'unknown'):
+    def mark_as_published(self, url: str, title: str, published_at: datetime, source: str = 'unknown',
+                          description: str = '', channel: str = ''):
         """
         Отметить пост как опубликованный
         
@@ -80,23 +107,62 @@ class Storage:
             title: Заголовок поста
             published_at: Время публикации
             source: Источник (github/habr)
+            description: Описание (попадает в полнотекстовый индекс)
+            channel: Имя канала ('' — основной канал)
         """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         try:
             cursor.execute('''
-                INSERT INTO published_posts (url, title, source, published_at)
-                VALUES (?, ?, ?, ?)
-            ''', (url, title, source, published_at))
+                INSERT INTO published_posts (url, title, source, published_at, description, channel)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (url, title, source, published_at, description or '', channel or ''))
             
             conn.commit()
+            self._invalidate_stats()
         except sqlite3.IntegrityError:
-            # URL уже существует в базе
+            # URL уже опубликован в этом канале
             pass
         finally:
             conn.close()
     
+    def mark_many_as_published(self, posts: List[Dict]) -> int:
+        """
+        Отметить несколько постов как опубликованные одной транзакцией
+        
+        Args:
+            posts: Список словарей с ключами url, title, published_at, source, description, channel
+        
+        Returns:
+            Количество добавленных записей
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('''
+                INSERT OR IGNORE INTO published_posts (url, title, source, published_at, description, channel)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (post['url'], post['title'], post.get('source', 'unknown'), post['published_at'],
+                 post.get('description') or '', post.get('channel') or '')
+                for post in posts
+            ])
+            
+            inserted = cursor.rowcount
+            conn.commit()
+            self._invalidate_stats()
+        except Exception:
+            # Иначе оборванный executemany держит блокировку записи и после close():
+            # AsyncStorage сразу повторяет записи пакета по одной
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return inserted
+    
     def get_published_count(self, days: int = 7) -> int:
         """
         Получить количество опубликованных постов за последние N дней
@@ -157,6 +223,412 @@ class Storage:
             'days': days
         }
     
+    def get_state(self, key: str) -> Optional[str]:
+        """Значение из таблицы состояния (None — ключа нет)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT value FROM bot_state WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        
+        conn.close()
+        return row[0] if row else None
+    
+    def set_state(self, key: str, value: str):
+        """Сохранить значение в таблицу состояния"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT INTO bot_state (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            ''', (key, value))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def outbox_enqueue(self, entry: Dict) -> Optional[int]:
+        """
+        Записать готовый пост в outbox
+        
+        Args:
+            entry: Словарь с ключами idempotency_key, channel, chat_id,
+                url, title, source, description, text
+        
+        Returns:
+            ID записи или None, если запись с таким ключом уже есть
+        """
+        now = datetime.now()
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT OR IGNORE INTO outbox (idempotency_key, channel, chat_id, url, title, source,
+                                              description, text, images, next_attempt_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (entry['idempotency_key'], entry.get('channel') or '', str(entry['chat_id']), entry['url'],
+                  entry['title'], entry.get('source', 'unknown'), entry.get('description') or '',
+                  entry['text'], entry.get('images') or '', now, now, now))
+            outbox_id = cursor.lastrowid if cursor.rowcount else None
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return outbox_id
+    
+    def outbox_claim(self, outbox_id: int, now: datetime) -> bool:
+        """Захватить запись для отправки (pending -> sending); False — её уже забрали"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ? AND status = ?
+            ''', (self.OUTBOX_SENDING, now, outbox_id, self.OUTBOX_PENDING))
+            claimed = cursor.rowcount == 1
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return claimed
+    
+    def outbox_complete(self, outbox_id: int, message_id: Optional[int], published_at: datetime):
+        """Одной транзакцией отметить запись отправленной и пост опубликованным"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE outbox SET status = ?, message_id = ?, last_error = NULL, updated_at = ?
+                WHERE id = ?
+            ''', (self.OUTBOX_SENT, message_id, published_at, outbox_id))
+            cursor.execute('''
+                INSERT OR IGNORE INTO published_posts (url, title, source, published_at, description, channel)
+                SELECT url, title, source, ?, description, channel FROM outbox WHERE id = ?
+            ''', (published_at, outbox_id))
+            conn.commit()
+            self._invalidate_stats()
+        finally:
+            conn.close()
+    
+    def outbox_complete_many(self, completions: List[Dict]):
+        """outbox_complete для нескольких записей одной транзакцией (ключи outbox_id, message_id, published_at)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany('''
+                UPDATE outbox SET status = ?, message_id = ?, last_error = NULL, updated_at = ?
+                WHERE id = ?
+            ''', [(self.OUTBOX_SENT, item['message_id'], item['published_at'], item['outbox_id'])
+                  for item in completions])
+            cursor.executemany('''
+                INSERT OR IGNORE INTO published_posts (url, title, source, published_at, description, channel)
+                SELECT url, title, source, ?, description, channel FROM outbox WHERE id = ?
+            ''', [(item['published_at'], item['outbox_id']) for item in completions])
+            conn.commit()
+            self._invalidate_stats()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def outbox_fail(self, outbox_id: int, error: str, retry_at: Optional[datetime], now: datetime):
+        """Вернуть запись в очередь до retry_at или (retry_at=None) пометить неудачной"""
+        status = self.OUTBOX_PENDING if retry_at else self.OUTBOX_FAILED
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE outbox SET status = ?, last_error = ?, next_attempt_at = ?, updated_at = ?
+                WHERE id = ?
+            ''', (status, error, retry_at, now, outbox_id))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def outbox_mark_unknown(self, outbox_id: int, error: str, now: datetime):
+        """Запрос оборвался после отправки: сообщение могло дойти, автоматически не повторять"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE outbox SET status = ?, last_error = ?, updated_at = ?
+                WHERE id = ?
+            ''', (self.OUTBOX_UNKNOWN, error, now, outbox_id))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def outbox_due(self, channel: str, now: datetime, limit: int = 10) -> List[Dict]:
+        """Записи канала, которые пора отправить, в порядке постановки"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT * FROM outbox
+            WHERE status = ? AND channel = ? AND next_attempt_at <= ?
+            ORDER BY id
+            LIMIT ?
+        ''', (self.OUTBOX_PENDING, channel, now, limit))
+        rows = [dict(row) for row in cursor.fetchall()]
+        
+        conn.close()
+        return rows
+    
+    def outbox_recover(self) -> int:
+        """После падения: записи в статусе sending перевести в unknown (один запрос)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('UPDATE outbox SET status = ? WHERE status = ?',
+                           (self.OUTBOX_UNKNOWN, self.OUTBOX_SENDING))
+            recovered = cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return recovered
+    
+    def outbox_requeue(self, status: str = 'unknown') -> int:
+        """Вернуть записи с указанным статусом в очередь"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                UPDATE outbox SET status = ?, next_attempt_at = ?, updated_at = ?
+                WHERE status = ?
+            ''', (self.OUTBOX_PENDING, datetime.now(), datetime.now(), status))
+            requeued = cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return requeued
+    
+    def outbox_urls(self, channel: str) -> List[str]:
+        """URL канала, которые есть в outbox и ещё не отправлены"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT url FROM outbox WHERE channel = ? AND status != ?', (channel, self.OUTBOX_SENT))
+        urls = [row[0] for row in cursor.fetchall()]
+        
+        conn.close()
+        return urls
+    
+    def outbox_counts(self) -> Dict[str, int]:
+        """Количество записей outbox по статусам"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status')
+        counts = dict(cursor.fetchall())
+        
+        conn.close()
+        return counts
+    
+    def outbox_prune(self, days: int = 90) -> int:
+        """Удалить отправленные записи старше N дней"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('DELETE FROM outbox WHERE status = ? AND updated_at < ?',
+                           (self.OUTBOX_SENT, datetime.now() - timedelta(days=days)))
+            pruned = cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        
+        return pruned
+    
+    def get_media_file_id(self, content_hash: str) -> Optional[str]:
+        """file_id Telegram для содержимого с этим хэшем (None — ещё не загружалось)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT file_id FROM media_files WHERE content_hash = ?', (content_hash,))
+        row = cursor.fetchone()
+        
+        conn.close()
+        return row[0] if row else None
+    
+    def save_media_file_id(self, content_hash: str, file_id: str):
+        """Запомнить file_id загруженного в Telegram файла"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                INSERT INTO media_files (content_hash, file_id, created_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(content_hash) DO UPDATE SET file_id = excluded.file_id
+            ''', (content_hash, file_id))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def delete_media_file_id(self, content_hash: str):
+        """Забыть file_id, который Telegram больше не принимает"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('DELETE FROM media_files WHERE content_hash = ?', (content_hash,))
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _count_by_source(self, windows: Tuple[int, ...]) -> List[tuple]:
+        """Счётчики по источникам для нескольких периодов одним проходом"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        # Одна колонка-счётчик на каждый период, фильтр по самому длинному
+        columns = ', '.join(
+            "SUM(CASE WHEN published_at >= datetime('now', '-' || ? || ' days') THEN 1 ELSE 0 END)"
+            for _ in windows
+        )
+        cursor.execute(f'''
+            SELECT source, {columns}
+            FROM published_posts
+            WHERE published_at >= datetime('now', '-' || ? || ' days')
+            GROUP BY source
+        ''', (*windows, max(windows)))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return rows
+    
+    def _has_fts(self, cursor: sqlite3.Cursor) -> bool:
+        """Доступен ли полнотекстовый индекс (SQLite может быть собран без FTS5)"""
+        if self._fts_available is None:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'published_posts_fts'"
+            )
+            self._fts_available = cursor.fetchone() is not None
+        return self._fts_available
+    
+    def search_published(self, query: str, limit: int = 10, source: Optional[str] = None) -> List[Dict]:
+        """
+        Полнотекстовый поиск по опубликованным постам
+        
+        Args:
+            query: Поисковый запрос (все слова должны встречаться в посте)
+            limit: Максимальное количество результатов
+            source: Ограничить поиск источником
+        
+        Returns:
+            Список постов, отсортированный по релевантности (bm25)
+        """
+        tokens = self._tokenize(query)
+        if not tokens:
+            return []
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            if not self._has_fts(cursor):
+                return []
+            
+            # Каждое слово в кавычках, чтобы спецсимволы FTS5 не ломали запрос
+            match = ' '.join(f'"{token}"*' for token in tokens)
+            source_filter = 'AND p.source = ?' if source else ''
+            params = (match, source, limit) if source else (match, limit)
+            
+            cursor.execute(f'''
+                SELECT p.url, p.title, p.source, p.published_at,
+                       snippet(published_posts_fts, 1, '[', ']', '…', 12),
+                       bm25(published_posts_fts, 10.0, 1.0) AS rank
+                FROM published_posts_fts
+                JOIN published_posts p ON p.id = published_posts_fts.rowid
+                WHERE published_posts_fts MATCH ? {source_filter}
+                ORDER BY rank
+                LIMIT ?
+            ''', params)
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        
+        return [
+            {
+                'url': row[0],
+                'title': row[1],
+                'source': row[2],
+                'published_at': row[3],
+                'snippet': row[4],
+                'rank': row[5],
+            }
+            for row in rows
+        ]
+    
+    def _similar_title_candidates(self, tokens: List[str], limit: int = 20, channel: str = '') -> List[Dict]:
+        """Посты канала, в заголовке которых встречается хотя бы одно из слов"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            if not self._has_fts(cursor):
+                return []
+            
+            match = 'title : (' + ' OR '.join(f'"{token}"' for token in tokens) + ')'
+            cursor.execute('''
+                SELECT p.url, p.title, p.source, p.published_at
+                FROM published_posts_fts
+                JOIN published_posts p ON p.id = published_posts_fts.rowid
+                WHERE published_posts_fts MATCH ? AND p.channel = ?
+                ORDER BY bm25(published_posts_fts, 10.0, 1.0)
+                LIMIT ?
+            ''', (match, channel, limit))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        
+        return [
+            {'url': row[0], 'title': row[1], 'source': row[2], 'published_at': row[3]}
+            for row in rows
+        ]
+    
+    def _published_page_rows(self, limit: int, cursor: Optional[Tuple], older: bool,
+                             source: Optional[str]) -> List[Dict]:
+        """Строки страницы истории в порядке обхода (keyset по (published_at, id))"""
+        conditions = []
+        params = []
+        if source:
+            conditions.append('source = ?')
+            params.append(source)
+        if cursor is not None:
+            conditions.append(f"(published_at, id) {'<' if older else '>'} (?, ?)")
+            params.extend(cursor)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = 'DESC' if older else 'ASC'
+        
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor_db = conn.cursor()
+        
+        cursor_db.execute(f'''
+            SELECT id, url, title, source, published_at
+            FROM published_posts
+            {where}
+            ORDER BY published_at {order}, id {order}
+            LIMIT ?
+        ''', (*params, limit))
+        rows = [dict(row) for row in cursor_db.fetchall()]
+        
+        conn.close()
+        return rows
+    
     def get_last_published(self, limit: int = 10) -> list:
         """
         Получить последние опубликованные посты
@@ -190,23 +662,103 @@ class Storage:
             for row in results
         ]
     
-    def cleanup_old_records(self, days: int = 90):
+    def delete_expired_chunk(self, days: int = 90, chunk_size: int = 500) -> int:
         """
-        Очистка старых записей из базы данных
+        Удалить одну порцию записей старше N дней
+        
+        Перед удалением записи переносятся в архив, если он настроен.
+        Каждая порция удаляется отдельной короткой транзакцией.
         
         Args:
             days: Удалить записи старше N дней
+            chunk_size: Максимальное количество записей в порции
+        
+        Returns:
+            Количество удалённых записей (0 — больше удалять нечего)
         """
         conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute('''
-            DELETE FROM published_posts
-            WHERE published_at < datetime('now', '-' || ? || ' days')
-        ''', (days,))
-        
-        deleted = cursor.rowcount
-        conn.commit()
-        conn.close()
+        try:
+            cursor.execute('''
+                SELECT id, channel, url, title, source, published_at, created_at
+                FROM published_posts
+                WHERE published_at < datetime('now', '-' || ? || ' days')
+                ORDER BY id
+                LIMIT ?
+            ''', (days, chunk_size))
+            rows = [dict(row) for row in cursor.fetchall()]
+            
+            if not rows:
+                return 0
+            
+            if self.archive:
+                self.archive.write_segment(rows)
+            
+            cursor.executemany(
+                'DELETE FROM published_posts WHERE id = ?',
+                [(row['id'],) for row in rows]
+            )
+            deleted = cursor.rowcount
+            conn.commit()
+            self._invalidate_stats()
+        finally:
+            conn.close()
         
         return deleted
+    
+    def vacuum_step(self, pages: int = 1000) -> int:
+        """
+        Вернуть файловой системе часть свободных страниц БД
+        
+        Args:
+            pages: Максимальное количество страниц за один шаг
+        
+        Returns:
+            Количество свободных страниц, оставшихся после шага
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('PRAGMA auto_vacuum')
+            if cursor.fetchone()[0] != 2:
+                # Полный VACUUM переписал бы весь файл под блокировкой записи посреди работы бота
+                logger.warning("БД создана без инкрементального VACUUM, файл после очистки не уменьшается: "
+                            "выполните разово python manage.py vacuum")
+                return 0
+            
+            cursor.execute(f'PRAGMA incremental_vacuum({int(pages)})')
+            cursor.fetchall()
+            
+            cursor.execute('PRAGMA freelist_count')
+            remaining = cursor.fetchone()[0]
+        finally:
+            conn.close()
+        
+        return remaining
+    
+    def enable_incremental_vacuum(self) -> bool:
+        """
+        Перевести существующую БД в режим инкрементального VACUUM
+        
+        Выполняет полный VACUUM: файл переписывается целиком, и всё это
+        время запись в БД заблокирована. Запускается вручную (manage.py vacuum).
+        
+        Returns:
+            True, если БД переведена; False, если режим уже включён
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('PRAGMA auto_vacuum')
+            if cursor.fetchone()[0] == 2:
+                return False
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            cursor.execute('VACUUM')
+        finally:
+            conn.close()
+        
+        return True
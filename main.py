@@ -5,198 +5,842 @@ Telegram Channel Automation Bot
 
 import asyncio
 import logging
+import signal
+import time
+from dataclasses import fields, replace
 from datetime import datetime
-from typing import List, Dict
-import random
+from typing import List, Dict, Optional
 
 from telegram import Bot
 from telegram.constants import ParseMode
-from telegram.error import TelegramError
+from telegram.ext import Application, ContextTypes, JobQueue
 
-from bot_config import Config
+from bot_commands import BotCommands
+from webhook import WebhookServer
+from config import Config, ConfigReloader, apply_overrides, load_overrides
 from parsers.github_parser import GitHubParser
 from parsers.habr_parser import HabrParser
 from ai.content_processor import ContentProcessor
-from database.storage import Storage
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from database import AsyncStorage, create_storage
+from utils.log import log_context, new_correlation_id, setup_logging
+from utils.tracing import JsonlTraceExporter, OtlpTraceExporter, Trace, Tracer, set_attribute, span, use_trace
+from pipeline import (
+    AsyncCache, CandidateRanker, ImagePrefetcher, MediaPublisher, MemoryTracker, MetricsRegistry, MetricsServer,
+    Outbox, Pipeline, PostingScheduler, QuotaGate, Stage, TelegramSender, recover_outbox
 )
+
 logger = logging.getLogger(__name__)
 
 
+class SharedResources:
+    """
+    Ресурсы, общие для всех каналов процесса
+    
+    Один клиент Telegram и AI, одно хранилище и кэши: каналы с одинаковыми
+    настройками источников получают один и тот же результат парсинга,
+    а один и тот же материал с одинаковым тоном переписывается один раз.
+    """
+    
+    # Описание метрик для Prometheus: имя -> (описание, имя метки)
+    METRIC_DESCRIPTIONS = {
+        'cycle_seconds': ('Длительность цикла публикации, с', 'channel'),
+        'cycle_published': ('Опубликовано постов', 'channel'),
+        'cycle_started': ('Начало последнего цикла, unix time', 'channel'),
+        'last_cycle': ('Последний цикл публикации', 'channel'),
+        'next_run': ('Следующий цикл по расписанию, unix time', 'channel'),
+        'pipeline_queues': ('Глубина очередей стадий идущего цикла', 'channel'),
+        'stage_seconds': ('Время обработки элемента стадией конвейера, с', 'stage'),
+        'stage_errors': ('Ошибки стадий конвейера', 'stage'),
+        'source_error': ('Последняя ошибка источника', 'source'),
+        'parser_fetch_seconds': ('Загрузка страницы источника, с', 'source'),
+        'parser_parse_seconds': ('Разбор страницы источника, с', 'source'),
+        'parser_bytes': ('Загружено байт со страниц источника', 'source'),
+        'parser_items': ('Материалов получено из источника', 'source'),
+        'parser_errors': ('Неудачные запросы к источнику', 'source'),
+        'ai_request_seconds': ('Задержка запроса к AI, с', 'source'),
+        'ai_tokens': ('Токены AI', 'kind'),
+        'ai_errors': ('Ошибки запросов к AI', 'source'),
+        'storage_query_seconds': ('Время запроса к БД в потоке БД, с', 'method'),
+        'telegram_send_seconds': ('Отправка в Telegram с ожиданием лимитов и повторами, с', 'method'),
+        'telegram_api_seconds': ('Запрос к Bot API, с', 'method'),
+        'telegram_retries': ('Повторы отправки в Telegram', 'reason'),
+        'telegram_send_errors': ('Неудачные отправки в Telegram', 'method'),
+        'cache': ('Кэши процесса', 'cache'),
+        'memory': ('Память процесса: RSS, лимит контейнера, объекты gc, tracemalloc (байты)', 'label'),
+        'memory_cycle_growth_bytes': ('Рост памяти под tracemalloc за последний цикл, байт', 'channel'),
+    }
+    
+    def __init__(self, config: Config, bot: Optional[Bot] = None):
+        """
+        Args:
+            config: Конфигурация (общие для процесса поля)
+            bot: Клиент Telegram приложения команд (None — создать свой)
+        """
+        # Метрики процесса для /status и Prometheus
+        self.metrics = MetricsRegistry()
+        for name, (help_text, label_name) in self.METRIC_DESCRIPTIONS.items():
+            self.metrics.describe(name, help_text, label_name)
+        # Парсеры, AI, БД и отправка измеряются, только если включён экспорт (METRICS_PORT)
+        exported = self.metrics if config.metrics_port else None
+        
+        self.bot = bot or Bot(token=config.telegram_bot_token)
+        # Все отправки идут через общий лимит бота и лимиты каналов
+        self.sender = TelegramSender(
+            self.bot,
+            global_rate=config.telegram_global_rate,
+            chat_rate_per_minute=config.telegram_chat_rate,
+            chat_burst=config.telegram_chat_burst,
+            max_retries=config.telegram_max_retries,
+            metrics=exported
+        )
+        self.github_parser = GitHubParser(metrics=exported)
+        self.habr_parser = HabrParser(metrics=exported)
+        self.ai_processor = ContentProcessor(config.ai_api_key, metrics=exported)
+        # Все обращения к БД идут через отдельный поток, чтобы не блокировать event loop
+        self.storage = AsyncStorage(create_storage(config), metrics=exported)
+        self.fetch_cache = AsyncCache(ttl=config.fetch_cache_ttl, max_size=64)
+        self.rewrite_cache = AsyncCache(max_size=config.rewrite_cache_size)
+        # Картинки загружаются один раз и дальше отправляются по file_id
+        self.media = MediaPublisher(self.storage, self.sender, ImagePrefetcher(config.image_prefetch_workers))
+        # Трассы материалов (TRACE_OTLP_ENDPOINT или TRACE_FILE; без них выключено)
+        exporter = None
+        if config.trace_otlp_endpoint:
+            exporter = OtlpTraceExporter(config.trace_otlp_endpoint)
+        elif config.trace_file:
+            exporter = JsonlTraceExporter(config.trace_file)
+        self.tracer = Tracer(exporter, config.trace_sample_rate)
+        # RSS и объекты gc; рост памяти по циклам — с MEMORY_TRACKING
+        self.memory = MemoryTracker(config.memory_trace_frames, config.memory_top_sites,
+                                    config.memory_leak_threshold_mb, metrics=self.metrics)
+        
+        # Общие компоненты читаются в момент запроса /status или /metrics
+        self.metrics.register('cache', self.fetch_cache.stats, label='fetch')
+        self.metrics.register('cache', self.rewrite_cache.stats, label='rewrite')
+        self.metrics.register('cache', self.media.prefetcher.stats, label='images')
+        self.metrics.register('media', self.media.stats)
+        self.metrics.register('sender', self.sender.stats)
+        self.metrics.register('ai', lambda: dict(self.ai_processor.usage))
+        self.metrics.register('memory', self.memory.stats)
+    
+    async def close(self):
+        """Закрыть HTTP-сессию картинок и хранилище"""
+        await self.media.prefetcher.close()
+        await self.storage.close()
+
+
 class TelegramChannelBot:
     """Основной класс бота для автоматизации Telegram-канала"""
     
-    def __init__(self, config: Config):
+    # Максимальная длина сообщения Telegram
+    MAX_MESSAGE_LENGTH = 4096
+    
+    # Количество воркеров по умолчанию для каждой стадии конвейера
+    DEFAULT_STAGE_WORKERS = {
+        'fetch': 2,
+        'normalize': 1,
+        'dedupe': 2,
+        'rewrite': 2,
+        'validate': 1,
+        'publish': 1,
+    }
+    
+    # Настройки, от которых зависят ранжирование и расписание
+    RANKING_FIELDS = {'ranking_weights', 'ranking_half_life_hours'}
+    SCHEDULE_FIELDS = {'posting_interval_hours', 'posting_slots'}
+    
+    def __init__(self, config: Config, shared: Optional[SharedResources] = None):
+        """
+        Args:
+            config: Конфигурация канала
+            shared: Ресурсы, общие с другими каналами процесса (None — создать свои)
+        """
         self.config = config
-        self.bot = Bot(token=config.telegram_bot_token)
-        self.github_parser = GitHubParser()
-        self.habr_parser = HabrParser()
-        self.ai_processor = ContentProcessor(config.ai_api_key)
-        self.storage = Storage(config.database_path)
+        self.shared = shared or SharedResources(config)
+        self.bot = self.shared.bot
+        self.sender = self.shared.sender
+        self.media = self.shared.media
+        self.metrics = self.shared.metrics
+        self.github_parser = self.shared.github_parser
+        self.habr_parser = self.shared.habr_parser
+        self.ai_processor = self.shared.ai_processor
+        self.storage = self.shared.storage
+        self.tracer = self.shared.tracer
+        self.channel = config.channel_name
+        self.ranker = CandidateRanker(config.ranking_weights, config.ranking_half_life_hours)
+        # Время следующего цикла хранится в БД и переживает перезапуск
+        self.scheduler = PostingScheduler(
+            self.storage, config.posting_interval_hours, config.posting_slots, name=self.channel
+        )
+        # Квота идущего цикла (None — цикл не выполняется)
+        self._gate: Optional[QuotaGate] = None
+        # Циклы по расписанию и по /post не выполняются одновременно
+        self._cycle_lock = asyncio.Lock()
+        # JobQueue приложения, в которой стоит следующий цикл канала
+        self._job_queue: Optional[JobQueue] = None
+        # Конвейер идущего цикла: глубина его очередей видна в /status
+        self._pipeline: Optional[Pipeline] = None
+        self.metrics.register('pipeline_queues', self.queue_depths, label=self.channel)
+        # Готовые посты сохраняются до отправки и переотправляются при ошибках
+        self.outbox = Outbox(self.storage, self.send_entry, config.outbox_max_attempts, config.outbox_retry_delay,
+                             is_permanent=TelegramSender.is_permanent, is_uncertain=TelegramSender.is_uncertain)
+        
+    def enabled_sources(self) -> List[str]:
+        """Включённые в конфигурации источники"""
+        sources = []
+        if self.config.sources.get('github_enabled', True):
+            sources.append('github')
+        if self.config.sources.get('habr_enabled', True):
+            sources.append('habr')
+        return sources
+    
+    async def fetch_source(self, source: str) -> List[Dict]:
+        """
+        Сбор контента из одного источника
+        
+        Каналы с одинаковыми параметрами источника получают общий результат:
+        парсер вызывается один раз за FETCH_CACHE_TTL секунд.
+        """
+        # Снимок настроек: перезагрузка не должна менять параметры посреди запроса
+        config = self.config
+        if source == 'github':
+            key = (source, config.github_language, config.github_period)
+        elif source == 'habr':
+            key = (source, config.habr_period, config.habr_limit)
+        else:
+            key = (source,)
+        try:
+            with log_context(new_correlation_id(f'fetch-{source}')):
+                return await self.shared.fetch_cache.get_or_create(key, lambda: self._fetch_source(source, config))
+        except Exception as e:
+            self.record_source_error(source, str(e))
+            raise
+    
+    def record_source_error(self, source: str, error: str):
+        """Запомнить последнюю ошибку источника для /status"""
+        self.metrics.set('source_error', {'at': datetime.now(), 'error': error}, label=source)
+    
+    async def _fetch_source(self, source: str, config: Config) -> List[Dict]:
+        """Вызов парсера источника; спаны загрузки и разбора прикладываются к материалам"""
+        if not self.tracer.enabled:
+            return await self._call_parser(source, config)
         
+        # Материалов ещё нет: спаны пишутся во временную трассу и копируются в трассу каждого
+        fetch_trace = Trace()
+        with use_trace(fetch_trace):
+            items = await self._call_parser(source, config)
+        for item in items:
+            item['fetch_spans'] = fetch_trace.spans
+        return items
+    
+    async def _call_parser(self, source: str, config: Config) -> List[Dict]:
+        """Вызов парсера источника"""
+        if source == 'github':
+            logger.info("Парсинг GitHub Trending...")
+            items = await self.github_parser.fetch_trending(
+                language=config.github_language,
+                period=config.github_period
+            )
+            logger.info(f"Собрано {len(items)} проектов с GitHub")
+            if self.github_parser.last_error:
+                self.record_source_error(source, self.github_parser.last_error)
+        elif source == 'habr':
+            logger.info("Парсинг Habr...")
+            items = await self.habr_parser.fetch_articles(
+                period=config.habr_period,
+                limit=config.habr_limit
+            )
+            logger.info(f"Собрано {len(items)} статей с Habr")
+            if self.habr_parser.last_error:
+                self.record_source_error(source, self.habr_parser.last_error)
+        else:
+            logger.warning(f"Неизвестный источник: {source}")
+            items = []
+        
+        # У материалов без даты (GitHub) возраст при ранжировании считается от загрузки:
+        # результат из fetch_cache стареет так же, как статьи с датой
+        fetched_at = datetime.now().astimezone()
+        for item in items:
+            item.setdefault('fetched_at', fetched_at)
+        return items
+    
     async def collect_content(self) -> List[Dict]:
         """Сбор контента из всех источников"""
         logger.info("Начинаем сбор контента...")
         content_items = []
         
-        try:
-            # Парсинг GitHub Trending
-            if self.config.sources.get('github_enabled', True):
-                logger.info("Парсинг GitHub Trending...")
-                github_items = await self.github_parser.fetch_trending(
-                    language=self.config.github_language,
-                    period=self.config.github_period
-                )
-                content_items.extend(github_items)
-                logger.info(f"Собрано {len(github_items)} проектов с GitHub")
+        results = await asyncio.gather(
+            *(self.fetch_source(source) for source in self.enabled_sources()),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка при сборе контента: {result}")
+            else:
+                content_items.extend(result)
             
-            # Парсинг Habr
-            if self.config.sources.get('habr_enabled', True):
-                logger.info("Парсинг Habr...")
-                habr_items = await self.habr_parser.fetch_articles(
-                    period=self.config.habr_period,
-                    limit=self.config.habr_limit
+        return content_items
+    
+    def normalize_item(self, content_item: Dict) -> Optional[Dict]:
+        """Приведение элемента к общему виду; None — элемент непригоден"""
+        title = (content_item.get('title') or '').strip()
+        url = (content_item.get('url') or '').strip()
+        if not title or not url:
+            return None
+        
+        item = {
+            **content_item,
+            'title': title,
+            'url': url,
+            'description': (content_item.get('description') or '').strip(),
+            'source': content_item.get('source', 'unknown'),
+            # Метка всех сообщений лога об этом элементе
+            'correlation_id': new_correlation_id(),
+        }
+        fetch_spans = item.pop('fetch_spans', ())
+        item['trace'] = self.tracer.start_trace(
+            correlation_id=item['correlation_id'], channel=self.channel, source=item['source'],
+            title=title, url=url, outcome='skipped'
+        )
+        if item['trace'] is not None:
+            item['trace'].adopt(fetch_spans)
+        return item
+    
+    async def is_duplicate(self, content_item: Dict) -> bool:
+        """Проверка, публиковался ли уже этот или очень похожий материал"""
+        if await self.storage.is_published(content_item['url'], self.channel):
+            logger.info(f"Контент уже был опубликован: {content_item['title']}")
+            return True
+        
+        # Тот же материал мог прийти из другого источника под похожим заголовком
+        threshold = self.config.duplicate_title_threshold
+        if threshold > 0:
+            similar = await self.storage.find_similar_title(content_item['title'], threshold, self.channel)
+            if similar:
+                logger.info(
+                    f"Похожий пост уже публиковался ({similar['similarity']:.0%}): "
+                    f"{content_item['title']} ~ {similar['title']}"
                 )
-                content_items.extend(habr_items)
-                logger.info(f"Собрано {len(habr_items)} статей с Habr")
-                
+                return True
+        
+        return False
+    
+    async def rewrite_content(self, content_item: Dict) -> Optional[Dict]:
+        """
+        AI обработка: рерайтинг и добавление эмодзи
+        
+        Результат переиспользуется каналами с тем же тоном; запасной
+        вариант без AI не кэшируется, чтобы следующий канал попробовал снова.
+        """
+        title = content_item['title']
+        description = content_item.get('description', '')
+        tone = self.config.ai_tone
+        key = (content_item['url'], title, description, content_item['source'], tone)
+        try:
+            post = await self.shared.rewrite_cache.get_or_create(
+                key,
+                lambda: self.ai_processor.process_post(
+                    title=title,
+                    description=description,
+                    url=content_item['url'],
+                    source=content_item['source'],
+                    tone=tone
+                ),
+                cache_if=lambda result: not result.get('fallback')
+            )
+            return dict(post, images=content_item.get('images') or [],
+                        correlation_id=content_item.get('correlation_id'), trace=content_item.get('trace'))
         except Exception as e:
-            logger.error(f"Ошибка при сборе контента: {e}")
-            
-        return content_items
+            logger.error(f"Ошибка при обработке контента: {e}")
+            return None
     
     async def process_content(self, content_item: Dict) -> Dict:
         """Обработка контента через AI"""
         try:
             # Проверяем, не публиковали ли мы это раньше
-            if self.storage.is_published(content_item['url']):
-                logger.info(f"Контент уже был опубликован: {content_item['title']}")
+            if await self.is_duplicate(content_item):
                 return None
             
-            # AI обработка: рерайтинг и добавление эмодзи
-            processed = await self.ai_processor.process_post(
-                title=content_item['title'],
-                description=content_item.get('description', ''),
-                url=content_item['url'],
-                source=content_item['source']
-            )
-            
-            return processed
+            return await self.rewrite_content(content_item)
             
         except Exception as e:
             logger.error(f"Ошибка при обработке контента: {e}")
             return None
     
-    async def publish_post(self, post_data: Dict) -> bool:
-        """Публикация поста в Telegram-канал"""
-        try:
-            message = post_data['formatted_text']
-            
-            # Публикация в канал
-            await self.bot.send_message(
-                chat_id=self.config.channel_id,
-                text=message,
+    def validate_post(self, post_data: Dict) -> Optional[Dict]:
+        """Проверка готового поста перед публикацией"""
+        text = post_data.get('formatted_text') or ''
+        if not text.strip():
+            logger.warning(f"Пустой текст поста: {post_data.get('title')}")
+            return None
+        if len(text) > self.MAX_MESSAGE_LENGTH:
+            logger.warning(f"Пост длиннее {self.MAX_MESSAGE_LENGTH} символов: {post_data.get('title')}")
+            return None
+        return post_data
+    
+    async def send_entry(self, entry: Dict) -> int:
+        """
+        Отправка записи outbox в канал, возвращает message_id
+        
+        Пост с картинками уходит фото или альбомом с подписью. Если текст
+        длиннее подписи, картинки не загрузились или Telegram их отклонил —
+        обычным сообщением с превью ссылки.
+        """
+        images = [url for url in (entry.get('images') or '').split('\n') if url]
+        if images and self.config.post_images and len(entry['text']) <= MediaPublisher.MAX_CAPTION_LENGTH:
+            with span('send', kind='media', images=len(images)):
+                message = await self.media.send(
+                    entry['chat_id'], images, entry['text'], parse_mode=ParseMode.MARKDOWN_V2
+                )
+            if message is not None:
+                return message.message_id
+        
+        with span('send', kind='text'):
+            message = await self.sender.send_message(
+                chat_id=entry['chat_id'],
+                text=entry['text'],
                 parse_mode=ParseMode.MARKDOWN_V2,
                 disable_web_page_preview=False
             )
-            
-            # Сохраняем информацию о публикации
-            self.storage.mark_as_published(
-                url=post_data['url'],
-                title=post_data['title'],
-                published_at=datetime.now(),
-                source=post_data['source']
-            )
+        return message.message_id
+    
+    async def publish_post(self, post_data: Dict) -> bool:
+        """
+        Публикация поста в Telegram-канал через outbox
+        
+        Пост сначала сохраняется в outbox, поэтому при ошибке отправки
+        AI-текст не теряется и будет отправлен повторно в следующих циклах.
+        """
+        try:
+            entry = await self.outbox.enqueue(post_data, self.channel, self.config.channel_id)
+            if entry is None or not await self.outbox.deliver(entry):
+                return False
             
             logger.info(f"Пост опубликован: {post_data['title']}")
             return True
             
-        except TelegramError as e:
-            logger.error(f"Ошибка Telegram при публикации: {e}")
-            return False
         except Exception as e:
             logger.error(f"Ошибка при публикации поста: {e}")
             return False
     
+    async def wait_post_slot(self, cycle: Dict):
+        """
+        Пауза перед следующим постом цикла
+        
+        Пост N выходит не раньше started + N * spacing: время на подготовку
+        уже засчитано в паузу. Ждёт только стадия публикации,
+        остальные стадии продолжают готовить следующие посты.
+        """
+        delay = cycle['started'] + cycle['published'] * self.post_spacing() - time.monotonic()
+        if delay > 0:
+            logger.info(f"Ожидание {delay:.0f} секунд перед следующим постом...")
+            await asyncio.sleep(delay)
+    
+    async def drain_outbox(self, cycle: Dict):
+        """Отправить посты из outbox, которым подошло время повтора (в счёт квоты цикла)"""
+        for entry in await self.outbox.due(self.channel, limit=self.config.posts_per_cycle):
+            if cycle['published'] >= self.config.posts_per_cycle:
+                break
+            await self.wait_post_slot(cycle)
+            with log_context(f"outbox-{entry['id']}"):
+                if await self.outbox.deliver(entry):
+                    logger.info(f"Пост опубликован из outbox: {entry['title']}")
+                    cycle['published'] += 1
+    
+    def build_pipeline(self, cycle: Dict) -> Pipeline:
+        """
+        Конвейер одного цикла: fetch → normalize → dedupe → rank → rewrite → validate → publish
+        
+        Кандидаты идут в рерайтинг в порядке оценки, пока не наберётся
+        квота успешно опубликованных постов или не кончится поток.
+        Перезагруженные настройки действуют со следующего обработчика стадии;
+        число воркеров и размер очередей — со следующего цикла.
+        
+        Args:
+            cycle: Состояние цикла (счётчики, уже встреченные URL)
+        """
+        workers = {**self.DEFAULT_STAGE_WORKERS, **(self.config.pipeline_workers or {})}
+        gate = QuotaGate(self.config.posts_per_cycle, cycle['published'])
+        # Квота текущего цикла меняется при перезагрузке настроек
+        self._gate = gate
+        pipeline = None
+        
+        async def fetch(source: str) -> List[Dict]:
+            return await self.fetch_source(source)
+        
+        async def normalize(item: Dict) -> Optional[Dict]:
+            item = self.normalize_item(item)
+            if item is not None and item['trace'] is not None:
+                cycle['traces'].append(item['trace'])
+            return item
+        
+        async def dedupe(item: Dict) -> Optional[Dict]:
+            # Один и тот же URL может прийти из нескольких источников за цикл
+            if item['url'] in cycle['seen']:
+                set_attribute('outcome', 'seen')
+                return None
+            cycle['seen'].add(item['url'])
+            if await self.is_duplicate(item):
+                set_attribute('outcome', 'duplicate')
+                return None
+            return item
+        
+        async def rank(items: List[Dict]):
+            cycle['candidates'] = len(items)
+            # Лучшие по популярности и свежести идут первыми; следующий
+            # кандидат извлекается, только когда рерайтинг готов его взять
+            return self.ranker.ranked(items)
+        
+        async def rewrite(item: Dict) -> Optional[Dict]:
+            # Не тратим AI на кандидатов сверх квоты
+            if not await gate.acquire():
+                return None
+            # Слот возвращается при любом исходе, кроме публикации: исключение обработчика
+            # конвейер только логирует, и потерянный слот навсегда остановил бы acquire()
+            try:
+                cycle['examined'] += 1
+                logger.info(f"Кандидат {item['score']:.3f}: [{item['source']}] {item['title']}")
+                if self.config.post_images:
+                    # Картинки загружаются, пока AI пишет текст
+                    self.media.prefetcher.prefetch(item.get('images') or [])
+                
+                post = await self.rewrite_content(item)
+            except Exception:
+                set_attribute('outcome', 'rewrite_failed')
+                await gate.release()
+                raise
+            if post is None:
+                set_attribute('outcome', 'rewrite_failed')
+                await gate.release()
+            return post
+        
+        async def validate(post: Dict) -> Optional[Dict]:
+            try:
+                valid = self.validate_post(post)
+            except Exception:
+                set_attribute('outcome', 'invalid')
+                await gate.release()
+                raise
+            if valid is None:
+                set_attribute('outcome', 'invalid')
+                await gate.release()
+                return None
+            return post
+        
+        async def publish(post: Dict) -> None:
+            try:
+                # Ожидание слота отдельным спаном: иначе оно выглядит как медленная отправка
+                with span('wait_slot'):
+                    await self.wait_post_slot(cycle)
+                published = await self.publish_post(post)
+            except Exception:
+                set_attribute('outcome', 'send_failed')
+                await gate.release()
+                raise
+            if not published:
+                set_attribute('outcome', 'send_failed')
+                await gate.release()
+                return
+            
+            set_attribute('outcome', 'published')
+            cycle['published'] += 1
+            await gate.complete()
+            if gate.filled:
+                pipeline.stop()
+        
+        pipeline = Pipeline([
+            Stage('fetch', fetch, workers['fetch'], fan_out=True),
+            Stage('normalize', normalize, workers['normalize']),
+            Stage('dedupe', dedupe, workers['dedupe']),
+            Stage('rank', rank, collect=True),
+            Stage('rewrite', rewrite, workers['rewrite']),
+            Stage('validate', validate, workers['validate']),
+            Stage('publish', publish, workers['publish']),
+        ], queue_size=self.config.pipeline_queue_size, metrics=self.metrics)
+        return pipeline
+    
+    def queue_depths(self) -> Dict[str, int]:
+        """Очереди стадий идущего цикла ({} — цикл не выполняется)"""
+        return self._pipeline.queue_depths() if self._pipeline else {}
+    
+    def post_spacing(self) -> float:
+        """Интервал между постами цикла (секунды)"""
+        if self.config.posting_window_minutes > 0:
+            # Посты равномерно распределяются по окну
+            return self.config.posting_window_minutes * 60 / max(1, self.config.posts_per_cycle)
+        return self.config.delay_between_posts
+    
+    async def apply_config(self, config: Config):
+        """
+        Применить новую конфигурацию канала без перезапуска
+        
+        Конфигурация подменяется одним присваиванием, поэтому обработчик
+        стадии видит либо старые, либо новые настройки целиком. Общие
+        для процесса поля (токены, БД) требуют перезапуска и не меняются.
+        """
+        old = self.config
+        changed = {field.name for field in fields(Config) if getattr(config, field.name) != getattr(old, field.name)}
+        
+        restart_required = changed & set(Config.SHARED_FIELDS)
+        if restart_required:
+            logger.warning(f"Изменения требуют перезапуска и пока не применены: {', '.join(sorted(restart_required))}")
+            config = replace(config, **{name: getattr(old, name) for name in restart_required})
+            changed -= restart_required
+        if not changed:
+            return
+        
+        self.config = config
+        if changed & self.RANKING_FIELDS:
+            self.ranker = CandidateRanker(config.ranking_weights, config.ranking_half_life_hours)
+        if changed & self.SCHEDULE_FIELDS:
+            await self.scheduler.reconfigure(config.posting_interval_hours, config.posting_slots)
+            if self._job_queue is not None:
+                self._schedule_job()
+        self.outbox.max_attempts = config.outbox_max_attempts
+        self.outbox.retry_delay = config.outbox_retry_delay
+        if 'posts_per_cycle' in changed and self._gate is not None:
+            await self._gate.set_quota(config.posts_per_cycle)
+            if self._gate.filled:
+                logger.info("Новая квота уже набрана: текущий цикл завершится после публикации в работе")
+        
+        logger.info(f"Настройки обновлены ({config.channel_id}): {', '.join(sorted(changed))}")
+    
     async def run_posting_cycle(self):
         """Один цикл работы бота: сбор, обработка и публикация"""
         logger.info("=" * 50)
-        logger.info("Запуск цикла публикации")
+        logger.info(f"Запуск цикла публикации: {self.config.channel_id}")
         logger.info("=" * 50)
         
-        # Сбор контента
-        content_items = await self.collect_content()
+        sources = self.enabled_sources()
+        if not sources:
+            logger.warning("Все источники отключены")
+            return
+        
+        started_at = datetime.now()
+        self.metrics.set('cycle_started', started_at, label=self.channel)
+        cycle = {'published': 0, 'candidates': 0, 'examined': 0, 'started': time.monotonic(),
+                 # Посты, ожидающие в outbox, не переписываются заново
+                 'seen': set(await self.storage.outbox_urls(self.channel)),
+                 # Трассы материалов цикла выгружаются после его окончания
+                 'traces': []}
+        
+        # Сначала отложенные посты: их AI-текст уже оплачен
+        await self.drain_outbox(cycle)
+        
+        if cycle['published'] < self.config.posts_per_cycle:
+            self._pipeline = self.build_pipeline(cycle)
+            try:
+                await self._pipeline.run(sources)
+            finally:
+                self._gate = None
+                self._pipeline = None
+                await self.tracer.export(cycle['traces'])
         
-        if not content_items:
+        if not cycle['candidates']:
             logger.warning("Не найдено контента для публикации")
-            return
+        elif cycle['published'] < self.config.posts_per_cycle:
+            logger.warning(
+                f"Кандидаты закончились: опубликовано {cycle['published']} "
+                f"из {self.config.posts_per_cycle}"
+            )
         
-        # Перемешиваем для разнообразия
-        random.shuffle(content_items)
+        per_post = cycle['examined'] / cycle['published'] if cycle['published'] else float(cycle['examined'])
+        logger.info(
+            f"Цикл завершен ({self.config.channel_id}). Опубликовано постов: {cycle['published']} "
+            f"(новых кандидатов: {cycle['candidates']}, рассмотрено: {cycle['examined']}, "
+            f"на один пост: {per_post:.1f})"
+        )
+        duration = time.monotonic() - cycle['started']
+        self.metrics.observe('cycle_seconds', duration, label=self.channel)
+        self.metrics.incr('cycle_published', cycle['published'], label=self.channel)
+        self.metrics.set('last_cycle', {
+            'started_at': started_at,
+            'duration': duration,
+            'published': cycle['published'],
+            'candidates': cycle['candidates'],
+            'examined': cycle['examined'],
+        }, label=self.channel)
+        sender = self.sender.stats()
+        logger.info(
+            f"Отправка: {sender['sent']} сообщений, RetryAfter: {sender['retry_after']}, "
+            f"повторов: {sender['retries']}, p95: {sender['latency_p95']:.2f} с"
+        )
+        return cycle
+    
+    @property
+    def cycle_running(self) -> bool:
+        """Выполняется ли сейчас цикл публикации"""
+        return self._cycle_lock.locked()
+    
+    async def run_cycle(self) -> Optional[Dict]:
+        """Цикл публикации; если уже идёт другой цикл канала, дождаться его окончания"""
+        async with self._cycle_lock:
+            return await self.run_posting_cycle()
+    
+    async def start_schedule(self, job_queue: JobQueue):
+        """
+        Запланировать циклы в JobQueue приложения
         
-        # Обрабатываем и публикуем
-        posts_published = 0
-        for item in content_items[:self.config.posts_per_cycle]:
-            processed = await self.process_content(item)
-            
-            if processed:
-                success = await self.publish_post(processed)
-                if success:
-                    posts_published += 1
-                    
-                    # Задержка между постами
-                    if posts_published < self.config.posts_per_cycle:
-                        delay = self.config.delay_between_posts
-                        logger.info(f"Ожидание {delay} секунд перед следующим постом...")
-                        await asyncio.sleep(delay)
-        
-        logger.info(f"Цикл завершен. Опубликовано постов: {posts_published}")
-    
-    async def run_continuous(self):
-        """Непрерывная работа бота с заданным интервалом"""
-        logger.info("Бот запущен в непрерывном режиме")
-        logger.info(f"Интервал между циклами: {self.config.posting_interval_hours} часов")
-        
-        while True:
+        Следующий запуск считается от запланированного времени,
+        поэтому длительность цикла не сдвигает расписание.
+        """
+        if self.config.posting_slots:
+            logger.info(f"Слоты публикации ({self.config.channel_id}): {', '.join(self.config.posting_slots)}")
+        else:
+            logger.info(f"Интервал между циклами ({self.config.channel_id}): "
+                        f"{self.config.posting_interval_hours} часов")
+        
+        self._job_queue = job_queue
+        await self.scheduler.load()
+        self._schedule_job()
+    
+    def _schedule_job(self):
+        """Поставить (или переставить) задачу на scheduler.next_fire"""
+        name = f'posting-cycle:{self.channel}'
+        # Уже выполненная задача из очереди удалена, переставляется только ожидающая
+        for job in self._job_queue.get_jobs_by_name(name):
+            job.schedule_removal()
+        self._job_queue.run_once(self._scheduled_cycle, when=self.scheduler.next_fire, name=name)
+        self.metrics.set('next_run', self.scheduler.next_fire, label=self.channel)
+        logger.info(f"Следующий запуск ({self.config.channel_id}) в: {self.scheduler.next_fire:%Y-%m-%d %H:%M:%S}")
+    
+    async def _scheduled_cycle(self, context: ContextTypes.DEFAULT_TYPE):
+        """Задача JobQueue: цикл по расписанию и планирование следующего"""
+        fired_at = self.scheduler.next_fire
+        try:
             try:
-                await self.run_posting_cycle()
-                
-                # Ожидание до следующего цикла
-                interval_seconds = self.config.posting_interval_hours * 3600
-                next_run = datetime.now().timestamp() + interval_seconds
-                next_run_time = datetime.fromtimestamp(next_run).strftime('%Y-%m-%d %H:%M:%S')
-                
-                logger.info(f"Следующий запуск в: {next_run_time}")
-                await asyncio.sleep(interval_seconds)
-                
-            except KeyboardInterrupt:
-                logger.info("Получен сигнал остановки")
-                break
+                await self.run_cycle()
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    # Отменили саму задачу (остановка процесса)
+                    raise
+                # Отмена пришла из общего ресурса, а не от JobQueue: это ошибка цикла
+                logger.error("Цикл публикации прерван отменой чужой задачи")
+            except Exception as e:
+                logger.error(f"Неожиданная ошибка в цикле публикации: {e}")
+            # Процесс работает неделями: рост памяти между циклами виден сразу
+            try:
+                await self.shared.memory.check(self.channel)
             except Exception as e:
-                logger.error(f"Неожиданная ошибка в основном цикле: {e}")
-                logger.info("Повтор через 5 минут...")
-                await asyncio.sleep(300)
+                logger.warning(f"Не удалось проверить память: {e}")
+            try:
+                await self.scheduler.advance(fired_at)
+            except Exception as e:
+                logger.error(f"Не удалось сохранить время следующего запуска: {e}")
+        finally:
+            # Без задачи в JobQueue канал перестал бы публиковать до перезапуска
+            try:
+                self._schedule_job()
+            except Exception as e:
+                logger.error(f"Не удалось запланировать следующий цикл ({self.config.channel_id}): {e}")
+
+
+async def apply_configs(bots: List[TelegramChannelBot], configs: List[Config]):
+    """Раздать перезагруженные конфигурации каналам (по имени канала)"""
+    by_name = {config.channel_name: config for config in configs}
+    current = {bot.channel for bot in bots}
+    if set(by_name) != current:
+        logger.warning("Добавление и удаление каналов применяется только после перезапуска")
+    
+    for bot in bots:
+        if bot.channel in by_name:
+            await bot.apply_config(by_name[bot.channel])
 
 
 async def main():
     """Точка входа в приложение"""
-    # Загрузка конфигурации
-    config = Config.load()
-    
-    # Создание и запуск бота
-    bot = TelegramChannelBot(config)
-    
-    # Выбор режима работы
-    if config.run_mode == 'once':
-        logger.info("Режим: одноразовый запуск")
-        await bot.run_posting_cycle()
-    else:
-        logger.info("Режим: непрерывная работа")
-        await bot.run_continuous()
+    # Загрузка конфигурации: один канал или список из CHANNELS_FILE
+    configs = Config.load_channels()
+    config = configs[0]
+    # Запись логов идёт в отдельном потоке и не задерживает event loop
+    listener = setup_logging(config.log_level, config.log_format, config.log_file,
+                             config.log_max_bytes, config.log_backup_count)
+    try:
+        await run(configs)
+    finally:
+        listener.stop()
+
+
+async def run(configs: List[Config]):
+    """Запуск каналов процесса в выбранном режиме"""
+    config = configs[0]
+    
+    # В непрерывном режиме публикация и команды работают в одном event loop
+    # и используют один клиент Telegram (и его пул HTTP-соединений)
+    application = None
+    if config.run_mode != 'once':
+        application = (
+            Application.builder()
+            .token(config.telegram_bot_token)
+            .concurrent_updates(config.update_workers)
+            .build()
+        )
+    
+    # Каналы одного процесса делят клиентов, хранилище и кэши
+    shared = SharedResources(config, bot=application.bot if application else None)
+    try:
+        # Настройки, изменённые через /settings, действуют и после перезапуска
+        overrides = await load_overrides(shared.storage)
+        # Отправки, прерванные падением процесса, не повторяются автоматически
+        await recover_outbox(shared.storage)
+        configs = [apply_overrides(channel_config, overrides) for channel_config in configs]
+        bots = [TelegramChannelBot(channel_config, shared) for channel_config in configs]
+        if len(bots) > 1:
+            logger.info(f"Каналов в процессе: {len(bots)}")
+        
+        # Выбор режима работы
+        if config.run_mode == 'once':
+            logger.info("Режим: одноразовый запуск")
+            await asyncio.gather(*(bot.run_posting_cycle() for bot in bots))
+        else:
+            logger.info("Режим: непрерывная работа")
+            reloader = ConfigReloader(shared.storage, lambda configs: apply_configs(bots, configs),
+                                      config.config_watch_interval)
+            try:
+                asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reloader.request)
+            except (AttributeError, NotImplementedError):
+                # Windows: SIGHUP нет, остаются отслеживание файлов и /settings
+                pass
+            
+            commands = BotCommands(config, shared.storage, bots, on_settings_change=reloader.request, metrics=shared.metrics)
+            commands.setup_handlers(application)
+            # Метрики Prometheus для локального сбора (METRICS_PORT)
+            metrics_server = None
+            if config.metrics_port:
+                metrics_server = MetricsServer(shared.metrics, config.metrics_listen, config.metrics_port)
+            # Команды приходят через webhook (WEBHOOK_URL) или long polling
+            webhook = None
+            if config.webhook_url:
+                webhook = WebhookServer(
+                    application, config.webhook_url, config.webhook_secret,
+                    config.webhook_listen, config.webhook_port, config.webhook_path
+                )
+            
+            if config.memory_tracking:
+                shared.memory.start()
+            
+            async with application:
+                await application.start()
+                if metrics_server:
+                    await metrics_server.start()
+                if webhook:
+                    await webhook.start()
+                else:
+                    await application.updater.start_polling()
+                try:
+                    for bot in bots:
+                        await bot.start_schedule(application.job_queue)
+                    await reloader.run()
+                finally:
+                    if webhook:
+                        await webhook.stop()
+                    else:
+                        await application.updater.stop()
+                    if metrics_server:
+                        await metrics_server.stop()
+                    await application.stop()
+    finally:
+        # Соединения с БД и HTTP-сессии закрываются, даже если запуск или работа упали
+        await shared.close()
 
 
 if __name__ == '__main__':
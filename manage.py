@@ -4,7 +4,10 @@
 """
 import argparse
 import asyncio
+import logging
+import os
 import sys
+from dataclasses import replace
 from pathlib import Path
 
 # Добавляем корневую директорию в путь
@@ -12,7 +15,8 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from main import TelegramChannelBot
 from config import Config
-from database.storage import Storage
+from database import create_storage
+from utils.log import TEXT_FORMAT
 
 
 async def test_parsers():
@@ -67,22 +71,261 @@ async def test_ai():
     print("=" * 50)
 
 
+def _storage_contract(storage) -> list:
+    """
+    Общий контракт хранилища: одинаковые проверки для всех бэкендов
+    
+    Returns:
+        Список (название проверки, ошибка или None)
+    """
+    from datetime import datetime, timedelta
+    
+    now = datetime.now()
+    checks = []
+    
+    def check(name, func):
+        try:
+            func()
+            checks.append((name, None))
+        except Exception as e:
+            checks.append((name, e if str(e) else repr(e)))
+    
+    def expect(condition, message):
+        if not condition:
+            raise AssertionError(message)
+    
+    def publish_and_lookup():
+        storage.mark_as_published('https://example.com/a', 'Быстрый парсер на Rust', now, 'github',
+                                  description='Парсер HTML без аллокаций')
+        expect(storage.is_published('https://example.com/a'), 'URL не найден после публикации')
+        expect(not storage.is_published('https://example.com/missing'), 'Найден неизвестный URL')
+    
+    def duplicate_ignored():
+        storage.mark_as_published('https://example.com/a', 'Другой заголовок', now, 'github')
+        expect(storage.get_published_count(7) == 1, 'Повторная публикация создала дубликат')
+    
+    def batch_insert():
+        inserted = storage.mark_many_as_published([
+            {'url': 'https://example.com/b', 'title': 'Асинхронный SQLite', 'published_at': now,
+             'source': 'habr', 'description': 'Очереди и пакетная запись'},
+            {'url': 'https://example.com/c', 'title': 'Старый пост', 'published_at': now - timedelta(days=200),
+             'source': 'habr'},
+            {'url': 'https://example.com/a', 'title': 'Дубликат', 'published_at': now, 'source': 'github'},
+        ])
+        expect(inserted == 2, f'Ожидалось 2 новые записи, добавлено {inserted}')
+    
+    def statistics():
+        stats = storage.get_statistics_multi((7, 365))
+        expect(stats[7]['total'] == 2 and stats[7]['github'] == 1, f'Неверная статистика за 7 дней: {stats[7]}')
+        expect(stats[365]['total'] == 3, f'Неверная статистика за 365 дней: {stats[365]}')
+        expect(storage.get_statistics(7)['total'] == 2, 'get_statistics расходится с get_statistics_multi')
+    
+    def last_published():
+        posts = storage.get_last_published(2)
+        expect([post['url'] for post in posts] == ['https://example.com/b', 'https://example.com/a']
+               or [post['url'] for post in posts] == ['https://example.com/a', 'https://example.com/b'],
+               f'Неверные последние посты: {posts}')
+    
+    def history_pages():
+        pages = []
+        page = storage.get_published_page(limit=1)
+        expect(not page['has_newer'], 'У первой страницы есть более новые посты')
+        while True:
+            pages.append(page['posts'][0]['url'])
+            if not page['has_older']:
+                break
+            last = page['posts'][-1]
+            page = storage.get_published_page(limit=1, cursor=(last['published_at'], last['id']))
+        expect(sorted(pages) == ['https://example.com/a', 'https://example.com/b', 'https://example.com/c']
+               and pages[-1] == 'https://example.com/c', f'Неверный обход истории: {pages}')
+        
+        first = page['posts'][0]
+        back = storage.get_published_page(limit=2, cursor=(first['published_at'], first['id']), older=False)
+        expect([post['url'] for post in back['posts']] == pages[:2] and back['has_older'] and not back['has_newer'],
+               f'Неверная страница назад: {back}')
+        
+        habr = storage.get_published_page(limit=5, source='habr')
+        expect({post['source'] for post in habr['posts']} == {'habr'} and len(habr['posts']) == 2,
+               f'Фильтр по источнику не работает: {habr}')
+    
+    def search():
+        results = storage.search_published('парсер')
+        expect(results and results[0]['url'] == 'https://example.com/a', f'Поиск не нашёл пост: {results}')
+        expect(storage.search_published('парсер', source='habr') == [], 'Фильтр по источнику не работает')
+        similar = storage.find_similar_title('Быстрый парсер на Rust!')
+        expect(similar and similar['url'] == 'https://example.com/a', f'Похожий заголовок не найден: {similar}')
+    
+    def state():
+        expect(storage.get_state('contract.key') is None, 'Неизвестный ключ состояния не None')
+        storage.set_state('contract.key', 'one')
+        storage.set_state('contract.key', 'two')
+        expect(storage.get_state('contract.key') == 'two', 'Состояние не перезаписалось')
+    
+    def retention():
+        deleted = storage.cleanup_old_records(90, chunk_size=1, pause=0)
+        expect(deleted == 1, f'Ожидалось удаление 1 записи, удалено {deleted}')
+        expect(storage.get_statistics_multi((365,))[365]['total'] == 2, 'Статистика не обновилась после очистки')
+        if storage.archive:
+            expect(storage.is_published('https://example.com/c'), 'Архивная запись не учитывается')
+    
+    def channels():
+        storage.mark_as_published('https://example.com/a', 'Быстрый парсер на Rust', now, 'github',
+                                  channel='second')
+        expect(storage.is_published('https://example.com/a', channel='second'),
+               'URL не найден в другом канале после публикации')
+        expect(not storage.is_published('https://example.com/b', channel='second'),
+               'Публикация одного канала видна в другом')
+        expect(storage.find_similar_title('Быстрый парсер на Rust!', channel='third') is None,
+               'Похожий заголовок найден в чужом канале')
+        
+        storage.mark_as_published('https://example.com/vue2', 'Релиз Vue 2 с новым компилятором', now,
+                                  'habr', channel='versions')
+        expect(storage.find_similar_title('Релиз Vue 3 с новым компилятором', channel='versions') is None,
+               'Заголовки, которые отличаются только версией, считаются дубликатами')
+        similar = storage.find_similar_title('Релиз Vue 2 с новым компилятором!', channel='versions')
+        expect(similar and similar['url'] == 'https://example.com/vue2', f'Тот же заголовок не найден: {similar}')
+    
+    def outbox():
+        entry = {'idempotency_key': 'second:https://example.com/o', 'channel': 'second', 'chat_id': '@test',
+                 'url': 'https://example.com/o', 'title': 'Пост из outbox', 'source': 'habr', 'text': 'текст'}
+        outbox_id = storage.outbox_enqueue(entry)
+        expect(outbox_id is not None, 'Запись не добавлена в outbox')
+        expect(storage.outbox_enqueue(entry) is None, 'Ключ идемпотентности не защитил от дубликата')
+        expect(storage.outbox_urls('second') == ['https://example.com/o'], 'URL outbox не найден')
+        
+        expect(storage.outbox_claim(outbox_id, now), 'Запись не захвачена')
+        expect(not storage.outbox_claim(outbox_id, now), 'Запись захвачена повторно')
+        storage.outbox_fail(outbox_id, 'timeout', now - timedelta(seconds=1), now)
+        due = storage.outbox_due('second', now)
+        expect([row['id'] for row in due] == [outbox_id] and due[0]['attempts'] == 1,
+               f'Запись не вернулась в очередь: {due}')
+        
+        expect(storage.outbox_claim(outbox_id, now), 'Повтор не захвачен')
+        expect(storage.outbox_recover() == 1, 'Прерванная отправка не восстановлена')
+        expect(storage.outbox_requeue('unknown') == 1, 'Запись unknown не возвращена в очередь')
+        expect(storage.outbox_claim(outbox_id, now), 'Запись после requeue не захвачена')
+        storage.outbox_mark_unknown(outbox_id, 'Timed out', now)
+        expect(storage.outbox_counts().get('unknown') == 1 and not storage.outbox_due('second', now),
+               f'Оборванная отправка не помечена unknown: {storage.outbox_counts()}')
+        expect(storage.outbox_requeue('unknown') == 1, 'Запись unknown не возвращена в очередь')
+        expect(storage.outbox_claim(outbox_id, now), 'Запись после requeue не захвачена')
+        storage.outbox_complete(outbox_id, 42, now)
+        expect(storage.is_published('https://example.com/o', channel='second'), 'Пост не отмечен опубликованным')
+        expect(storage.outbox_counts().get('sent') == 1, f'Неверные счётчики: {storage.outbox_counts()}')
+        expect(storage.outbox_urls('second') == [], 'Отправленный URL остался в outbox')
+        
+        entry = dict(entry, idempotency_key='second:https://example.com/p', url='https://example.com/p',
+                     images='https://example.com/1.png\nhttps://example.com/2.png')
+        outbox_id = storage.outbox_enqueue(entry)
+        due = storage.outbox_due('second', now + timedelta(seconds=1))
+        expect([row['images'] for row in due if row['id'] == outbox_id] == [entry['images']],
+               f'Картинки записи outbox не сохранены: {due}')
+        expect(storage.outbox_claim(outbox_id, now), 'Запись с картинками не захвачена')
+        storage.outbox_complete_many([{'outbox_id': outbox_id, 'message_id': 43, 'published_at': now}])
+        expect(storage.is_published('https://example.com/p', channel='second')
+               and storage.outbox_counts().get('sent') == 2,
+               f'Пакетное завершение не отметило пост: {storage.outbox_counts()}')
+    
+    def media_files():
+        expect(storage.get_media_file_id('abc') is None, 'Найден file_id незагруженного файла')
+        storage.save_media_file_id('abc', 'file-1')
+        storage.save_media_file_id('abc', 'file-2')
+        expect(storage.get_media_file_id('abc') == 'file-2', 'file_id не обновлён')
+        storage.delete_media_file_id('abc')
+        expect(storage.get_media_file_id('abc') is None, 'Отклонённый file_id не удалён')
+    
+    for name, func in [
+        ('публикация и проверка URL', publish_and_lookup),
+        ('повторная публикация', duplicate_ignored),
+        ('пакетная запись', batch_insert),
+        ('статистика', statistics),
+        ('последние посты', last_published),
+        ('постраничная история', history_pages),
+        ('полнотекстовый поиск', search),
+        ('состояние бота', state),
+        ('порционная очистка', retention),
+        ('независимые каналы', channels),
+        ('outbox', outbox),
+        ('кэш file_id', media_files),
+    ]:
+        check(name, func)
+    
+    return checks
+
+
+async def test_storage(database_url: str = None):
+    """Проверка бэкендов хранилища на общем контракте"""
+    import tempfile
+    import uuid
+    from database import Storage
+    
+    print("🧪 Тестирование хранилища...\n")
+    
+    config = Config.load()
+    database_url = database_url or config.database_url
+    tmp_dir = tempfile.mkdtemp(prefix='storage-contract-')
+    
+    backends = [('SQLite', lambda: Storage(os.path.join(tmp_dir, 'contract.db'),
+                                          archive_dir=os.path.join(tmp_dir, 'archive-sqlite')))]
+    
+    schema = f"contract_{uuid.uuid4().hex[:8]}"
+    if database_url:
+        import psycopg
+        from psycopg.conninfo import make_conninfo
+        from database.postgres import PostgresStorage
+        
+        # Отдельная схема, чтобы не затронуть рабочие данные
+        with psycopg.connect(database_url, autocommit=True) as conn:
+            conn.execute(f'CREATE SCHEMA {schema}')
+        dsn = make_conninfo(database_url, options=f'-csearch_path={schema}')
+        backends.append(('PostgreSQL', lambda: PostgresStorage(
+            dsn, archive_dir=os.path.join(tmp_dir, 'archive-postgres'), pool_size=2)))
+    else:
+        print("ℹ️ DATABASE_URL не задан — PostgreSQL пропущен\n")
+    
+    failed = 0
+    try:
+        for name, factory in backends:
+            print(f"🗄 {name}:")
+            storage = factory()
+            try:
+                for check_name, error in _storage_contract(storage):
+                    if error is None:
+                        print(f"  ✅ {check_name}")
+                    else:
+                        failed += 1
+                        print(f"  ❌ {check_name}: {error}")
+            finally:
+                storage.close()
+            print()
+    finally:
+        if database_url:
+            with psycopg.connect(database_url, autocommit=True) as conn:
+                conn.execute(f'DROP SCHEMA {schema} CASCADE')
+    
+    if failed:
+        print(f"❌ Проверок не пройдено: {failed}")
+        sys.exit(1)
+    print("✅ Все проверки пройдены")
+
+
 async def show_stats():
     """Показать статистику"""
     print("📊 Статистика публикаций\n")
     
     config = Config.load()
-    storage = Storage(config.database_path)
+    storage = create_storage(config)
+    
+    # Статистика за 7 и 30 дней одним запросом
+    stats = storage.get_statistics_multi((7, 30))
     
-    # Статистика за 7 дней
-    stats_7d = storage.get_statistics(7)
+    stats_7d = stats[7]
     print(f"За последние 7 дней:")
     print(f"  Всего постов: {stats_7d['total']}")
     print(f"  GitHub: {stats_7d['github']}")
     print(f"  Habr: {stats_7d['habr']}")
     
-    # Статистика за 30 дней
-    stats_30d = storage.get_statistics(30)
+    stats_30d = stats[30]
     print(f"\nЗа последние 30 дней:")
     print(f"  Всего постов: {stats_30d['total']}")
     print(f"  GitHub: {stats_30d['github']}")
@@ -96,17 +339,314 @@ async def show_stats():
         print(f"   {post['published_at']}")
 
 
-async def cleanup_db(days: int = 90):
+async def cleanup_db(days: int = 90, chunk_size: int = 500, archive_dir: str = None):
     """Очистка старых записей"""
     print(f"🧹 Очистка записей старше {days} дней...")
     
     config = Config.load()
-    storage = Storage(config.database_path)
+    if archive_dir is not None:
+        config = replace(config, archive_dir=archive_dir)
+    storage = create_storage(config)
     
-    deleted = storage.cleanup_old_records(days)
+    if storage.archive:
+        print(f"📦 Удаляемые записи архивируются в {storage.archive.archive_dir}")
+    
+    deleted = storage.cleanup_old_records(days, chunk_size=chunk_size)
     print(f"✅ Удалено записей: {deleted}")
 
 
+async def vacuum_db():
+    """Разовый перевод SQLite в режим инкрементального VACUUM"""
+    config = Config.load()
+    storage = create_storage(config)
+    print("🗜 Полный VACUUM: файл БД переписывается, бот на это время лучше остановить...")
+    if storage.enable_incremental_vacuum():
+        print("✅ Инкрементальный VACUUM включён: очистка теперь уменьшает файл БД порциями")
+    else:
+        print("✅ Ничего делать не нужно: режим уже включён или БД не SQLite")
+    storage.close()
+
+
+async def outbox_status(requeue_unknown: bool = False, requeue_failed: bool = False):
+    """Состояние outbox и возврат записей в очередь"""
+    config = Config.load()
+    storage = create_storage(config)
+    
+    if requeue_unknown:
+        # Эти посты могли уйти в канал до падения: проверьте канал перед повтором
+        print(f"🔁 Возвращено в очередь (unknown): {storage.outbox_requeue(storage.OUTBOX_UNKNOWN)}")
+    if requeue_failed:
+        print(f"🔁 Возвращено в очередь (failed): {storage.outbox_requeue(storage.OUTBOX_FAILED)}")
+    
+    counts = storage.outbox_counts()
+    print("📮 Outbox:")
+    for status in (storage.OUTBOX_PENDING, storage.OUTBOX_SENDING, storage.OUTBOX_UNKNOWN,
+                   storage.OUTBOX_FAILED, storage.OUTBOX_SENT):
+        print(f"  {status}: {counts.get(status, 0)}")
+    storage.close()
+
+
+async def webhook_check(url: str, secret: str, count: int = 50, concurrency: int = 10, text: str = '/help',
+                        user_id: int = 1):
+    """
+    Локальная замена Telegram: отправить обновления на webhook и измерить время ответа
+    
+    Обновления приходят так же, как от Telegram: POST с JSON и заголовком секрета.
+    Запрос с неверным секретом должен получить 403.
+    """
+    import time
+    import aiohttp
+    from webhook import WebhookServer
+    
+    def fake_update(update_id: int) -> dict:
+        command = text.split()[0]
+        return {
+            'update_id': update_id,
+            'message': {
+                'message_id': update_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': user_id, 'is_bot': False, 'first_name': 'Test'},
+                'text': text,
+                'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+                if command.startswith('/') else [],
+            },
+        }
+    
+    print(f"📨 Webhook: {url}")
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=fake_update(0),
+                                headers={WebhookServer.SECRET_HEADER: secret + '-wrong'}) as response:
+            mark = '✅' if response.status == 403 else '❌'
+            print(f"  {mark} Неверный секрет: HTTP {response.status} (ожидается 403)")
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        statuses = {}
+        
+        async def post(update_id: int):
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(url, json=fake_update(update_id),
+                                        headers={WebhookServer.SECRET_HEADER: secret}) as response:
+                    await response.read()
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(1, count + 1)))
+        elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    print(f"  Отправлено обновлений: {count} за {elapsed:.2f} с, параллельно: {concurrency}")
+    print(f"  Ответы: {', '.join(f'HTTP {status}: {total}' for status, total in sorted(statuses.items()))}")
+    print(f"  Время ответа: p50 {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+          f"p95 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000:.1f} мс")
+
+
+async def trace_collector(port: int = 4318, listen: str = '127.0.0.1', output: str = ''):
+    """
+    Локальная замена коллектора OTLP: принять трассы бота и показать, где теряется время
+    
+    Принимает POST /v1/traces (OTLP/HTTP, JSON), печатает по строке на материал
+    с длительностью шагов и при --output дописывает спаны в JSONL.
+    """
+    import json
+    from aiohttp import web
+    
+    def duration_ms(span: dict) -> float:
+        return (int(span['endTimeUnixNano']) - int(span['startTimeUnixNano'])) / 1e6
+    
+    async def handle(request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            return web.Response(status=400)
+        
+        traces = {}
+        for resource in body.get('resourceSpans', []):
+            for scope in resource.get('scopeSpans', []):
+                for span in scope.get('spans', []):
+                    traces.setdefault(span['traceId'], []).append(span)
+        
+        for spans in traces.values():
+            spans.sort(key=lambda span: int(span['startTimeUnixNano']))
+            root = next((span for span in spans if not span.get('parentSpanId')), spans[0])
+            attributes = {item['key']: next(iter(item['value'].values())) for item in root.get('attributes', [])}
+            steps = ' · '.join(
+                f"{span['name']} {duration_ms(span):.0f}{' ❌' if span.get('status', {}).get('code') == 2 else ''}"
+                for span in spans if span is not root
+            )
+            print(f"{attributes.get('outcome', '?'):<14} {duration_ms(root):8.0f} мс  "
+                  f"[{attributes.get('source', '?')}] {str(attributes.get('title', ''))[:40]}")
+            print(f"{'':<14} {steps}")
+        
+        if output:
+            with open(output, 'a', encoding='utf-8') as f:
+                for spans in traces.values():
+                    for span in spans:
+                        f.write(json.dumps(span, ensure_ascii=False) + '\n')
+        return web.json_response({})
+    
+    app = web.Application()
+    app.router.add_post('/v1/traces', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, listen, port).start()
+    print(f"🔭 Коллектор трасс: http://{listen}:{port}/v1/traces (Ctrl+C — выход)")
+    print(f"   Запустите бота с TRACE_OTLP_ENDPOINT=http://{listen}:{port}/v1/traces")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def profile_cycle(repeat: int = 3, posts: int = 10, interval: float = 0.001, top: int = 25,
+                        output: str = 'profile'):
+    """
+    Профиль полного цикла публикации на записанных данных
+    
+    Страницы источников, ответы AI и Telegram заменены фикстурами из
+    perf/fixtures, поэтому профиль показывает только собственную работу
+    бота: разбор HTML, ранжирование, экранирование Markdown, хранилище.
+    Сэмплируются event loop и рабочие потоки (запросы SQLite выполняются
+    в потоке storage-db). Каждый повтор — новый канал с пустой БД,
+    сэмплируется только цикл.
+    """
+    import json
+    from perf.fixtures import FixtureEnvironment
+    from perf.profiler import SamplingProfiler
+    
+    # Логи цикла не нужны в выводе команды
+    logging.getLogger().setLevel(logging.WARNING)
+    profiler = SamplingProfiler(interval)
+    published = 0
+    
+    async with FixtureEnvironment(posts_per_cycle=posts) as env:
+        for _ in range(repeat):
+            bot = await env.make_bot()
+            try:
+                profiler.start()
+                try:
+                    cycle = await bot.run_posting_cycle()
+                finally:
+                    profiler.stop()
+                published += cycle['published'] if cycle else 0
+            finally:
+                await env.close_bot(bot)
+    
+    speedscope_path = f'{output}.speedscope.json'
+    folded_path = f'{output}.folded'
+    with open(speedscope_path, 'w', encoding='utf-8') as f:
+        json.dump(profiler.speedscope(f'run_posting_cycle x{repeat}'), f)
+    with open(folded_path, 'w', encoding='utf-8') as f:
+        f.write(profiler.folded())
+    
+    print(f"🔥 Циклов: {repeat}, опубликовано постов: {published}, "
+          f"время циклов: {profiler.duration:.2f} с, сэмплов: {profiler.samples}")
+    print(f"   {speedscope_path} — открыть на https://www.speedscope.app")
+    print(f"   {folded_path} — flamegraph.pl / inferno-flamegraph")
+    print("   Стеки рабочих потоков начинаются с [storage-db] или [asyncio_N]; они работают "
+          "параллельно event loop, поэтому сумма self % может превышать 100%")
+    print()
+    print(f"{'self, мс':>10} {'self %':>7} {'total, мс':>10}  функция")
+    for row in profiler.top(top):
+        share = row['self'] / profiler.duration * 100 if profiler.duration else 0
+        print(f"{row['self'] * 1000:10.1f} {share:6.1f}% {row['total'] * 1000:10.1f}  "
+              f"{row['function']} ({row['location']})")
+
+
+def run_bench(groups: list, rounds: int = 15, sizes: list = None, output: str = 'bench.json',
+              baseline: str = None, threshold: float = 0.1, update_baseline: bool = False) -> bool:
+    """
+    Бенчмарки и сравнение с baseline этой машины
+    
+    Args:
+        baseline: Файл baseline (None — perf/baselines/<машина>.json)
+    
+    Returns:
+        False, если есть регрессии сверх порога
+    """
+    import json
+    from perf.bench import DEFAULT_SIZES, compare, format_time, machine_id, machine_mismatch, run_benchmarks
+    
+    baseline = baseline or str(Path(__file__).parent / 'perf' / 'baselines' / f'{machine_id()}.json')
+    
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"⏱ Бенчмарки: {', '.join(groups)}")
+    
+    def progress(name: str, result: dict):
+        print(f"  {name:<28} {format_time(result['median']):>12} ± {format_time(result['iqr'] / 2):<10} "
+              f"(мин. {format_time(result['min'])}, раундов: {result['rounds']} × {result['number']})")
+    
+    current = run_benchmarks(groups, rounds, sizes or DEFAULT_SIZES, progress)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"💾 Результаты: {output}")
+    
+    if update_baseline:
+        # Бенчмарки, которые сейчас не запускались, остаются в baseline (если он с этой же машины)
+        previous = {}
+        if os.path.exists(baseline):
+            with open(baseline, encoding='utf-8') as f:
+                stored = json.load(f)
+            if not machine_mismatch(current, stored):
+                previous = stored.get('results', {})
+        os.makedirs(os.path.dirname(os.path.abspath(baseline)), exist_ok=True)
+        with open(baseline, 'w', encoding='utf-8') as f:
+            json.dump({**current, 'results': {**previous, **current['results']}}, f, ensure_ascii=False, indent=2)
+        print(f"📌 Baseline обновлён: {baseline}")
+        return True
+    
+    if not os.path.exists(baseline):
+        print(f"⚠️ Нет baseline {baseline}: сравнение пропущено (создайте его через --update-baseline)")
+        return True
+    with open(baseline, encoding='utf-8') as f:
+        reference = json.load(f)
+    
+    # Абсолютное время с другой машины ничего не говорит о регрессии
+    mismatch = machine_mismatch(current, reference)
+    if mismatch:
+        print(f"⚠️ Baseline {baseline} снят на другой машине ({', '.join(mismatch)} отличаются): "
+              f"сравнение пропущено (запишите свой через --update-baseline)")
+        return True
+    
+    rows = compare(current, reference, threshold)
+    print()
+    print(f"Сравнение с {baseline} ({reference['meta'].get('created_at', '?')}), "
+          f"порог +{threshold:.0%} с поправкой на разброс:")
+    for row in rows:
+        mark = '❌' if row['regression'] else '✅'
+        print(f"  {mark} {row['name']:<28} {format_time(row['baseline']):>12} → {format_time(row['current']):>12}"
+              f"  {row['change']:+.1%} (допустимо +{row['allowed']:.0%})")
+    regressions = [row for row in rows if row['regression']]
+    if regressions:
+        print(f"❌ Регрессий: {len(regressions)}")
+    else:
+        print("✅ Регрессий нет")
+    return not regressions
+
+
+async def migrate_db(status_only: bool = False):
+    """Применение миграций схемы БД"""
+    config = Config.load()
+    storage = create_storage(config, auto_migrate=False)
+    
+    current = storage.schema_version()
+    latest = storage.latest_schema_version()
+    print(f"🗄 Версия схемы: {current} (последняя: {latest})")
+    
+    if status_only or current >= latest:
+        if current >= latest:
+            print("✅ Схема актуальна")
+        return
+    
+    applied = storage.migrate()
+    for item in applied:
+        print(f"  ✅ {item['version']}: {item['description']} — {item['duration'] * 1000:.1f} мс")
+    print(f"✅ Применено миграций: {len(applied)}")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Управление Telegram Channel Bot')
     subparsers = parser.add_subparsers(dest='command', help='Команды')
@@ -116,19 +656,104 @@ def main():
     subparsers.add_parser('test-ai', help='Тестирование AI обработки')
     subparsers.add_parser('stats', help='Показать статистику')
     
+    storage_parser = subparsers.add_parser('test-storage', help='Проверка бэкендов хранилища')
+    storage_parser.add_argument('--database-url', default=None,
+                                help='PostgreSQL для проверки (по умолчанию DATABASE_URL)')
+    
     cleanup_parser = subparsers.add_parser('cleanup', help='Очистить старые записи')
     cleanup_parser.add_argument('--days', type=int, default=90, help='Удалить записи старше N дней')
+    cleanup_parser.add_argument('--chunk-size', type=int, default=500, help='Размер порции удаления')
+    cleanup_parser.add_argument('--archive-dir', default=None,
+                                help='Каталог архива (по умолчанию ARCHIVE_DIR, пустая строка — без архива)')
+    
+    outbox_parser = subparsers.add_parser('outbox', help='Состояние outbox неотправленных постов')
+    outbox_parser.add_argument('--requeue-unknown', action='store_true',
+                               help='Повторить отправки, прерванные падением процесса')
+    outbox_parser.add_argument('--requeue-failed', action='store_true',
+                               help='Повторить посты, исчерпавшие попытки')
+    
+    webhook_parser = subparsers.add_parser('webhook-check',
+                                           help='Отправить тестовые обновления на webhook (вместо Telegram)')
+    webhook_parser.add_argument('--url', default=None,
+                                help='Адрес webhook (по умолчанию http://127.0.0.1:WEBHOOK_PORT/WEBHOOK_PATH)')
+    webhook_parser.add_argument('--secret', default=None, help='Секрет webhook (по умолчанию WEBHOOK_SECRET)')
+    webhook_parser.add_argument('--count', type=int, default=50, help='Сколько обновлений отправить')
+    webhook_parser.add_argument('--concurrency', type=int, default=10, help='Сколько запросов одновременно')
+    webhook_parser.add_argument('--text', default='/help', help='Текст сообщения (команда)')
+    webhook_parser.add_argument('--user-id', type=int, default=1, help='ID отправителя (для проверки ADMIN_IDS)')
+    
+    subparsers.add_parser('vacuum', help='Разово включить инкрементальный VACUUM для существующей SQLite БД')
+    
+    migrate_parser = subparsers.add_parser('migrate', help='Применить миграции схемы БД')
+    migrate_parser.add_argument('--status', action='store_true', help='Только показать версию схемы')
+    
+    collector_parser = subparsers.add_parser('trace-collector',
+                                             help='Локальный коллектор трасс OTLP/HTTP (для TRACE_OTLP_ENDPOINT)')
+    collector_parser.add_argument('--port', type=int, default=4318, help='Порт')
+    collector_parser.add_argument('--listen', default='127.0.0.1', help='Адрес')
+    collector_parser.add_argument('--output', default='', help='Дописывать принятые спаны в JSONL-файл')
+    
+    profile_parser = subparsers.add_parser('profile-cycle',
+                                           help='Профиль цикла публикации на записанных данных')
+    profile_parser.add_argument('--repeat', type=int, default=3, help='Сколько циклов выполнить')
+    profile_parser.add_argument('--posts', type=int, default=10, help='Постов за цикл')
+    profile_parser.add_argument('--interval', type=float, default=0.001, help='Период сэмплирования (секунды)')
+    profile_parser.add_argument('--top', type=int, default=25, help='Строк в таблице самых затратных функций')
+    profile_parser.add_argument('--output', default='profile',
+                                help='Префикс файлов: <префикс>.speedscope.json и <префикс>.folded')
+    
+    bench_parser = subparsers.add_parser('bench', help='Бенчмарки и сравнение с baseline')
+    bench_parser.add_argument('--only', default='parse,markdown,storage,cycle',
+                              help='Группы через запятую: parse, markdown, storage, cycle')
+    bench_parser.add_argument('--rounds', type=int, default=15, help='Раундов измерения на бенчмарк')
+    bench_parser.add_argument('--sizes', default='10000,100000,1000000',
+                              help='Размеры таблицы для storage через запятую')
+    bench_parser.add_argument('--output', default='bench.json', help='Файл результатов (JSON)')
+    bench_parser.add_argument('--baseline', default=None,
+                              help='Baseline для сравнения (по умолчанию perf/baselines/<машина>.json)')
+    bench_parser.add_argument('--threshold', type=float, default=0.1,
+                              help='Минимальное допустимое замедление медианы (0.1 — на 10%%), '
+                                   'к нему добавляется разброс раундов')
+    bench_parser.add_argument('--update-baseline', action='store_true',
+                              help='Записать результаты в baseline вместо сравнения')
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format=TEXT_FORMAT)
     
     if args.command == 'test-parsers':
         asyncio.run(test_parsers())
     elif args.command == 'test-ai':
         asyncio.run(test_ai())
+    elif args.command == 'test-storage':
+        asyncio.run(test_storage(args.database_url))
     elif args.command == 'stats':
         asyncio.run(show_stats())
     elif args.command == 'cleanup':
-        asyncio.run(cleanup_db(args.days))
+        asyncio.run(cleanup_db(args.days, args.chunk_size, args.archive_dir))
+    elif args.command == 'outbox':
+        asyncio.run(outbox_status(args.requeue_unknown, args.requeue_failed))
+    elif args.command == 'webhook-check':
+        config = Config.load()
+        url = args.url or f'http://127.0.0.1:{config.webhook_port}/{config.webhook_path.lstrip("/")}'
+        secret = config.webhook_secret if args.secret is None else args.secret
+        asyncio.run(webhook_check(url, secret, args.count, args.concurrency, args.text, args.user_id))
+    elif args.command == 'migrate':
+        asyncio.run(migrate_db(args.status))
+    elif args.command == 'vacuum':
+        asyncio.run(vacuum_db())
+    elif args.command == 'trace-collector':
+        try:
+            asyncio.run(trace_collector(args.port, args.listen, args.output))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'profile-cycle':
+        asyncio.run(profile_cycle(args.repeat, args.posts, args.interval, args.top, args.output))
+    elif args.command == 'bench':
+        groups = [group.strip() for group in args.only.split(',') if group.strip()]
+        sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+        ok = run_bench(groups, args.rounds, sizes, args.output, args.baseline, args.threshold,
+                       args.update_baseline)
+        sys.exit(0 if ok else 1)
     else:
         parser.print_help()
 
@@ -2,19 +2,35 @@
 """
 Парсер GitHub Trending
 """
+import logging
+import time
+
 import aiohttp
 from bs4 import BeautifulSoup
 from typing import List, Dict
 from fake_useragent import UserAgent
 
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
 
 class GitHubParser:
     """Парсер для GitHub Trending"""
     
     BASE_URL = "https://github.com/trending"
+    # Social preview репозитория (картинка поста)
+    PREVIEW_URL = "https://opengraph.githubassets.com/1/{repo}"
     
-    def __init__(self):
+    def __init__(self, metrics=None):
+        """
+        Args:
+            metrics: MetricsRegistry для времени загрузки, разбора и объёма страниц (None — не измерять)
+        """
         self.ua = UserAgent()
+        self.metrics = metrics
+        # Последняя ошибка сбора (None — последний запрос успешен)
+        self.last_error = None
     
     async def fetch_trending(self, language: str = 'python', period: str = 'daily') -> List[Dict]:
         """
@@ -27,16 +43,38 @@ class GitHubParser:
         url = f"{self.BASE_URL}/{language}?since={period}"
         headers = {'User-Agent': self.ua.random}
         
+        started = time.monotonic()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status != 200:
-                        return []
-                    
-                    html = await response.text()
-                    return self._parse_html(html)
+            with span('fetch', source='github', url=url) as fetch_span:
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(url, headers=headers) as response:
+                        if response.status != 200:
+                            self.last_error = f"HTTP {response.status}"
+                            if self.metrics is not None:
+                                self.metrics.incr('parser_errors', label='github')
+                            return []
+                        
+                        body = await response.read()
+                        html = await response.text()
+                        self.last_error = None
+                if fetch_span is not None:
+                    fetch_span.attributes['bytes'] = len(body)
+            if self.metrics is not None:
+                self.metrics.observe('parser_fetch_seconds', time.monotonic() - started, label='github')
+                self.metrics.incr('parser_bytes', len(body), label='github')
+            
+            started = time.monotonic()
+            with span('parse', source='github'):
+                items = self._parse_html(html)
+            if self.metrics is not None:
+                self.metrics.observe('parser_parse_seconds', time.monotonic() - started, label='github')
+                self.metrics.incr('parser_items', len(items), label='github')
+            return items
         except Exception as e:
-            print(f"Ошибка при парсинге GitHub: {e}")
+            logger.error(f"Ошибка при парсинге GitHub: {e}")
+            self.last_error = str(e) or type(e).__name__
+            if self.metrics is not None:
+                self.metrics.incr('parser_errors', label='github')
             return []
     
     def _parse_html(self, html: str) -> List[Dict]:
@@ -96,11 +134,12 @@ class GitHubParser:
                     'stars': stars,
                     'stars_today': stars_today,
                     'language': language,
+                    'images': [self.PREVIEW_URL.format(repo=repo_name)],
                     'source': 'github'
                 })
                 
             except Exception as e:
-                print(f"Ошибка парсинга проекта: {e}")
+                logger.warning(f"Ошибка парсинга проекта: {e}")
                 continue
         
         return projects
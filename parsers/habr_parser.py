@@ -2,19 +2,35 @@
 """
 Парсер Habr
 """
+import logging
+import time
+
 import aiohttp
 from bs4 import BeautifulSoup
 from typing import List, Dict
 from fake_useragent import UserAgent
 
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
 
 class HabrParser:
     """Парсер для Habr"""
     
     BASE_URL = "https://habr.com/ru/flows/develop/articles"
+    # Сколько картинок превью брать в пост (больше одной — альбом)
+    MAX_IMAGES = 4
     
-    def __init__(self):
+    def __init__(self, metrics=None):
+        """
+        Args:
+            metrics: MetricsRegistry для времени загрузки, разбора и объёма страниц (None — не измерять)
+        """
         self.ua = UserAgent()
+        self.metrics = metrics
+        # Последняя ошибка сбора (None — последний запрос успешен)
+        self.last_error = None
     
     async def fetch_articles(self, period: str = 'daily', limit: int = 10) -> List[Dict]:
         """
@@ -36,16 +52,38 @@ class HabrParser:
         
         headers = {'User-Agent': self.ua.random}
         
+        started = time.monotonic()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers) as response:
-                    if response.status != 200:
-                        return []
-                    
-                    html = await response.text()
-                    return self._parse_html(html, limit)
+            with span('fetch', source='habr', url=url) as fetch_span:
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(url, headers=headers) as response:
+                        if response.status != 200:
+                            self.last_error = f"HTTP {response.status}"
+                            if self.metrics is not None:
+                                self.metrics.incr('parser_errors', label='habr')
+                            return []
+                        
+                        body = await response.read()
+                        html = await response.text()
+                        self.last_error = None
+                if fetch_span is not None:
+                    fetch_span.attributes['bytes'] = len(body)
+            if self.metrics is not None:
+                self.metrics.observe('parser_fetch_seconds', time.monotonic() - started, label='habr')
+                self.metrics.incr('parser_bytes', len(body), label='habr')
+            
+            started = time.monotonic()
+            with span('parse', source='habr'):
+                items = self._parse_html(html, limit)
+            if self.metrics is not None:
+                self.metrics.observe('parser_parse_seconds', time.monotonic() - started, label='habr')
+                self.metrics.incr('parser_items', len(items), label='habr')
+            return items
         except Exception as e:
-            print(f"Ошибка при парсинге Habr: {e}")
+            logger.error(f"Ошибка при парсинге Habr: {e}")
+            self.last_error = str(e) or type(e).__name__
+            if self.metrics is not None:
+                self.metrics.incr('parser_errors', label='habr')
             return []
     
     def _parse_html(self, html: str, limit: int) -> List[Dict]:
@@ -93,6 +131,21 @@ class HabrParser:
                     except:
                         pass
                 
+                # Дата публикации (ISO 8601, используется для затухания оценки)
+                time_tag = article_tag.find('time')
+                published_at = time_tag.get('datetime', '') if time_tag else ''
+                
+                # Картинки: обложка статьи и картинки из превью
+                images = []
+                for img in article_tag.find_all('img'):
+                    src = img.get('data-src') or img.get('src') or ''
+                    if src.startswith('//'):
+                        src = 'https:' + src
+                    # Аватары авторов и иконки хабов не нужны
+                    if 'habrastorage.org' in src and '/avatars/' not in src and src not in images:
+                        images.append(src)
+                images = images[:self.MAX_IMAGES]
+                
                 # Теги
                 tags = []
                 tags_container = article_tag.find('div', class_='tm-article-snippet__hubs')
@@ -107,11 +160,13 @@ class HabrParser:
                     'views': views,
                     'rating': rating,
                     'tags': tags,
+                    'published_at': published_at,
+                    'images': images,
                     'source': 'habr'
                 })
                 
             except Exception as e:
-                print(f"Ошибка парсинга статьи: {e}")
+                logger.warning(f"Ошибка парсинга статьи: {e}")
                 continue
         
         return articles
@@ -0,0 +1,4 @@
+# perf/__init__.py
+"""
+Профилирование и бенчмарки на записанных данных (manage.py profile-cycle)
+"""
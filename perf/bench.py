@@ -0,0 +1,321 @@
+# perf/bench.py
+"""
+Бенчмарки горячих участков бота (manage.py bench)
+
+- parse.*: разбор записанных страниц GitHub Trending и Habr;
+- markdown.*: экранирование MarkdownV2 (ответ AI и fallback-пост);
+- storage.*: проверка дубликата и вставка в SQLite при 10k/100k/1M строк;
+- cycle.end_to_end: полный цикл публикации на записанных данных.
+
+Результат — JSON с медианой и межквартильным размахом времени одного
+вызова. Абсолютное время имеет смысл сравнивать только на той же машине,
+поэтому baseline хранится отдельно для каждой (perf/baselines/<машина>.json),
+а регрессией считается замедление сверх порога с поправкой на разброс
+раундов.
+"""
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .fixtures import FixtureEnvironment, load_fixture
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+GROUPS = ('parse', 'markdown', 'storage', 'cycle')
+DEFAULT_ROUNDS = 15
+
+# Поля meta, которые должны совпадать, чтобы сравнение с baseline имело смысл
+MACHINE_KEYS = ('platform', 'machine', 'cpu', 'cpus')
+
+# Во сколько межквартильных размахов замедление ещё считается шумом
+NOISE_FACTOR = 2.0
+
+
+def _cpu_model() -> str:
+    """Модель процессора (/proc/cpuinfo на Linux)"""
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machine_info() -> dict:
+    """Описание машины для meta результатов"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu': _cpu_model(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def machine_id(info: Optional[dict] = None) -> str:
+    """Короткое имя машины для файла baseline: linux-x86_64-1a2b3c4d"""
+    info = info or machine_info()
+    digest = hashlib.sha1('|'.join(str(info.get(key)) for key in MACHINE_KEYS).encode()).hexdigest()[:8]
+    return f"{platform.system().lower()}-{info['machine']}-{digest}"
+
+
+def machine_mismatch(current: dict, baseline: dict) -> List[str]:
+    """Поля MACHINE_KEYS, которыми meta результатов отличается от baseline"""
+    return [key for key in MACHINE_KEYS
+            if current.get('meta', {}).get(key) != baseline.get('meta', {}).get(key)]
+
+
+def measure(func: Callable[[], object], rounds: int = DEFAULT_ROUNDS, min_round: float = 0.05) -> dict:
+    """
+    Время одного вызова func
+    
+    Число вызовов в раунде подбирается так, чтобы раунд длился не меньше
+    min_round секунд, иначе погрешность таймера сравнима с самим вызовом.
+    
+    Returns:
+        {'median', 'iqr', 'min', 'max'} — секунды на вызов, 'rounds' и 'number'
+    """
+    number = 1
+    while True:
+        elapsed = _timed(func, number)
+        if elapsed >= min_round or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_round / 10 else 2
+    times = [elapsed / number] + [_timed(func, number) / number for _ in range(rounds - 1)]
+    return _stats(times, number)
+
+
+def _timed(func: Callable[[], object], number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - started
+
+
+def _stats(times: List[float], number: int = 1) -> dict:
+    quartiles = statistics.quantiles(times, n=4) if len(times) > 1 else [times[0]] * 3
+    return {
+        'median': statistics.median(times),
+        'iqr': quartiles[2] - quartiles[0],
+        'min': min(times),
+        'max': max(times),
+        'rounds': len(times),
+        'number': number,
+    }
+
+
+def bench_parse(rounds: int) -> Iterable[Tuple[str, dict]]:
+    """Разбор записанных страниц источников"""
+    from parsers import GitHubParser, HabrParser
+    
+    github_html = load_fixture('github_trending.html')
+    habr_html = load_fixture('habr_top.html')
+    github, habr = GitHubParser(), HabrParser()
+    # Пустой результат означает, что фикстура перестала соответствовать парсеру
+    assert github._parse_html(github_html) and habr._parse_html(habr_html, 20), "фикстуры не разбираются"
+    
+    yield 'parse.github', measure(lambda: github._parse_html(github_html), rounds)
+    yield 'parse.habr', measure(lambda: habr._parse_html(habr_html, 20), rounds)
+
+
+def bench_markdown(rounds: int) -> Iterable[Tuple[str, dict]]:
+    """Экранирование MarkdownV2 на записанных ответах AI"""
+    from ai import ContentProcessor
+    
+    processor = ContentProcessor('bench')
+    responses = json.loads(load_fixture('ai_responses.json'))['responses']
+    descriptions = [text[:200] for text in responses]
+    
+    def convert():
+        for text in responses:
+            processor._convert_to_telegram_markdown(text)
+    
+    def escape():
+        for text in descriptions:
+            processor._escape_markdown(text)
+    
+    # Время на один текст, а не на весь набор
+    for name, func, count in (('markdown.convert', convert, len(responses)),
+                              ('markdown.escape', escape, len(descriptions))):
+        result = measure(func, rounds)
+        for key in ('median', 'iqr', 'min', 'max'):
+            result[key] /= count
+        yield name, result
+
+
+def _seed(storage, start: int, stop: int, batch: int = 20_000):
+    """Добавить в published_posts записи с номерами start..stop-1"""
+    published_at = datetime.now() - timedelta(days=30)
+    for offset in range(start, stop, batch):
+        storage.mark_many_as_published([
+            {
+                'url': f'https://example.com/post/{i}',
+                'title': f'Пост номер {i} о Python и асинхронности',
+                'published_at': published_at + timedelta(seconds=i),
+                'source': 'github' if i % 2 else 'habr',
+                'description': f'Описание поста {i}',
+            }
+            for i in range(offset, min(offset + batch, stop))
+        ])
+
+
+def bench_storage(rounds: int, sizes: Iterable[int] = DEFAULT_SIZES) -> Iterable[Tuple[str, dict]]:
+    """
+    Проверка дубликата и вставка при разном размере таблицы
+    
+    Одна БД наращивается до каждого размера по очереди. lookup чередует
+    опубликованные и новые URL, insert добавляет по одной записи, как
+    публикация поста.
+    """
+    from database import Storage
+    
+    with tempfile.TemporaryDirectory(prefix='bench-') as tmpdir:
+        storage = Storage(os.path.join(tmpdir, 'bench.db'))
+        inserted = itertools.count()
+        rows = 0
+        try:
+            for size in sorted(sizes):
+                _seed(storage, rows, size)
+                rows = size
+                label = _size_label(size)
+                
+                urls = itertools.cycle(
+                    f'https://example.com/{kind}/{i}'
+                    for i in range(0, size, max(1, size // 500)) for kind in ('post', 'missing')
+                )
+                yield f'storage.lookup.{label}', measure(lambda: storage.is_published(next(urls)), rounds)
+                
+                def insert():
+                    i = next(inserted)
+                    storage.mark_as_published(f'https://example.com/new/{i}', f'Новый пост {i}',
+                                              datetime.now(), 'github')
+                
+                yield f'storage.insert.{label}', measure(insert, rounds)
+        finally:
+            storage.close()
+
+
+def _size_label(size: int) -> str:
+    """10000 -> 10k, 1000000 -> 1m"""
+    if size >= 1_000_000 and size % 1_000_000 == 0:
+        return f'{size // 1_000_000}m'
+    if size >= 1000 and size % 1000 == 0:
+        return f'{size // 1000}k'
+    return str(size)
+
+
+async def bench_cycle(rounds: int, posts: int = 10) -> Tuple[str, dict]:
+    """Полный цикл публикации на записанных данных; каждый раунд — новый канал с пустой БД"""
+    times = []
+    async with FixtureEnvironment(posts_per_cycle=posts) as env:
+        for _ in range(rounds):
+            bot = await env.make_bot()
+            try:
+                started = time.perf_counter()
+                cycle = await bot.run_posting_cycle()
+                times.append(time.perf_counter() - started)
+            finally:
+                await env.close_bot(bot)
+            if not cycle or cycle['published'] != posts:
+                raise RuntimeError(f"цикл на фикстурах опубликовал {cycle and cycle['published']} из {posts}")
+    return 'cycle.end_to_end', _stats(times)
+
+
+def run_benchmarks(groups: Iterable[str] = GROUPS, rounds: int = DEFAULT_ROUNDS,
+                   sizes: Iterable[int] = DEFAULT_SIZES,
+                   progress: Optional[Callable[[str, dict], None]] = None) -> dict:
+    """
+    Выполнить бенчмарки
+    
+    Args:
+        groups: Группы из GROUPS
+        rounds: Раундов измерения на бенчмарк
+        sizes: Размеры таблицы для storage.*
+        progress: Вызывается после каждого бенчмарка с именем и результатом
+    
+    Returns:
+        {'meta': {...}, 'results': {имя: {'median', 'iqr', 'min', 'max', 'rounds', 'number'}}}
+    """
+    results = {}
+    
+    def record(name: str, result: dict):
+        results[name] = result
+        if progress:
+            progress(name, result)
+    
+    for group in groups:
+        if group == 'parse':
+            for name, result in bench_parse(rounds):
+                record(name, result)
+        elif group == 'markdown':
+            for name, result in bench_markdown(rounds):
+                record(name, result)
+        elif group == 'storage':
+            for name, result in bench_storage(rounds, sizes):
+                record(name, result)
+        elif group == 'cycle':
+            record(*asyncio.run(bench_cycle(rounds)))
+        else:
+            raise ValueError(f"Неизвестная группа бенчмарков: {group}")
+    
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            **machine_info(),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.1) -> List[dict]:
+    """
+    Сравнить результаты с baseline по медиане
+    
+    Допустимое замедление — threshold плюс NOISE_FACTOR относительных
+    межквартильных размахов (среднее по обоим результатам): у шумного
+    бенчмарка порог выше, у стабильного остаётся близким к threshold.
+    
+    Args:
+        current: Результат run_benchmarks
+        baseline: Сохранённый результат run_benchmarks
+        threshold: Минимальное допустимое замедление (0.1 — на 10%)
+    
+    Returns:
+        Строки сравнения {'name', 'baseline', 'current', 'change', 'allowed', 'regression'}
+        для бенчмарков, которые есть в обоих результатах
+    """
+    rows = []
+    for name, result in current['results'].items():
+        reference = baseline.get('results', {}).get(name)
+        if not reference or not reference['median']:
+            continue
+        change = result['median'] / reference['median'] - 1
+        noise = (result.get('iqr', 0) / result['median'] + reference.get('iqr', 0) / reference['median']) / 2
+        allowed = threshold + NOISE_FACTOR * noise
+        rows.append({
+            'name': name,
+            'baseline': reference['median'],
+            'current': result['median'],
+            'change': change,
+            'allowed': allowed,
+            'regression': change > allowed,
+        })
+    return rows
+
+
+def format_time(seconds: float) -> str:
+    """Время в удобных единицах"""
+    if seconds >= 1:
+        return f'{seconds:.2f} с'
+    if seconds >= 1e-3:
+        return f'{seconds * 1e3:.2f} мс'
+    return f'{seconds * 1e6:.1f} мкс'
@@ -0,0 +1,147 @@
+# perf/fixtures.py
+"""
+Окружение для профилирования и бенчмарков без сети
+
+Страницы GitHub Trending и Habr отдаёт локальный aiohttp-сервер из
+записанных файлов (парсеры работают как обычно, через HTTP), ответы AI
+берутся из записанного набора, а Telegram заменён объектом, который
+только считает отправленные сообщения.
+"""
+import asyncio
+import itertools
+import json
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Optional
+
+from aiohttp import web
+
+from config import Config
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def load_fixture(name: str) -> str:
+    """Содержимое записанного файла"""
+    return (FIXTURES_DIR / name).read_text(encoding='utf-8')
+
+
+class FakeMessages:
+    """Замена AsyncAnthropic().messages: записанные ответы по кругу"""
+    
+    def __init__(self, responses: List[str], latency: float = 0.0):
+        self._responses = itertools.cycle(responses)
+        self.latency = latency
+    
+    async def create(self, model: str, max_tokens: int, messages: list, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = next(self._responses)
+        prompt = messages[-1]['content']
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=text)],
+            usage=SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4)
+        )
+
+
+class FakeTelegram:
+    """Замена telegram.Bot для отправителя: сообщения только считаются"""
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent = 0
+    
+    async def send_message(self, chat_id, text: str, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent += 1
+        return SimpleNamespace(message_id=self.sent, photo=None)
+
+
+class FixtureEnvironment:
+    """
+    Каналы на записанных данных
+    
+    Использование:
+        async with FixtureEnvironment(posts_per_cycle=10) as env:
+            bot = await env.make_bot()
+            await bot.run_posting_cycle()
+            await env.close_bot(bot)
+    """
+    
+    def __init__(self, posts_per_cycle: int = 10, ai_latency: float = 0.0, send_latency: float = 0.0,
+                 database_path: Optional[str] = None):
+        """
+        Args:
+            posts_per_cycle: Постов за цикл
+            ai_latency: Имитация задержки AI (секунды)
+            send_latency: Имитация задержки Telegram (секунды)
+            database_path: Файл SQLite (None — новый временный файл для каждого бота)
+        """
+        self.posts_per_cycle = posts_per_cycle
+        self.ai_latency = ai_latency
+        self.send_latency = send_latency
+        self.database_path = database_path
+        self.pages = {
+            'github': load_fixture('github_trending.html'),
+            'habr': load_fixture('habr_top.html'),
+        }
+        self.responses = json.loads(load_fixture('ai_responses.json'))['responses']
+        self._runner: Optional[web.AppRunner] = None
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='perf-')
+        self._databases = itertools.count()
+        self.base_url = ''
+    
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get('/{source}/{tail:.*}', self._handle_page)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+        return self
+    
+    async def __aexit__(self, *exc):
+        if self._runner is not None:
+            await self._runner.cleanup()
+        self._tmpdir.cleanup()
+    
+    async def _handle_page(self, request: web.Request) -> web.Response:
+        page = self.pages.get(request.match_info['source'])
+        if page is None:
+            return web.Response(status=404)
+        return web.Response(text=page, content_type='text/html')
+    
+    def config(self) -> Config:
+        """Конфигурация канала: без пауз, лимитов отправки, картинок, метрик и трассировки"""
+        path = self.database_path or str(Path(self._tmpdir.name) / f'bot-{next(self._databases)}.db')
+        return replace(
+            Config.load(),
+            telegram_bot_token='1:fixture', channel_id='@fixture', ai_api_key='fixture', channel_name='',
+            database_path=path, database_url='', archive_dir='',
+            sources={'github_enabled': True, 'habr_enabled': True}, habr_limit=20,
+            posts_per_cycle=self.posts_per_cycle, delay_between_posts=0, posting_window_minutes=0,
+            post_images=False, metrics_port=0, trace_file='', trace_otlp_endpoint='',
+            # Лимиты Telegram к фиктивному боту не относятся
+            telegram_global_rate=1e6, telegram_chat_rate=1e6, telegram_chat_burst=max(1, self.posts_per_cycle),
+        )
+    
+    async def make_bot(self):
+        """Канал, у которого сеть, AI и Telegram заменены записанными данными"""
+        from main import TelegramChannelBot
+        
+        bot = TelegramChannelBot(self.config())
+        bot.github_parser.BASE_URL = f'{self.base_url}/github/trending'
+        bot.habr_parser.BASE_URL = f'{self.base_url}/habr/articles'
+        bot.ai_processor.client = SimpleNamespace(messages=FakeMessages(self.responses, self.ai_latency))
+        bot.sender.bot = FakeTelegram(self.send_latency)
+        return bot
+    
+    @staticmethod
+    async def close_bot(bot):
+        """Закрыть хранилище и HTTP-сессии канала"""
+        await bot.shared.close()
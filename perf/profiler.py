@@ -0,0 +1,207 @@
+# perf/profiler.py
+"""
+Сэмплирующий профайлер для асинхронного кода
+
+Отдельный поток раз в interval секунд снимает стеки потока event loop
+и рабочих потоков (sys._current_frames) и накапливает время по стекам.
+В отличие от cProfile, он не замедляет каждый вызов и показывает, где
+бот действительно проводит время: парсинг HTML, экранирование Markdown,
+ожидание в select() в event loop, запросы SQLite в потоке storage-db.
+Стеки рабочих потоков начинаются с кадра [имя потока]; их простой в
+ожидании задачи не учитывается.
+
+Результат сохраняется в формате speedscope (https://www.speedscope.app)
+и в виде свёрнутых стеков для flamegraph.pl / inferno.
+"""
+import concurrent.futures.thread
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Кадр стека: (функция, файл, первая строка)
+FrameKey = Tuple[str, str, int]
+
+# Рабочие потоки, которые сэмплируются вместе с event loop: поток БД
+# (AsyncStorage) и пул asyncio.to_thread
+WORKER_THREADS = ('storage-db', 'asyncio_')
+
+# Верхний кадр рабочего потока, который ждёт задачу, а не работает
+IDLE_FRAMES = {
+    ('Condition.wait', threading.__file__),
+    ('_worker', concurrent.futures.thread.__file__),
+}
+
+
+class SamplingProfiler:
+    """
+    Профайлер потока event loop и рабочих потоков
+    
+    Использование:
+        profiler = SamplingProfiler()
+        profiler.start()
+        ...
+        profiler.stop()
+        print(profiler.top(20))
+    
+    Повторные start()/stop() накапливают сэмплы в том же профиле.
+    """
+    
+    def __init__(self, interval: float = 0.001, threads: Tuple[str, ...] = WORKER_THREADS):
+        """
+        Args:
+            interval: Период сэмплирования (секунды)
+            threads: Префиксы имён рабочих потоков, которые сэмплируются вместе с текущим
+        """
+        self.interval = interval
+        self.threads = threads
+        # Стек (от корня к листу) -> накопленное время
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._target = threading.main_thread().ident
+        self._thread: Optional[threading.Thread] = None
+        self._running = threading.Event()
+        self._started = 0.0
+        self._switch_interval = sys.getswitchinterval()
+    
+    def start(self):
+        """Начать сэмплирование"""
+        if self._thread is not None:
+            raise RuntimeError("Профайлер уже запущен")
+        self._target = threading.get_ident()
+        # Иначе поток профайлера получает GIL не чаще раза в 5 мс
+        sys.setswitchinterval(min(self._switch_interval, self.interval / 2))
+        self._running.set()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Остановить сэмплирование"""
+        if self._thread is None:
+            return
+        self._running.clear()
+        self._thread.join()
+        self._thread = None
+        self.duration += time.perf_counter() - self._started
+        sys.setswitchinterval(self._switch_interval)
+    
+    def __enter__(self):
+        self.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.stop()
+    
+    def _workers(self) -> Dict[int, str]:
+        """Рабочие потоки для сэмплирования: ident -> имя"""
+        return {
+            thread.ident: thread.name for thread in threading.enumerate()
+            if thread.ident != self._target and thread.name.startswith(self.threads)
+        }
+    
+    @staticmethod
+    def _stack(frame) -> List[FrameKey]:
+        """Стек от листа к корню"""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        return stack
+    
+    def _run(self):
+        last = time.perf_counter()
+        while self._running.is_set():
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            # Вес сэмпла — фактически прошедшее время: sleep бывает дольше interval
+            weight = now - last
+            last = now
+            frames = sys._current_frames()
+            
+            frame = frames.get(self._target)
+            if frame is not None:
+                self.stacks[tuple(reversed(self._stack(frame)))] += weight
+                self.samples += 1
+            
+            for ident, name in self._workers().items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = self._stack(frame)
+                if stack[0][:2] in IDLE_FRAMES:
+                    continue
+                stack.append((f'[{name}]', '<thread>', 0))
+                self.stacks[tuple(reversed(stack))] += weight
+    
+    def top(self, limit: int = 20) -> List[dict]:
+        """
+        Самые затратные функции
+        
+        Returns:
+            Список {'function', 'location', 'self', 'total'} по убыванию собственного
+            времени: self — время в самой функции, total — вместе с вызванными
+        """
+        own: Dict[FrameKey, float] = Counter()
+        total: Dict[FrameKey, float] = Counter()
+        for stack, weight in self.stacks.items():
+            own[stack[-1]] += weight
+            # Рекурсивная функция учитывается в total один раз
+            for frame in set(stack):
+                total[frame] += weight
+        ranked = sorted(own, key=own.get, reverse=True)[:limit]
+        return [
+            {'function': frame[0], 'location': f'{_short_path(frame[1])}:{frame[2]}',
+             'self': own[frame], 'total': total[frame]}
+            for frame in ranked
+        ]
+    
+    def folded(self) -> str:
+        """Свёрнутые стеки (формат flamegraph.pl): стек;через;точку_с_запятой время_в_мкс"""
+        lines = []
+        for stack, weight in self.stacks.items():
+            names = ';'.join(f'{frame[0]} ({_short_path(frame[1])}:{frame[2]})' for frame in stack)
+            lines.append(f'{names} {max(1, round(weight * 1e6))}')
+        return '\n'.join(sorted(lines)) + '\n'
+    
+    def speedscope(self, name: str = 'profile') -> dict:
+        """Профиль в формате speedscope (sampled, единицы — секунды)"""
+        frames: List[dict] = []
+        index: Dict[FrameKey, int] = {}
+        samples, weights = [], []
+        for stack, weight in self.stacks.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(weight)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }],
+            'name': name,
+            'exporter': 'telegrachannel perf',
+        }
+
+
+def _short_path(path: str) -> str:
+    """Путь относительно проекта или site-packages"""
+    for marker in ('site-packages/', 'lib/python'):
+        if marker in path:
+            return path.split(marker, 1)[1]
+    root = sys.path[0].rstrip('/') + '/'
+    return path[len(root):] if path.startswith(root) else path
@@ -0,0 +1,14 @@
+from .metrics import MetricsRegistry, MetricsServer
+from .runner import Pipeline, Stage
+from .ranking import CandidateRanker
+from .quota import QuotaGate
+from .scheduler import PostingScheduler
+from .cache import AsyncCache
+from .outbox import Outbox, recover_outbox
+from .sender import TelegramSender, TokenBucket
+from .media import ImagePrefetcher, MediaPublisher
+from .memory import MemoryTracker
+
+__all__ = ['Pipeline', 'Stage', 'CandidateRanker', 'QuotaGate', 'PostingScheduler', 'AsyncCache', 'Outbox', 'recover_outbox',
+           'TelegramSender', 'TokenBucket', 'ImagePrefetcher', 'MediaPublisher', 'MetricsRegistry',
+           'MetricsServer', 'MemoryTracker']
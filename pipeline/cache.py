@@ -0,0 +1,120 @@
+# pipeline/cache.py
+"""
+Общий кэш результатов для нескольких каналов
+
+Одинаковые запросы (сбор из источника, AI-рерайтинг одного материала)
+выполняются один раз: одновременные вызовы ждут один и тот же результат,
+а готовый результат переиспользуется до истечения TTL.
+
+Общий запрос выполняется в отдельной задаче: отмена одного из ожидающих
+(например, конвейера его канала) не отменяет запрос остальным. Задача
+отменяется, только когда её результат больше никто не ждёт.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class AsyncCache:
+    """Асинхронный LRU-кэш с TTL и объединением одновременных запросов"""
+    
+    def __init__(self, ttl: Optional[float] = None, max_size: int = 1000):
+        """
+        Args:
+            ttl: Время жизни записи в секундах (None — без ограничения, 0 — не кэшировать)
+            max_size: Максимальное количество записей (старые вытесняются)
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        # key -> (момент сохранения, результат)
+        self._entries: OrderedDict = OrderedDict()
+        # Запросы, которые выполняются прямо сейчас: key -> задача
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # Сколько вызовов ждёт каждую задачу
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def _fresh(self, stored_at: float) -> bool:
+        """Не истёк ли TTL записи"""
+        return self.ttl is None or time.monotonic() - stored_at < self.ttl
+    
+    async def get_or_create(self, key: Hashable, factory: Callable[[], Awaitable[Any]],
+                            cache_if: Callable[[Any], bool] = None) -> Any:
+        """
+        Вернуть результат из кэша или вычислить его
+        
+        Args:
+            key: Ключ запроса
+            factory: Корутина-функция, вычисляющая результат
+            cache_if: Условие сохранения результата (например, не кэшировать fallback)
+        
+        Returns:
+            Результат factory (общий для всех вызовов с этим ключом)
+        """
+        entry = self._entries.get(key)
+        if entry and self._fresh(entry[0]):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        
+        while True:
+            task = self._inflight.get(key)
+            if task is None:
+                self.misses += 1
+                task = asyncio.create_task(self._create(key, factory, cache_if))
+                self._inflight[key] = task
+            else:
+                # Такой же запрос уже выполняется — ждём его результат
+                self.hits += 1
+            
+            try:
+                return await self._wait(task)
+            except asyncio.CancelledError:
+                if task.cancelled() and not asyncio.current_task().cancelling():
+                    # Общий запрос отменили не мы (например, при остановке): вычисляем заново
+                    continue
+                raise
+    
+    async def _wait(self, task: asyncio.Task) -> Any:
+        """Дождаться общего запроса; последний ушедший ожидающий отменяет ненужный запрос"""
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()
+    
+    async def _create(self, key: Hashable, factory: Callable[[], Awaitable[Any]],
+                      cache_if: Optional[Callable[[Any], bool]]) -> Any:
+        """Вычислить результат в отдельной задаче и сохранить его"""
+        try:
+            result = await factory()
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+        
+        if self.ttl != 0 and (cache_if is None or cache_if(result)):
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return result
+    
+    def clear(self):
+        """Сбросить все сохранённые результаты"""
+        self._entries.clear()
+    
+    def stats(self) -> dict:
+        """Счётчики попаданий и промахов"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,219 @@
+# pipeline/media.py
+"""
+Картинки постов: загрузка, предзагрузка и повторное использование file_id
+
+Картинка скачивается один раз (ограниченное число загрузок одновременно),
+загружается в Telegram один раз, а дальше отправляется по file_id.
+Ключ кэша — SHA-256 содержимого, поэтому одинаковая картинка по разным
+URL тоже не загружается повторно. Если Telegram отклоняет сохранённый
+file_id, он забывается, а картинки один раз загружаются заново.
+"""
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import aiohttp
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest
+
+from .cache import AsyncCache
+
+logger = logging.getLogger(__name__)
+
+
+class ImagePrefetcher:
+    """Загрузка картинок с ограничением параллельности и общим кэшем"""
+    
+    # Лимит Telegram на фото, загружаемое ботом
+    MAX_BYTES = 10 * 1024 * 1024
+    
+    def __init__(self, max_concurrency: int = 4, timeout: float = 15, cache_ttl: float = 600,
+                 cache_size: int = 64):
+        """
+        Args:
+            max_concurrency: Сколько картинок загружать одновременно
+            timeout: Таймаут загрузки одной картинки (секунды)
+            cache_ttl: Сколько хранить загруженную картинку в памяти (секунды)
+            cache_size: Сколько картинок хранить в памяти
+        """
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache = AsyncCache(ttl=cache_ttl, max_size=cache_size)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Фоновые загрузки (ссылки нужны, чтобы задачи не собрал GC)
+        self._tasks = set()
+    
+    async def fetch(self, url: str) -> Optional[bytes]:
+        """Содержимое картинки (None — не удалось загрузить)"""
+        return await self._cache.get_or_create(url, lambda: self._download(url),
+                                               cache_if=lambda data: data is not None)
+    
+    def prefetch(self, urls: Sequence[str]):
+        """Начать загрузку в фоне, чтобы к отправке картинки уже были в памяти"""
+        for url in urls:
+            task = asyncio.create_task(self.fetch(url))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _download(self, url: str) -> Optional[bytes]:
+        """Загрузка одной картинки"""
+        async with self._semaphore:
+            if self._session is None or self._session.closed:
+                self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+            try:
+                async with self._session.get(url) as response:
+                    if response.status != 200 or not response.content_type.startswith('image/'):
+                        logger.warning(f"Картинка недоступна ({response.status}, {response.content_type}): {url}")
+                        return None
+                    if (response.content_length or 0) > self.MAX_BYTES:
+                        logger.warning(f"Картинка больше {self.MAX_BYTES} байт: {url}")
+                        return None
+                    data = await response.content.read(self.MAX_BYTES + 1)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Ошибка загрузки картинки {url}: {e}")
+                return None
+        
+        if len(data) > self.MAX_BYTES:
+            logger.warning(f"Картинка больше {self.MAX_BYTES} байт: {url}")
+            return None
+        return data
+    
+    def stats(self) -> dict:
+        """Счётчики кэша картинок"""
+        return self._cache.stats()
+    
+    async def close(self):
+        """Закрыть HTTP-сессию"""
+        if self._session is not None:
+            await self._session.close()
+
+
+class MediaPublisher:
+    """Отправка постов с картинками: фото или альбом, file_id вместо повторной загрузки"""
+    
+    # Ограничения Telegram
+    MAX_CAPTION_LENGTH = 1024
+    MAX_GROUP_SIZE = 10
+    
+    def __init__(self, storage, sender, prefetcher: ImagePrefetcher):
+        """
+        Args:
+            storage: AsyncStorage (постоянный кэш file_id)
+            sender: TelegramSender
+            prefetcher: Загрузчик картинок
+        """
+        self.storage = storage
+        self.sender = sender
+        self.prefetcher = prefetcher
+        # Хэш содержимого -> file_id (копия таблицы media_files в памяти)
+        self._file_ids: Dict[str, str] = {}
+        self.uploads = 0
+        self.reused = 0
+    
+    @staticmethod
+    def content_hash(data: bytes) -> str:
+        """Ключ кэша file_id"""
+        return hashlib.sha256(data).hexdigest()
+    
+    async def _file_id(self, content_hash: str) -> Optional[str]:
+        """file_id ранее загруженного содержимого"""
+        if content_hash not in self._file_ids:
+            file_id = await self.storage.get_media_file_id(content_hash)
+            if file_id is None:
+                return None
+            self._file_ids[content_hash] = file_id
+        return self._file_ids[content_hash]
+    
+    async def _remember(self, content_hash: str, message):
+        """Сохранить file_id самой крупной версии загруженного фото"""
+        if message is None or not message.photo:
+            return
+        file_id = message.photo[-1].file_id
+        self._file_ids[content_hash] = file_id
+        await self.storage.save_media_file_id(content_hash, file_id)
+    
+    async def _forget(self, content_hash: str):
+        """Забыть file_id, который Telegram отклонил"""
+        self._file_ids.pop(content_hash, None)
+        await self.storage.delete_media_file_id(content_hash)
+    
+    async def _send_photos(self, chat_id, photos: list, caption: str, **kwargs) -> list:
+        """Фото или альбом (file_id или содержимое), возвращает отправленные сообщения"""
+        if len(photos) == 1:
+            return [await self.sender.send_photo(chat_id, photos[0], caption=caption, **kwargs)]
+        # Подпись альбома — подпись первой картинки
+        media = [
+            InputMediaPhoto(photo, caption=caption, **kwargs) if i == 0 else InputMediaPhoto(photo)
+            for i, photo in enumerate(photos)
+        ]
+        return list(await self.sender.send_media_group(chat_id, media))
+    
+    async def send(self, chat_id, image_urls: List[str], caption: str, **kwargs):
+        """
+        Отправить пост с картинками
+        
+        Args:
+            chat_id: ID или @username канала
+            image_urls: URL картинок (больше одной — альбом)
+            caption: Подпись (не длиннее MAX_CAPTION_LENGTH)
+            **kwargs: Параметры подписи (parse_mode)
+        
+        Returns:
+            Первое отправленное сообщение или None, если ни одна картинка не загрузилась
+            или Telegram отклонил картинки (пост нужно отправить текстом)
+        """
+        results = await asyncio.gather(*(self.prefetcher.fetch(url) for url in image_urls[:self.MAX_GROUP_SIZE]))
+        images = {}
+        for data in results:
+            # Одинаковая картинка по разным URL отправляется один раз
+            if data is not None:
+                images.setdefault(self.content_hash(data), data)
+        if not images:
+            return None
+        
+        # Уже загруженные картинки отправляются по file_id, остальные — содержимым
+        photos = []
+        uploaded = []
+        for content_hash, data in images.items():
+            file_id = await self._file_id(content_hash)
+            if file_id is None:
+                uploaded.append(content_hash)
+            photos.append(file_id or data)
+        self.reused += len(photos) - len(uploaded)
+        self.uploads += len(uploaded)
+        
+        try:
+            messages = await self._send_photos(chat_id, photos, caption, **kwargs)
+        except BadRequest as e:
+            reused = [content_hash for content_hash in images if content_hash not in uploaded]
+            if not reused:
+                logger.warning(f"Telegram отклонил картинки, пост уйдёт текстом: {e}")
+                return None
+            # Сохранённый file_id устарел или недействителен: один повтор с содержимым
+            logger.warning(f"Telegram отклонил сохранённый file_id, картинки загружаются заново: {e}")
+            for content_hash in reused:
+                await self._forget(content_hash)
+            self.reused -= len(reused)
+            self.uploads += len(reused)
+            uploaded = list(images)
+            try:
+                messages = await self._send_photos(chat_id, list(images.values()), caption, **kwargs)
+            except BadRequest as e:
+                logger.warning(f"Telegram отклонил картинки, пост уйдёт текстом: {e}")
+                return None
+        
+        for content_hash, message in zip(images, messages):
+            if content_hash in uploaded:
+                await self._remember(content_hash, message)
+        return messages[0]
+    
+    def stats(self) -> dict:
+        """Загруженные и переиспользованные по file_id картинки"""
+        total = self.uploads + self.reused
+        return {
+            'uploads': self.uploads,
+            'reused': self.reused,
+            'reuse_rate': self.reused / total if total else 0.0,
+            'downloads': self.prefetcher.stats(),
+        }
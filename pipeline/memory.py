@@ -0,0 +1,224 @@
+# pipeline/memory.py
+"""
+Отслеживание памяти процесса в непрерывном режиме
+
+Каждый цикл создаёт страницы BeautifulSoup, HTTP-сессии и тела ответов.
+Если что-то из этого остаётся в кэшах или замыканиях, процесс медленно
+растёт до лимита контейнера (512M в docker-compose.yml) и падает по OOM.
+
+Всегда доступны RSS, лимит памяти cgroup и число объектов под управлением
+gc (метрика memory; объекты считаются один раз после цикла, а не при
+каждом /status и сборе метрик). С MEMORY_TRACKING=true включается tracemalloc: после
+каждого цикла снимок сравнивается с предыдущим, и при росте больше порога
+в лог пишется предупреждение с местами, где выделенная память выросла
+сильнее всего. tracemalloc замедляет выделение памяти и сам занимает
+память, поэтому по умолчанию выключен.
+"""
+import asyncio
+import gc
+import logging
+import os
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Каталог проекта: в месте выделения показывается ещё и ближайший кадр нашего кода
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Лимит памяти контейнера (cgroup v2 и v1)
+CGROUP_LIMIT_FILES = ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes')
+
+
+def rss_bytes() -> int:
+    """Текущий RSS процесса (0 — не удалось определить)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Пиковое значение: в KiB на Linux, в байтах на macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+    except (ImportError, AttributeError):
+        return 0
+
+
+def memory_limit_bytes() -> int:
+    """Лимит памяти cgroup (0 — лимита нет или он неизвестен)"""
+    for path in CGROUP_LIMIT_FILES:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 2 ** 60:
+            return int(value)
+        return 0
+    return 0
+
+
+def _mb(size: float) -> str:
+    return f'{size / 1024 / 1024:+.2f} МБ'
+
+
+class MemoryTracker:
+    """Метрики памяти процесса и поиск утечек между циклами через tracemalloc"""
+    
+    # Служебные выделения, которые не относятся к работе бота
+    IGNORED = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    )
+    
+    def __init__(self, frames: int = 10, top: int = 10, leak_threshold_mb: float = 5.0,
+                 rss_warning_ratio: float = 0.8, metrics=None):
+        """
+        Args:
+            frames: Глубина стека, запоминаемого для каждого выделения
+            top: Сколько мест выделения показывать в предупреждении
+            leak_threshold_mb: Рост памяти за цикл, после которого пишется предупреждение
+            rss_warning_ratio: Доля лимита контейнера, после которой RSS считается опасным
+            metrics: MetricsRegistry для роста памяти по циклам
+        """
+        self.frames = frames
+        self.top = top
+        self.leak_threshold = leak_threshold_mb * 1024 * 1024
+        self.rss_warning_ratio = rss_warning_ratio
+        self.metrics = metrics
+        self.limit = memory_limit_bytes()
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._types: Counter = Counter()
+        # Число объектов gc после последнего цикла (обход всех объектов дорогой)
+        self._gc_objects: Optional[int] = None
+        # Один снимок за раз, даже если циклы каналов закончились одновременно
+        self._lock = asyncio.Lock()
+    
+    @property
+    def tracing(self) -> bool:
+        """Включено ли сравнение снимков tracemalloc"""
+        return self._previous is not None
+    
+    def start(self):
+        """Включить tracemalloc и снять исходный снимок"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        gc.collect()
+        self._previous = self._snapshot()
+        self._types = self._count_types()
+        self._gc_objects = sum(self._types.values())
+        logger.info(f"Отслеживание памяти включено (tracemalloc, глубина стека {self.frames})")
+    
+    def stats(self) -> dict:
+        """RSS, лимит контейнера, число объектов gc после цикла и память под tracemalloc (байты)"""
+        stats = {
+            'rss_bytes': rss_bytes(),
+            'limit_bytes': self.limit,
+        }
+        if self._gc_objects is not None:
+            stats['gc_objects'] = self._gc_objects
+        if tracemalloc.is_tracing():
+            stats['traced_bytes'], stats['traced_peak_bytes'] = tracemalloc.get_traced_memory()
+        return stats
+    
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(self.IGNORED)
+    
+    @staticmethod
+    def _count_types() -> Counter:
+        return Counter(type(obj).__name__ for obj in gc.get_objects())
+    
+    @staticmethod
+    def _site(traceback: tracemalloc.Traceback) -> str:
+        """Место выделения: верхний кадр и ближайший кадр кода проекта"""
+        def where(frame: tracemalloc.Frame) -> str:
+            path = frame.filename
+            if 'site-packages' + os.sep in path:
+                path = path.split('site-packages' + os.sep, 1)[1]
+            elif path.startswith(PROJECT_DIR):
+                path = os.path.relpath(path, PROJECT_DIR)
+            return f'{path}:{frame.lineno}'
+        
+        # Кадры идут от первого вызова к последнему
+        site = where(traceback[-1])
+        for index in range(len(traceback) - 1, -1, -1):
+            frame = traceback[index]
+            if frame.filename.startswith(PROJECT_DIR) and 'site-packages' not in frame.filename:
+                if index != len(traceback) - 1:
+                    site += f' ← {where(frame)}'
+                break
+        return site
+    
+    async def check(self, label: str = '') -> Optional[Dict]:
+        """
+        Проверить память после цикла
+        
+        RSS сравнивается с лимитом контейнера и пересчитываются объекты gc
+        всегда, снимок tracemalloc — только если он включён. Снимок и сравнение занимают заметное время,
+        поэтому выполняются в отдельном потоке.
+        
+        Args:
+            label: Канал, после цикла которого выполняется проверка
+        
+        Returns:
+            {'growth', 'sites', 'types'} или None, если tracemalloc выключен
+        """
+        report = None
+        if self.tracing:
+            async with self._lock:
+                report = await asyncio.to_thread(self._compare)
+            if self.metrics is not None:
+                self.metrics.set('memory_cycle_growth_bytes', report['growth'], label=label)
+        else:
+            self._gc_objects = len(gc.get_objects())
+        
+        rss = rss_bytes()
+        if report is not None:
+            summary = (f"Память после цикла {label or 'основного канала'}: RSS {rss / 1024 / 1024:.1f} МБ"
+                       f"{f' из {self.limit / 1024 / 1024:.0f} МБ' if self.limit else ''}, "
+                       f"tracemalloc {_mb(report['growth'])} за цикл")
+            if report['growth'] > self.leak_threshold:
+                lines = [f"{summary} — возможна утечка. Больше всего выросли:"]
+                lines += [f"  {_mb(item['size_diff'])} ({item['count_diff']:+d} блоков) {item['site']}"
+                          for item in report['sites']]
+                if report['types']:
+                    lines.append("  Объекты: " + ', '.join(f"{name} {diff:+d}" for name, diff in report['types']))
+                logger.warning('\n'.join(lines))
+            else:
+                logger.info(summary)
+        
+        if self.limit and rss > self.limit * self.rss_warning_ratio:
+            logger.warning(f"RSS {rss / 1024 / 1024:.0f} МБ — больше "
+                           f"{self.rss_warning_ratio:.0%} лимита контейнера {self.limit / 1024 / 1024:.0f} МБ")
+        return report
+    
+    def _compare(self) -> Dict:
+        """Снимок и разница с предыдущим (выполняется в потоке)"""
+        # Мусор, который ещё не собран, не должен выглядеть как утечка
+        gc.collect()
+        # Объекты считаются до сравнения, чтобы не учитывать сам отчёт
+        types = self._count_types()
+        type_growth = Counter(types)
+        type_growth.subtract(self._types)
+        self._types = types
+        self._gc_objects = sum(types.values())
+        
+        snapshot = self._snapshot()
+        diff = snapshot.compare_to(self._previous, 'traceback')
+        self._previous = snapshot
+        
+        growing = [stat for stat in diff if stat.size_diff > 0][:self.top]
+        sites: List[Dict] = [
+            {'site': self._site(stat.traceback), 'size_diff': stat.size_diff, 'count_diff': stat.count_diff}
+            for stat in growing
+        ]
+        return {
+            'growth': sum(stat.size_diff for stat in diff),
+            'sites': sites,
+            'types': [(name, count) for name, count in type_growth.most_common(self.top) if count > 0],
+        }
@@ -0,0 +1,262 @@
+# pipeline/metrics.py
+"""
+Метрики работы бота в памяти процесса
+
+Конвейер, планировщик и каналы записывают сюда задержки стадий, состояние
+циклов и ошибки источников, а общие компоненты (кэши, отправитель, AI)
+регистрируют функции, которые читаются в момент запроса /status.
+
+Те же метрики отдаются в формате Prometheus по HTTP (METRICS_PORT).
+"""
+import logging
+import re
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, fraction: float) -> float:
+    """Перцентиль по отсортированной копии значений (0 — значений нет)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик: счётчики, последние значения, распределения и gauge-функции
+    
+    Каждая метрика может иметь метку (имя стадии, источник, канал).
+    Распределения хранят последние window наблюдений для перцентилей
+    и счётчики по корзинам за всё время для гистограмм Prometheus.
+    """
+    
+    # Границы корзин гистограмм (секунды)
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+    
+    def __init__(self, window: int = 500):
+        """
+        Args:
+            window: Сколько последних наблюдений учитывать в перцентилях
+        """
+        self.window = window
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self._values: Dict[str, Dict[str, Any]] = {}
+        self._observations: Dict[str, Dict[str, deque]] = {}
+        # Метка -> [счётчики по корзинам (последняя — +Inf), сумма]
+        self._histograms: Dict[str, Dict[str, list]] = {}
+        self._gauges: Dict[str, Dict[str, Callable[[], Any]]] = {}
+        # Описание и имя метки для экспорта в Prometheus
+        self._descriptions: Dict[str, Tuple[str, str]] = {}
+    
+    def describe(self, name: str, help_text: str, label_name: str = 'label'):
+        """Описание метрики и имя её метки в Prometheus (например, stage или source)"""
+        self._descriptions[name] = (help_text, label_name)
+    
+    def incr(self, name: str, value: float = 1, label: str = ''):
+        """Увеличить счётчик"""
+        counters = self._counters.setdefault(name, {})
+        counters[label] = counters.get(label, 0) + value
+    
+    def set(self, name: str, value: Any, label: str = ''):
+        """Запомнить последнее значение (время цикла, последняя ошибка)"""
+        self._values.setdefault(name, {})[label] = value
+    
+    def observe(self, name: str, value: float, label: str = ''):
+        """Добавить наблюдение в распределение (например, длительность в секундах)"""
+        series = self._observations.setdefault(name, {})
+        if label not in series:
+            series[label] = deque(maxlen=self.window)
+            self._histograms.setdefault(name, {})[label] = [[0] * (len(self.BUCKETS) + 1), 0.0]
+        series[label].append(value)
+        histogram = self._histograms[name][label]
+        histogram[0][bisect_left(self.BUCKETS, value)] += 1
+        histogram[1] += value
+    
+    @contextmanager
+    def timer(self, name: str, label: str = ''):
+        """Измерить длительность блока и добавить её в распределение"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, label)
+    
+    def register(self, name: str, func: Callable[[], Any], label: str = ''):
+        """Зарегистрировать функцию, значение которой читается при снимке"""
+        self._gauges.setdefault(name, {})[label] = func
+    
+    def get(self, name: str, label: str = '', default: Any = None) -> Any:
+        """Последнее значение метрики"""
+        return self._values.get(name, {}).get(label, default)
+    
+    def summary(self, name: str) -> Dict[str, dict]:
+        """Распределение по меткам: количество наблюдений, p50 и p95"""
+        return {
+            label: {
+                'count': len(values),
+                'p50': percentile(values, 0.5),
+                'p95': percentile(values, 0.95),
+            }
+            for label, values in self._observations.get(name, {}).items()
+        }
+    
+    def snapshot(self) -> dict:
+        """Все метрики на текущий момент"""
+        gauges = {}
+        for name, funcs in self._gauges.items():
+            gauges[name] = {label: func() for label, func in funcs.items()}
+        return {
+            'counters': {name: dict(values) for name, values in self._counters.items()},
+            'values': {name: dict(values) for name, values in self._values.items()},
+            'distributions': {name: self.summary(name) for name in self._observations},
+            'gauges': gauges,
+        }
+    
+    def prometheus_text(self, prefix: str = 'telegrachannel') -> str:
+        """
+        Метрики в текстовом формате Prometheus
+        
+        Счётчики экспортируются как counter (с суффиксом _total), распределения —
+        как histogram, последние значения и gauge-функции — как gauge: числовые
+        поля словарей становятся отдельными метриками, время — unix timestamp.
+        """
+        lines = []
+        
+        def header(metric: str, name: str, kind: str):
+            help_text = self._descriptions.get(name, (name, ''))[0]
+            lines.append(f'# HELP {metric} {_escape_help(help_text)}')
+            lines.append(f'# TYPE {metric} {kind}')
+        
+        for name, values in self._counters.items():
+            metric = f'{prefix}_{_metric_name(name)}_total'
+            header(metric, name, 'counter')
+            for label, value in values.items():
+                lines.append(f'{metric}{self._labels(name, label)} {_number(value)}')
+        
+        for name, series in self._histograms.items():
+            metric = f'{prefix}_{_metric_name(name)}'
+            header(metric, name, 'histogram')
+            for label, (counts, total) in series.items():
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS + (float('inf'),), counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    lines.append(f'{metric}_bucket{self._labels(name, label, le=le)} {cumulative}')
+                lines.append(f'{metric}_sum{self._labels(name, label)} {_number(total)}')
+                lines.append(f'{metric}_count{self._labels(name, label)} {cumulative}')
+        
+        # Последние значения и gauge-функции: метрика -> [(метка, значение)]
+        gauges: Dict[str, list] = {}
+        sources = list(self._values.items())
+        for name, funcs in self._gauges.items():
+            values = {}
+            for label, func in funcs.items():
+                try:
+                    values[label] = func()
+                except Exception as e:
+                    logger.warning(f"Метрика {name} недоступна: {e}")
+            sources.append((name, values))
+        for name, values in sources:
+            for label, value in values.items():
+                for suffix, number in _flatten(value):
+                    metric = f'{prefix}_{_metric_name(name)}{suffix}'
+                    gauges.setdefault(metric, [name]).append((label, number))
+        
+        for metric, (name, *samples) in gauges.items():
+            header(metric, name, 'gauge')
+            for label, number in samples:
+                lines.append(f'{metric}{self._labels(name, label)} {_number(number)}')
+        
+        return '\n'.join(lines) + '\n'
+    
+    def _labels(self, name: str, label: str, **extra: str) -> str:
+        """Метки сэмпла Prometheus: {stage="fetch",le="0.5"}"""
+        pairs = dict(extra)
+        if label:
+            pairs = {self._descriptions.get(name, ('', 'label'))[1]: label, **pairs}
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{key}="{_escape_label(str(value))}"' for key, value in pairs.items()) + '}'
+
+
+def _metric_name(name: str) -> str:
+    """Имя, допустимое в Prometheus"""
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    """Число в формате Prometheus (целые без .0)"""
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def _flatten(value: Any, suffix: str = '') -> Iterator[Tuple[str, float]]:
+    """Числовые поля значения метрики: (суффикс имени, число)"""
+    if isinstance(value, bool):
+        yield suffix, int(value)
+    elif isinstance(value, (int, float)):
+        yield suffix, value
+    elif isinstance(value, datetime):
+        yield suffix, value.timestamp()
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, f'{suffix}_{_metric_name(str(key))}')
+
+
+class MetricsServer:
+    """HTTP-сервер с метриками в формате Prometheus (GET /metrics)"""
+    
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+    
+    def __init__(self, metrics: MetricsRegistry, listen: str = '127.0.0.1', port: int = 9100):
+        """
+        Args:
+            metrics: Реестр метрик процесса
+            listen: Адрес, на котором слушать (по умолчанию только локальные запросы)
+            port: Порт
+        """
+        self.metrics = metrics
+        self.listen = listen
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+    
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """GET /metrics"""
+        return web.Response(body=self.metrics.prometheus_text().encode(),
+                            headers={'Content-Type': self.CONTENT_TYPE})
+    
+    async def start(self):
+        """Запустить сервер"""
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logger.info(f"Метрики Prometheus: http://{self.listen}:{self.port}/metrics")
+    
+    async def stop(self):
+        """Остановить сервер"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,126 @@
+# pipeline/outbox.py
+"""
+Отправка постов через outbox
+
+Готовый пост сначала сохраняется в таблицу outbox, затем отправитель
+захватывает запись, отправляет её и одной транзакцией отмечает отправку
+и публикацию. Упавшая отправка остаётся в outbox с расписанием повтора,
+поэтому оплаченный AI-текст не теряется, а падение процесса посреди
+отправки не приводит к повторной публикации.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+async def recover_outbox(storage) -> int:
+    """
+    Восстановление после падения (один запрос при старте процесса)
+    
+    Записи, захваченные для отправки, но не подтверждённые, переводятся
+    в статус unknown: сообщение могло уйти, поэтому автоматически они
+    не переотправляются (вернуть в очередь: manage.py outbox --requeue-unknown).
+    
+    Returns:
+        Количество прерванных отправок
+    """
+    recovered = await storage.outbox_recover()
+    if recovered:
+        logger.warning(f"Outbox: {recovered} пост(ов) прерваны во время отправки, статус unknown")
+    return recovered
+
+
+class Outbox:
+    """Доставка постов из outbox с повторами и ключами идемпотентности"""
+    
+    def __init__(self, storage, send: Callable[[Dict], Awaitable[Optional[int]]],
+                 max_attempts: int = 5, retry_delay: float = 60,
+                 is_permanent: Optional[Callable[[Exception], bool]] = None,
+                 is_uncertain: Optional[Callable[[Exception], bool]] = None):
+        """
+        Args:
+            storage: AsyncStorage
+            send: Корутина отправки записи outbox, возвращает message_id
+            max_attempts: Сколько раз пытаться отправить пост
+            retry_delay: Задержка перед первым повтором (секунды), дальше удваивается
+            is_permanent: Ошибка, после которой повторять отправку бесполезно
+            is_uncertain: Ошибка после отправки запроса (нет ответа): сообщение могло
+                дойти, поэтому запись помечается unknown и не переотправляется
+        """
+        self.storage = storage
+        self.send = send
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.is_permanent = is_permanent
+        self.is_uncertain = is_uncertain
+    
+    @staticmethod
+    def idempotency_key(channel: str, url: str) -> str:
+        """Ключ записи: один материал попадает в канал не больше одного раза"""
+        return f'{channel}:{url}'
+    
+    async def enqueue(self, post: Dict, channel: str, chat_id: str) -> Optional[Dict]:
+        """
+        Сохранить готовый пост в outbox
+        
+        Returns:
+            Запись outbox или None, если пост уже стоит в очереди
+        """
+        entry = {
+            'idempotency_key': self.idempotency_key(channel, post['url']),
+            'channel': channel,
+            'chat_id': chat_id,
+            'url': post['url'],
+            'title': post['title'],
+            'source': post['source'],
+            'description': post.get('description', ''),
+            'text': post['formatted_text'],
+            'images': '\n'.join(post.get('images') or []),
+            'attempts': 0,
+        }
+        outbox_id = await self.storage.outbox_enqueue(entry)
+        if outbox_id is None:
+            logger.info(f"Пост уже в outbox: {post['title']}")
+            return None
+        return dict(entry, id=outbox_id)
+    
+    async def deliver(self, entry: Dict) -> bool:
+        """
+        Отправить запись outbox
+        
+        Returns:
+            True, если пост отправлен и отмечен опубликованным
+        """
+        if not await self.storage.outbox_claim(entry['id'], datetime.now()):
+            # Запись уже отправляется или отправлена (другим воркером или экземпляром)
+            return False
+        
+        attempt = entry.get('attempts', 0) + 1
+        try:
+            message_id = await self.send(entry)
+        except Exception as e:
+            if self.is_uncertain and self.is_uncertain(e):
+                # Повтор мог бы опубликовать пост второй раз
+                logger.error(f"Outbox: неизвестно, дошёл ли пост, статус unknown: {entry['title']}: {e}")
+                await self.storage.outbox_mark_unknown(entry['id'], str(e), datetime.now())
+                return False
+            if self.is_permanent and self.is_permanent(e):
+                retry_at = None
+                logger.error(f"Outbox: пост не может быть отправлен: {entry['title']}: {e}")
+            elif attempt >= self.max_attempts:
+                retry_at = None
+                logger.error(f"Outbox: пост не отправлен после {attempt} попыток: {entry['title']}: {e}")
+            else:
+                retry_at = datetime.now() + timedelta(seconds=self.retry_delay * 2 ** (attempt - 1))
+                logger.warning(f"Outbox: ошибка отправки, повтор в {retry_at:%H:%M:%S}: {entry['title']}: {e}")
+            await self.storage.outbox_fail(entry['id'], str(e), retry_at, datetime.now())
+            return False
+        
+        await self.storage.outbox_complete(entry['id'], message_id, datetime.now())
+        return True
+    
+    async def due(self, channel: str, limit: int = 10):
+        """Записи канала, которые пора отправить или переотправить"""
+        return await self.storage.outbox_due(channel, datetime.now(), limit)
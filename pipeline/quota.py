@@ -0,0 +1,65 @@
+# pipeline/quota.py
+"""
+Квота публикаций цикла
+
+Ограничивает количество элементов, одновременно находящихся между
+стадией рерайтинга и публикацией, чтобы AI не обрабатывал кандидатов
+сверх квоты. Если элемент отсеялся, его место освобождается для
+следующего кандидата из ранжированного потока.
+"""
+import asyncio
+
+
+class QuotaGate:
+    """Счётчик мест в квоте: опубликованные + находящиеся в обработке"""
+    
+    def __init__(self, quota: int, published: int = 0):
+        """
+        Args:
+            quota: Сколько постов нужно опубликовать
+            published: Сколько уже опубликовано в этом цикле (например, повторы из outbox)
+        """
+        self.quota = quota
+        self.published = published
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+    
+    @property
+    def filled(self) -> bool:
+        """Квота набрана"""
+        return self.published >= self.quota
+    
+    async def acquire(self) -> bool:
+        """
+        Занять место в квоте (ждёт, пока освободится)
+        
+        Returns:
+            False, если квота уже набрана и кандидат не нужен
+        """
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self.filled or self.published + self.in_flight < self.quota
+            )
+            if self.filled:
+                return False
+            self.in_flight += 1
+            return True
+    
+    async def set_quota(self, quota: int):
+        """Изменить квоту на ходу (например, после перезагрузки настроек)"""
+        async with self._condition:
+            self.quota = quota
+            self._condition.notify_all()
+    
+    async def release(self):
+        """Элемент отсеялся: место возвращается следующему кандидату"""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+    
+    async def complete(self):
+        """Элемент опубликован"""
+        async with self._condition:
+            self.in_flight -= 1
+            self.published += 1
+            self._condition.notify_all()
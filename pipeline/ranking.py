@@ -0,0 +1,123 @@
+# pipeline/ranking.py
+"""
+Ранжирование кандидатов на публикацию
+
+Сигналы популярности (звёзды, рейтинг, просмотры) приводятся к шкале
+0..1 внутри текущей выборки, взвешиваются и затухают с возрастом
+материала (или с момента загрузки, если даты нет). Лучшие кандидаты
+выбираются через кучу.
+"""
+import heapq
+import math
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+
+class CandidateRanker:
+    """Оценка и отбор лучших кандидатов из разных источников"""
+    
+    # Веса сигналов по умолчанию
+    DEFAULT_WEIGHTS = {
+        'stars_today': 0.6,
+        'stars': 0.4,
+        'rating': 0.6,
+        'views': 0.4,
+    }
+    
+    def __init__(self, weights: Optional[Dict[str, float]] = None, half_life_hours: float = 24.0):
+        """
+        Args:
+            weights: Веса сигналов; сигналы с нулевым весом не учитываются
+            half_life_hours: Период полураспада оценки по возрасту (0 — без затухания)
+        """
+        self.weights = {**self.DEFAULT_WEIGHTS, **(weights or {})}
+        self.half_life_hours = half_life_hours
+    
+    def score_all(self, items: List[Dict]) -> List[float]:
+        """
+        Оценить все элементы выборки
+        
+        Каждый сигнал логарифмируется (популярность распределена
+        с длинным хвостом) и нормируется min-max по элементам, у которых
+        он есть. Оценка элемента — средневзвешенное его сигналов, поэтому
+        источники с разными наборами сигналов сравнимы между собой.
+        
+        Returns:
+            Оценки в том же порядке, что и items
+        """
+        bounds = {}
+        for signal, weight in self.weights.items():
+            if weight <= 0:
+                continue
+            values = [self._signal(item, signal) for item in items]
+            values = [value for value in values if value is not None]
+            if values:
+                bounds[signal] = (min(values), max(values))
+        
+        now = datetime.now(timezone.utc)
+        scores = []
+        for item in items:
+            total = 0.0
+            weight_sum = 0.0
+            for signal, (low, high) in bounds.items():
+                value = self._signal(item, signal)
+                if value is None:
+                    continue
+                normalized = (value - low) / (high - low) if high > low else 0.5
+                total += self.weights[signal] * normalized
+                weight_sum += self.weights[signal]
+            
+            score = total / weight_sum if weight_sum else 0.0
+            scores.append(score * self._decay(item, now))
+        
+        return scores
+    
+    def ranked(self, items: List[Dict]) -> Iterator[Dict]:
+        """
+        Ленивый поток кандидатов по убыванию оценки
+        
+        Куча строится за O(n), каждый следующий кандидат извлекается
+        за O(log n) только тогда, когда он действительно понадобился.
+        """
+        heap = [(-score, i, item) for i, (item, score) in enumerate(zip(items, self.score_all(items)))]
+        heapq.heapify(heap)
+        while heap:
+            score, _, item = heapq.heappop(heap)
+            item['score'] = -score
+            yield item
+    
+    @staticmethod
+    def _signal(item: Dict, signal: str) -> Optional[float]:
+        """Значение сигнала на логарифмической шкале (None — сигнала нет)"""
+        value = item.get(signal)
+        if value is None:
+            return None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        # Рейтинг может быть отрицательным: сохраняем знак
+        return math.copysign(math.log1p(abs(value)), value)
+    
+    def _decay(self, item: Dict, now: datetime) -> float:
+        """
+        Множитель затухания по возрасту материала
+        
+        Возраст считается от published_at, а если даты публикации нет
+        (GitHub Trending) — от fetched_at, времени загрузки источника.
+        Материал без обеих дат не затухает.
+        """
+        published_at = item.get('published_at') or item.get('fetched_at')
+        if self.half_life_hours <= 0 or not published_at:
+            return 1.0
+        
+        if isinstance(published_at, str):
+            try:
+                published_at = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+            except ValueError:
+                return 1.0
+        if published_at.tzinfo is None:
+            published_at = published_at.astimezone()
+        
+        age_hours = max(0.0, (now - published_at).total_seconds() / 3600)
+        return 0.5 ** (age_hours / self.half_life_hours)
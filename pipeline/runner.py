@@ -0,0 +1,178 @@
+# pipeline/runner.py
+"""
+Конвейер обработки контента из последовательных стадий
+
+Стадии соединены ограниченными очередями asyncio.Queue: у каждой стадии
+свой пул воркеров, стадии работают одновременно, а медленная стадия
+притормаживает предыдущие вместо неограниченного роста очередей.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+from utils.log import log_context
+from utils.tracing import span, use_trace
+
+from .metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# Маркер конца потока элементов
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """Стадия конвейера"""
+    
+    name: str
+    # Обработчик элемента; None — элемент отбрасывается
+    handler: Callable[[Any], Awaitable[Any]]
+    workers: int = 1
+    # Обработчик возвращает список, каждый элемент которого идёт дальше отдельно
+    fan_out: bool = False
+    # Стадия-барьер: обработчик получает список всех элементов и возвращает
+    # итерируемый результат (например, сортировку)
+    collect: bool = False
+
+
+class Pipeline:
+    """Запуск стадий с ограниченными очередями между ними"""
+    
+    def __init__(self, stages: List[Stage], queue_size: int = 10, metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            stages: Стадии в порядке обработки
+            queue_size: Размер очереди перед каждой стадией
+            metrics: Реестр для длительностей и ошибок стадий
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics = metrics
+        self._queues: List[asyncio.Queue] = []
+        self._stop_event: Optional[asyncio.Event] = None
+    
+    def stop(self):
+        """
+        Досрочно остановить конвейер (например, после набора квоты)
+        
+        Вызывайте последним действием обработчика: остальные задачи
+        будут отменены на ближайшей точке ожидания.
+        """
+        if self._stop_event:
+            self._stop_event.set()
+    
+    def queue_depths(self) -> dict:
+        """Текущее количество элементов в очереди перед каждой стадией"""
+        return {stage.name: queue.qsize() for stage, queue in zip(self.stages, self._queues)}
+    
+    async def run(self, items: Iterable[Any]):
+        """
+        Прогнать элементы через все стадии
+        
+        Args:
+            items: Входные элементы первой стадии
+        """
+        self._stop_event = asyncio.Event()
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        
+        tasks = []
+        for i, stage in enumerate(self.stages):
+            inbox = self._queues[i]
+            outbox = self._queues[i + 1] if i + 1 < len(self.stages) else None
+            next_workers = self._worker_count(self.stages[i + 1]) if outbox else 0
+            
+            workers = [
+                asyncio.create_task(self._worker(stage, inbox, outbox), name=f'pipeline-{stage.name}-{n}')
+                for n in range(self._worker_count(stage))
+            ]
+            tasks.extend(workers)
+            tasks.append(asyncio.create_task(self._close_stage(workers, outbox, next_workers)))
+        
+        tasks.append(asyncio.create_task(self._feed(items)))
+        
+        done = asyncio.gather(*tasks)
+        stop = asyncio.create_task(self._stop_event.wait())
+        try:
+            await asyncio.wait([done, stop], return_when=asyncio.FIRST_COMPLETED)
+            if done.done():
+                # Ошибка стадии пробрасывается вызывающему
+                done.result()
+            else:
+                logger.info("Конвейер остановлен досрочно")
+        finally:
+            # Досрочная остановка, ошибка стадии или отмена самого run():
+            # ни одна стадия не должна остаться работать в фоне
+            for task in tasks:
+                task.cancel()
+            stop.cancel()
+            await asyncio.gather(done, stop, *tasks, return_exceptions=True)
+    
+    @staticmethod
+    def _worker_count(stage: Stage) -> int:
+        """Барьерная стадия всегда обрабатывается одним воркером"""
+        return 1 if stage.collect else max(1, stage.workers)
+    
+    async def _feed(self, items: Iterable[Any]):
+        """Подача входных элементов в первую стадию"""
+        first = self._queues[0]
+        for item in items:
+            await first.put(item)
+        for _ in range(self._worker_count(self.stages[0])):
+            await first.put(_DONE)
+    
+    async def _close_stage(self, workers: List[asyncio.Task], outbox: Optional[asyncio.Queue], next_workers: int):
+        """Когда все воркеры стадии завершились, закрыть поток для следующей стадии"""
+        await asyncio.gather(*workers)
+        if outbox is not None:
+            for _ in range(next_workers):
+                await outbox.put(_DONE)
+    
+    async def _worker(self, stage: Stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        """Воркер стадии: берёт элементы из входной очереди и отдаёт результат дальше"""
+        if stage.collect:
+            collected = []
+            while (item := await inbox.get()) is not _DONE:
+                collected.append(item)
+            results = await self._call(stage, collected)
+            for result in results or []:
+                await self._emit(outbox, result)
+            return
+        
+        while (item := await inbox.get()) is not _DONE:
+            result = await self._call(stage, item)
+            if result is None:
+                continue
+            if stage.fan_out:
+                for element in result:
+                    await self._emit(outbox, element)
+            else:
+                await self._emit(outbox, result)
+    
+    async def _call(self, stage: Stage, item: Any) -> Any:
+        """Вызов обработчика: ошибка отбрасывает элемент, но не останавливает конвейер"""
+        started = time.monotonic()
+        context = item if isinstance(item, dict) else {}
+        # Сообщения об обработке элемента помечаются его correlation_id, шаги попадают в его трассу
+        with log_context(context.get('correlation_id')), use_trace(context.get('trace')):
+            try:
+                with span(stage.name):
+                    return await stage.handler(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка на стадии {stage.name}: {e}")
+                if self.metrics:
+                    self.metrics.incr('stage_errors', label=stage.name)
+                return None
+            finally:
+                if self.metrics:
+                    self.metrics.observe('stage_seconds', time.monotonic() - started, label=stage.name)
+    
+    @staticmethod
+    async def _emit(outbox: Optional[asyncio.Queue], item: Any):
+        """Передать элемент следующей стадии (ждёт, если очередь заполнена)"""
+        if outbox is not None:
+            await outbox.put(item)
@@ -0,0 +1,126 @@
+# pipeline/scheduler.py
+"""
+Расписание циклов публикации по настенным часам
+
+Время следующего запуска считается от запланированного, а не от
+фактического окончания цикла, поэтому расписание не сдвигается.
+Оно сохраняется в БД и переживает перезапуск процесса.
+"""
+import logging
+from datetime import datetime, time as dt_time, timedelta
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PostingScheduler:
+    """Планировщик: ежедневные слоты ('09:00,18:30') или равномерный интервал"""
+    
+    STATE_KEY = 'scheduler.next_fire'
+    
+    def __init__(self, storage, interval_hours: float = 6, slots: Optional[List[str]] = None, name: str = ''):
+        """
+        Args:
+            storage: AsyncStorage для сохранения времени следующего запуска
+            interval_hours: Интервал между циклами, если слоты не заданы
+            slots: Ежедневные слоты в формате ЧЧ:ММ (локальное время)
+            name: Имя канала: у каждого канала своё расписание
+        """
+        self.storage = storage
+        self.state_key = f'{self.STATE_KEY}.{name}' if name else self.STATE_KEY
+        self.interval = timedelta(hours=interval_hours)
+        self.slots = sorted(self._parse_slot(slot) for slot in slots or [])
+        self.next_fire: Optional[datetime] = None
+    
+    @staticmethod
+    def _parse_slot(slot: str) -> dt_time:
+        """'09:30' -> time(9, 30)"""
+        hours, minutes = slot.strip().split(':')
+        return dt_time(int(hours), int(minutes))
+    
+    @staticmethod
+    def _now() -> datetime:
+        """Текущее локальное время с часовым поясом"""
+        return datetime.now().astimezone()
+    
+    def following(self, after: datetime) -> datetime:
+        """
+        Ближайший запуск строго после указанного момента
+        
+        Для слотов — следующий слот по календарю, для интервала —
+        after + интервал (опорная точка — запланированное время).
+        """
+        if not self.slots:
+            return after + self.interval
+        
+        day = after.date()
+        while True:
+            for slot in self.slots:
+                candidate = datetime.combine(day, slot).astimezone()
+                if candidate > after:
+                    return candidate
+            day += timedelta(days=1)
+    
+    async def load(self) -> datetime:
+        """
+        Восстановить время следующего запуска после перезапуска
+        
+        Если сохранённый запуск был пропущен, пока процесс не работал,
+        цикл выполняется сразу (один раз), а не по всем пропущенным слотам.
+        """
+        now = self._now()
+        saved = await self.storage.get_state(self.state_key)
+        if saved:
+            try:
+                self.next_fire = datetime.fromisoformat(saved)
+            except ValueError:
+                logger.warning(f"Некорректное сохранённое время запуска: {saved}")
+        
+        if self.next_fire is None:
+            # Первый запуск: интервальный режим стартует сразу, слоты — по ближайшему слоту
+            self.next_fire = now if not self.slots else self.following(now)
+        elif self.next_fire < now:
+            logger.info(f"Пропущен запуск {self.next_fire:%Y-%m-%d %H:%M}, выполняем сейчас")
+            self.next_fire = now
+        
+        await self.storage.set_state(self.state_key, self.next_fire.isoformat())
+        return self.next_fire
+    
+    async def reconfigure(self, interval_hours: float, slots: Optional[List[str]] = None):
+        """
+        Сменить расписание без перезапуска
+        
+        В режиме слотов следующий запуск — ближайший новый слот. В режиме
+        интервала ожидание не удлиняется: запуск сдвигается на now + интервал,
+        только если это раньше уже запланированного.
+        """
+        self.interval = timedelta(hours=interval_hours)
+        self.slots = sorted(self._parse_slot(slot) for slot in slots or [])
+        if self.next_fire is None:
+            return
+        
+        now = self._now()
+        next_fire = self.following(now) if self.slots else min(self.next_fire, now + self.interval)
+        if next_fire != self.next_fire:
+            logger.info(f"Расписание изменено, следующий запуск в: {next_fire:%Y-%m-%d %H:%M:%S}")
+            self.next_fire = next_fire
+            await self.storage.set_state(self.state_key, next_fire.isoformat())
+    
+    async def advance(self, fired_at: datetime):
+        """
+        Запланировать запуск после fired_at и сохранить его
+        
+        Вызывается после окончания цикла: если цикл шёл дольше интервала,
+        просроченные запуски пропускаются, а сетка расписания сохраняется.
+        """
+        next_fire = self.following(fired_at)
+        now = self._now()
+        skipped = 0
+        while next_fire <= now:
+            next_fire = self.following(next_fire)
+            skipped += 1
+        if skipped:
+            logger.warning(f"Пропущено запусков из-за долгого цикла: {skipped}")
+        
+        self.next_fire = next_fire
+        await self.storage.set_state(self.state_key, next_fire.isoformat())
@@ -0,0 +1,238 @@
+# pipeline/sender.py
+"""
+Отправка сообщений в Telegram с учётом flood control
+
+Лимиты Telegram: около 30 сообщений в секунду на бота и около 20 в минуту
+в одну группу или канал. Отправитель держит общий token bucket и по одному
+на каждый чат, выполняет RetryAfter (пауза для чата) и повторяет сетевые
+ошибки, при которых запрос не ушёл в Telegram, поэтому посты можно
+отправлять пачками во много каналов. Таймаут ответа повторять нельзя:
+сообщение могло дойти, и повтор опубликовал бы его второй раз.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Dict
+
+import httpx
+from telegram.error import BadRequest, ChatMigrated, Forbidden, InvalidToken, NetworkError, RetryAfter
+
+from .metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity накопленных"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        # До этого момента токены не выдаются (RetryAfter от Telegram)
+        self._blocked_until = 0.0
+        # Ожидающие обслуживаются по очереди
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float):
+        """Начислить токены за прошедшее время"""
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def block(self, seconds: float):
+        """Не выдавать токены seconds секунд и сбросить накопленные"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+    
+    async def acquire(self, tokens: float = 1):
+        """
+        Дождаться и забрать tokens токенов
+        
+        Запрос больше capacity ждёт полного bucket и уходит в минус:
+        следующие ждут, пока долг не восполнится.
+        """
+        needed = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= needed:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((needed - self.tokens) / self.rate)
+
+
+class TelegramSender:
+    """Отправитель сообщений с лимитами на бота и на чат, повторами и метриками"""
+    
+    # Ошибки, которые повторять бесполезно: неверный текст, нет доступа к чату
+    PERMANENT_ERRORS = (BadRequest, Forbidden, InvalidToken, ChatMigrated)
+    
+    # Причины NetworkError, при которых запрос точно не ушёл: соединение не
+    # установлено или не дождались свободного соединения в пуле
+    NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+    
+    # Сколько последних отправок учитывать в перцентилях задержки
+    LATENCY_WINDOW = 500
+    
+    def __init__(self, bot, global_rate: float = 25, chat_rate_per_minute: float = 20,
+                 chat_burst: int = 3, max_retries: int = 5, retry_delay: float = 1.0, metrics=None):
+        """
+        Args:
+            bot: telegram.Bot
+            global_rate: Сообщений в секунду на бота
+            chat_rate_per_minute: Сообщений в минуту в один чат
+            chat_burst: Сколько сообщений подряд можно отправить в чат без паузы
+            max_retries: Повторов при RetryAfter и сетевых ошибках
+            retry_delay: Первая пауза перед повтором сетевой ошибки (дальше удваивается)
+            metrics: MetricsRegistry для гистограмм задержки и счётчиков повторов (None — только stats())
+        """
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, max(1, global_rate))
+        self.chat_rate = chat_rate_per_minute / 60
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.metrics = metrics
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        
+        # Метрики
+        self.waiting = 0
+        self.in_flight = 0
+        self.counters = {'sent': 0, 'retry_after': 0, 'retries': 0, 'errors': 0}
+        self._latency = deque(maxlen=self.LATENCY_WINDOW)
+        self._api_latency = deque(maxlen=self.LATENCY_WINDOW)
+    
+    @classmethod
+    def is_permanent(cls, error: Exception) -> bool:
+        """Ошибка не исправится повтором отправки"""
+        return isinstance(error, cls.PERMANENT_ERRORS)
+    
+    @classmethod
+    def was_not_sent(cls, error: Exception) -> bool:
+        """Запрос не дошёл до Telegram, повтор безопасен"""
+        return isinstance(error.__cause__, cls.NOT_SENT_ERRORS)
+    
+    @classmethod
+    def is_uncertain(cls, error: Exception) -> bool:
+        """Запрос ушёл, но ответа нет (TimedOut, обрыв соединения): сообщение могло дойти"""
+        return (isinstance(error, NetworkError) and not cls.is_permanent(error)
+                and not cls.was_not_sent(error))
+    
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        """Bucket чата (создаётся при первой отправке)"""
+        key = str(chat_id)
+        if key not in self._chat_buckets:
+            self._chat_buckets[key] = TokenBucket(self.chat_rate, self.chat_burst)
+        return self._chat_buckets[key]
+    
+    async def send_message(self, chat_id, text: str, **kwargs):
+        """
+        Отправить сообщение с соблюдением лимитов
+        
+        Args:
+            chat_id: ID или @username чата
+            text: Текст сообщения
+            **kwargs: Остальные параметры Bot.send_message
+        
+        Returns:
+            telegram.Message
+        
+        Raises:
+            TelegramError: Постоянная ошибка или исчерпаны повторы
+        """
+        return await self._send('send_message', chat_id, text=text, **kwargs)
+    
+    async def send_photo(self, chat_id, photo, **kwargs):
+        """Отправить фото (file_id или содержимое файла), параметры как у Bot.send_photo"""
+        return await self._send('send_photo', chat_id, photo=photo, **kwargs)
+    
+    async def send_media_group(self, chat_id, media, **kwargs):
+        """Отправить альбом, возвращает кортеж сообщений (Bot.send_media_group)"""
+        return await self._send('send_media_group', chat_id, media=media, **kwargs)
+    
+    async def _send(self, method: str, chat_id, **kwargs):
+        """Вызов метода Bot с лимитами, повторами и метриками"""
+        started = time.monotonic()
+        chat_bucket = self._chat_bucket(chat_id)
+        # Альбом — отдельное сообщение на каждый элемент, в лимитах тоже
+        cost = len(kwargs['media']) if method == 'send_media_group' else 1
+        attempt = 0
+        
+        while True:
+            # Сначала лимит чата: ожидание одного канала не занимает общий лимит
+            self.waiting += 1
+            try:
+                await chat_bucket.acquire(cost)
+                await self.global_bucket.acquire(cost)
+            finally:
+                self.waiting -= 1
+            
+            self.in_flight += 1
+            call_started = time.monotonic()
+            try:
+                message = await getattr(self.bot, method)(chat_id=chat_id, **kwargs)
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                self.counters['retry_after'] += 1
+                if self.metrics is not None:
+                    self.metrics.incr('telegram_retries', label='retry_after')
+                chat_bucket.block(retry_after)
+                error = e
+                logger.warning(f"Flood control для {chat_id}: пауза {retry_after} с")
+            except NetworkError as e:
+                if not self.was_not_sent(e):
+                    # Постоянная ошибка или запрос уже ушёл: повтор может задвоить пост
+                    self._count_error(method)
+                    raise
+                error = e
+                if self.metrics is not None:
+                    self.metrics.incr('telegram_retries', label='network')
+                delay = self.retry_delay * 2 ** attempt
+                logger.warning(f"Сетевая ошибка при отправке в {chat_id}, повтор через {delay:.0f} с: {e}")
+                await asyncio.sleep(delay)
+            except Exception:
+                self._count_error(method)
+                raise
+            else:
+                self._api_latency.append(time.monotonic() - call_started)
+                self._latency.append(time.monotonic() - started)
+                self.counters['sent'] += 1
+                if self.metrics is not None:
+                    self.metrics.observe('telegram_api_seconds', self._api_latency[-1], label=method)
+                    self.metrics.observe('telegram_send_seconds', self._latency[-1], label=method)
+                return message
+            finally:
+                self.in_flight -= 1
+            
+            attempt += 1
+            if attempt > self.max_retries:
+                self._count_error(method)
+                raise error
+            self.counters['retries'] += 1
+    
+    def _count_error(self, method: str):
+        """Неудачная отправка"""
+        self.counters['errors'] += 1
+        if self.metrics is not None:
+            self.metrics.incr('telegram_send_errors', label=method)
+    
+    def stats(self) -> dict:
+        """Глубина очереди, счётчики и задержки отправки (секунды)"""
+        return {
+            'queue_depth': self.waiting,
+            'in_flight': self.in_flight,
+            **self.counters,
+            'latency_p50': percentile(self._latency, 0.5),
+            'latency_p95': percentile(self._latency, 0.95),
+            'api_latency_p50': percentile(self._api_latency, 0.5),
+            'api_latency_p95': percentile(self._api_latency, 0.95),
+        }
@@ -22,7 +22,7 @@ cat > ~/Library/LaunchAgents/com.telegram.bot.plist << EOF
     <key>KeepAlive</key>
     <true/>
     <key>StandardOutPath</key>
-    <string>$(pwd)/bot.log</string>
+    <string>$(pwd)/bot.out</string>
     <key>StandardErrorPath</key>
     <string>$(pwd)/bot_error.log</string>
 </dict>
@@ -11,7 +11,10 @@ fi
 
 # Активируем виртуальное окружение и запускаем бота
 source venv/bin/activate
-nohup python run.py > bot.log 2>&1 &
+# Логи бот пишет сам: JSON в bot.log с ротацией по размеру (LOG_MAX_BYTES, LOG_BACKUP_COUNT).
+# В bot.out попадает только вывод до настройки логирования и аварийные трассировки
+export LOG_FILE="${LOG_FILE:-bot.log}"
+nohup python run.py > bot.out 2>&1 &
 
 echo "✅ Бот запущен в фоновом режиме!"
 echo "📋 Для просмотра логов: tail -f bot.log"
@@ -1,3 +1,5 @@
 from .helpers import clean_html, truncate_text, format_number, get_time_ago
+from .log import correlation_id, log_context, new_correlation_id, setup_logging
 
-__all__ = ['clean_html', 'truncate_text', 'format_number', 'get_time_ago']
+__all__ = ['clean_html', 'truncate_text', 'format_number', 'get_time_ago',
+           'correlation_id', 'log_context', 'new_correlation_id', 'setup_logging']
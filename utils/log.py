@@ -0,0 +1,121 @@
+# utils/log.py
+"""
+Структурированное логирование без блокировки event loop
+
+Записи логов кладутся в очередь (QueueHandler), а форматирование в JSON
+и запись в файл или stdout выполняет отдельный поток (QueueListener).
+Файл логов ротируется по размеру. Каждая запись получает correlation_id
+элемента контента, который сейчас обрабатывается, поэтому все сообщения
+об одном посте (парсинг, AI, отправка) находятся одним поиском.
+"""
+import copy
+import json
+import logging
+import queue
+import sys
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+# ID элемента (или сбора источника), в контексте которого выполняется код
+correlation_id: ContextVar[str] = ContextVar('correlation_id', default='')
+
+# Атрибуты LogRecord, которые не относятся к extra=...
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'correlation_id'}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def new_correlation_id(prefix: str = '') -> str:
+    """Новый короткий ID (prefix — вид операции, например fetch-github)"""
+    value = uuid.uuid4().hex[:12]
+    return f'{prefix}-{value}' if prefix else value
+
+
+@contextmanager
+def log_context(value: Optional[str]):
+    """Выполнить блок с correlation_id (None или '' — оставить текущий)"""
+    if not value:
+        yield
+        return
+    token = correlation_id.set(value)
+    try:
+        yield
+    finally:
+        correlation_id.reset(token)
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'correlation_id', ''):
+            entry['correlation_id'] = record.correlation_id
+        # Поля, переданные через extra=...
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ContextQueueHandler(QueueHandler):
+    """QueueHandler, который в вызывающем потоке запоминает correlation_id и текст исключения"""
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Аргументы подставляются сейчас: объекты могут измениться до записи
+        record.msg = record.getMessage()
+        record.args = None
+        record.correlation_id = correlation_id.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: str = 'INFO', log_format: str = 'json', log_file: str = '',
+                  max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5) -> QueueListener:
+    """
+    Настроить корневой логгер
+    
+    Args:
+        level: Уровень логирования
+        log_format: json или text
+        log_file: Файл логов с ротацией ('' — писать в stdout)
+        max_bytes: Размер файла, после которого он ротируется
+        backup_count: Сколько старых файлов хранить
+    
+    Returns:
+        Запущенный QueueListener; listener.stop() дописывает очередь при завершении
+    """
+    if log_file:
+        handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+    
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+        old.close()
+    root.addHandler(_ContextQueueHandler(log_queue))
+    root.setLevel(level.upper())
+    
+    listener.start()
+    return listener
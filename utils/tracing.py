@@ -0,0 +1,244 @@
+# utils/tracing.py
+"""
+Трассировка обработки материалов
+
+Каждый материал цикла получает трассу со спанами стадий: загрузка и разбор
+страницы источника, проверка дубликатов, рерайтинг (запрос к AI и
+экранирование Markdown), отправка в Telegram. По трассе видно, какой шаг
+задержал пост. Трассы выбираются с вероятностью sample_rate и выгружаются
+в конце цикла в JSONL-файл или в коллектор OTLP/HTTP (JSON).
+
+Код отмечает шаги через span(name): если текущий материал не трассируется,
+это одно чтение ContextVar.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """Один шаг обработки"""
+    
+    __slots__ = ('name', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'error')
+    
+    def __init__(self, name: str, parent_id: str = '', attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.error = ''
+
+
+class Trace:
+    """Спаны одного материала; корневой спан item охватывает всю обработку"""
+    
+    def __init__(self, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span('item', attributes=attributes)
+        self.spans: List[Span] = []
+    
+    @property
+    def attributes(self) -> Dict[str, Any]:
+        """Атрибуты материала (заголовок, источник, итог обработки)"""
+        return self.root.attributes
+    
+    def adopt(self, spans: Iterable[Span]):
+        """Скопировать спаны, записанные до появления трассы (загрузка и разбор источника)"""
+        ids = {}
+        for span in spans:
+            copy = Span(span.name, attributes=dict(span.attributes))
+            copy.start_ns, copy.end_ns, copy.error = span.start_ns, span.end_ns, span.error
+            ids[span.span_id] = copy.span_id
+            copy.parent_id = ids.get(span.parent_id, self.root.span_id)
+            self.spans.append(copy)
+    
+    def finish(self):
+        """Закрыть корневой спан: от первого шага до последнего"""
+        if self.spans:
+            self.root.start_ns = min(self.root.start_ns, min(span.start_ns for span in self.spans))
+            self.root.end_ns = max(span.end_ns or span.start_ns for span in self.spans)
+        else:
+            self.root.end_ns = time.time_ns()
+    
+    def all_spans(self) -> List[Span]:
+        return [self.root] + self.spans
+
+
+# Трасса материала, который сейчас обрабатывается, и текущий родительский спан
+_active_trace: ContextVar[Optional[Trace]] = ContextVar('active_trace', default=None)
+_parent_span: ContextVar[str] = ContextVar('parent_span', default='')
+
+
+@contextmanager
+def use_trace(trace: Optional[Trace]):
+    """Выполнить блок в контексте трассы (None — оставить текущую)"""
+    if trace is None:
+        yield
+        return
+    trace_token = _active_trace.set(trace)
+    parent_token = _parent_span.set(trace.root.span_id)
+    try:
+        yield
+    finally:
+        _parent_span.reset(parent_token)
+        _active_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Записать шаг в текущую трассу (если она есть)"""
+    trace = _active_trace.get()
+    if trace is None:
+        yield None
+        return
+    
+    current = Span(name, _parent_span.get(), attributes)
+    token = _parent_span.set(current.span_id)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = str(e) or type(e).__name__
+        raise
+    finally:
+        _parent_span.reset(token)
+        current.end_ns = time.time_ns()
+        trace.spans.append(current)
+
+
+def set_attribute(key: str, value: Any):
+    """Атрибут материала в текущей трассе (например, итог обработки)"""
+    trace = _active_trace.get()
+    if trace is not None:
+        trace.attributes[key] = value
+
+
+class JsonlTraceExporter:
+    """Выгрузка спанов в JSONL-файл: одна строка — один спан"""
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    @staticmethod
+    def to_dict(trace: Trace, span: Span) -> dict:
+        return {
+            'trace_id': trace.trace_id,
+            'span_id': span.span_id,
+            'parent_id': span.parent_id or None,
+            'name': span.name,
+            'start': span.start_ns / 1e9,
+            'duration_ms': round((span.end_ns - span.start_ns) / 1e6, 3),
+            'attributes': span.attributes,
+            'error': span.error or None,
+        }
+    
+    async def export(self, traces: List[Trace]):
+        lines = [
+            json.dumps(self.to_dict(trace, span), ensure_ascii=False, default=str)
+            for trace in traces for span in trace.all_spans()
+        ]
+        
+        def write():
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+        
+        # Запись в файл не должна задерживать event loop
+        await asyncio.to_thread(write)
+
+
+class OtlpTraceExporter:
+    """Отправка спанов в коллектор по OTLP/HTTP в JSON-кодировке (POST /v1/traces)"""
+    
+    SERVICE_NAME = 'telegrachannel'
+    
+    def __init__(self, endpoint: str, timeout: float = 10):
+        """
+        Args:
+            endpoint: Адрес приёма трасс, например http://localhost:4318/v1/traces
+            timeout: Таймаут запроса (секунды)
+        """
+        self.endpoint = endpoint
+        self.timeout = timeout
+    
+    @staticmethod
+    def _value(value: Any) -> dict:
+        if isinstance(value, bool):
+            return {'boolValue': value}
+        if isinstance(value, int):
+            return {'intValue': str(value)}
+        if isinstance(value, float):
+            return {'doubleValue': value}
+        return {'stringValue': str(value)}
+    
+    def payload(self, traces: List[Trace]) -> dict:
+        """Тело запроса ExportTraceServiceRequest"""
+        spans = []
+        for trace in traces:
+            for span in trace.all_spans():
+                spans.append({
+                    'traceId': trace.trace_id,
+                    'spanId': span.span_id,
+                    'parentSpanId': span.parent_id,
+                    'name': span.name,
+                    'kind': 1,
+                    'startTimeUnixNano': str(span.start_ns),
+                    'endTimeUnixNano': str(span.end_ns),
+                    'attributes': [{'key': key, 'value': self._value(value)} for key, value in span.attributes.items()],
+                    'status': {'code': 2, 'message': span.error} if span.error else {},
+                })
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.SERVICE_NAME}}]},
+            'scopeSpans': [{'scope': {'name': self.SERVICE_NAME}, 'spans': spans}],
+        }]}
+    
+    async def export(self, traces: List[Trace]):
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.post(self.endpoint, json=self.payload(traces)) as response:
+                if response.status >= 300:
+                    raise RuntimeError(f"коллектор ответил HTTP {response.status}")
+
+
+class Tracer:
+    """Создание трасс с выборкой и выгрузка завершённых"""
+    
+    def __init__(self, exporter=None, sample_rate: float = 1.0):
+        """
+        Args:
+            exporter: JsonlTraceExporter или OtlpTraceExporter (None — трассировка выключена)
+            sample_rate: Доля трассируемых материалов (0..1)
+        """
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+    
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None and self.sample_rate > 0
+    
+    def start_trace(self, **attributes) -> Optional[Trace]:
+        """Новая трасса материала или None, если материал не попал в выборку"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        return Trace(attributes)
+    
+    async def export(self, traces: List[Trace]):
+        """Завершить и выгрузить трассы (ошибка выгрузки не прерывает работу)"""
+        if not traces or self.exporter is None:
+            return
+        for trace in traces:
+            trace.finish()
+        try:
+            await self.exporter.export(traces)
+        except Exception as e:
+            logger.warning(f"Не удалось выгрузить {len(traces)} трасс: {e}")
@@ -0,0 +1,109 @@
+# webhook.py
+"""
+Приём обновлений Telegram через webhook
+
+Встроенный aiohttp-сервер принимает POST от Telegram, проверяет секретный
+токен и сразу отвечает 200, а обновление передаётся в очередь приложения.
+Обработчики команд выполняются параллельно (не больше UPDATE_WORKERS
+одновременно), поэтому ответ не ждёт ни long polling, ни соседних команд.
+"""
+import hmac
+import json
+import logging
+from typing import Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookServer:
+    """HTTP-сервер webhook для telegram.ext.Application"""
+    
+    # Заголовок с секретом, который Telegram передаёт в каждом запросе
+    SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+    
+    def __init__(self, application: Application, public_url: str = '', secret_token: str = '',
+                 listen: str = '0.0.0.0', port: int = 8080, path: str = '/telegram', max_pending: int = 100):
+        """
+        Args:
+            application: Приложение с обработчиками команд
+            public_url: Внешний адрес сервера (https://bot.example.com); '' — webhook не регистрировать
+            secret_token: Секрет webhook (WEBHOOK_SECRET), обязателен
+            listen: Адрес, на котором слушать
+            port: Порт
+            path: Путь webhook
+            max_pending: Сколько необработанных обновлений принимать (дальше 503, Telegram повторит)
+        """
+        self.application = application
+        self.public_url = public_url.rstrip('/')
+        if not secret_token:
+            raise ValueError("Для webhook нужен секрет (WEBHOOK_SECRET)")
+        self.secret_token = secret_token
+        self.listen = listen
+        self.port = port
+        self.path = path if path.startswith('/') else f'/{path}'
+        self.max_pending = max_pending
+        self._runner: Optional[web.AppRunner] = None
+    
+    @property
+    def webhook_url(self) -> str:
+        """Адрес, который регистрируется в Telegram"""
+        return f'{self.public_url}{self.path}'
+    
+    def build_app(self) -> web.Application:
+        """aiohttp-приложение с маршрутами webhook и проверки живости"""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get('/healthz', self.handle_health)
+        return app
+    
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """POST от Telegram: проверить секрет и поставить обновление в очередь"""
+        token = request.headers.get(self.SECRET_HEADER, '')
+        if not hmac.compare_digest(token.encode(), self.secret_token.encode()):
+            logger.warning(f"Webhook: неверный секрет, запрос от {request.remote} отклонён")
+            return web.Response(status=403)
+        
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except (json.JSONDecodeError, ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Webhook: некорректное обновление: {e}")
+            return web.Response(status=400)
+        
+        if self.application.update_queue.qsize() >= self.max_pending:
+            # Telegram доставит обновление повторно
+            logger.warning("Webhook: очередь обновлений переполнена")
+            return web.Response(status=503)
+        
+        await self.application.update_queue.put(update)
+        return web.Response()
+    
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """GET /healthz"""
+        return web.Response(text='ok')
+    
+    async def start(self):
+        """Запустить сервер и зарегистрировать webhook в Telegram"""
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        logger.info(f"Webhook-сервер слушает {self.listen}:{self.port}{self.path}")
+        
+        if self.public_url:
+            await self.application.bot.set_webhook(
+                url=self.webhook_url,
+                secret_token=self.secret_token,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=min(100, max(1, self.application.concurrent_updates))
+            )
+            logger.info(f"Webhook зарегистрирован: {self.webhook_url}")
+    
+    async def stop(self):
+        """Остановить сервер (webhook в Telegram остаётся до следующего запуска)"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None